@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from dedup import dedup_rows
+
+# ▶️ smartmerge 중복 제거 벤치마크
+# 기존: 남긴 (중분류, 연관기업) 전체와 SequenceMatcher 비교 (O(n²)) / 변경: 이름 정규화 + n-gram 후보 블로킹
+# 사용: python benchmarks/bench_dedup.py --rows 100000 --old-limit 5000
+
+SYLLABLES = [chr(0xAC00 + 588 * cho + 28 * jung) for cho in range(19) for jung in range(21)]  # ▶️ 받침 없는 한글 399자
+SUFFIXES = ["전자", "화학", "산업", "건설", "제약", "바이오", "테크", "정밀", "물산", "중공업", "소재", "시스템"]
+DECORATIONS = [lambda n: n, lambda n: f"㈜{n}", lambda n: f"(주){n}", lambda n: f"{n} 주식회사", lambda n: f"주식회사 {n}"]
+
+
+def synthetic_rows(n_rows, n_companies, seed=0):
+    """▶️ 기업명 풀에서 표기 변형(법인 표기, 공백, 오타)을 섞어 n_rows개 행 생성"""
+    rng = random.Random(seed)
+    pool = [
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + rng.choice(SUFFIXES)
+        for _ in range(n_companies)
+    ]
+    rows = []
+    for _ in range(n_rows):
+        name = rng.choice(pool)
+        if rng.random() < 0.1:
+            i = rng.randrange(len(name))
+            name = name[:i] + rng.choice(SYLLABLES) + name[i + 1:]
+        rows.append({
+            "종목명": "합성기업",
+            "중분류": rng.choice(["공급처", "판매처"]),
+            "연관기업": rng.choice(DECORATIONS)(name),
+        })
+    return pd.DataFrame(rows)
+
+
+def dedup_rows_loop(merged_df, threshold=0.85):
+    """▶️ 기존 smartmerge.py 중복 제거 구현 (비교용 사본)"""
+    seen = []
+    cleaned_rows = []
+    for _, row in merged_df.iterrows():
+        mid = row.get("중분류")
+        company = row.get("연관기업")
+        if pd.isna(mid) or pd.isna(company):
+            continue
+        duplicate = False
+        for existing_mid, existing_company in seen:
+            if mid == existing_mid and SequenceMatcher(None, str(company), str(existing_company)).ratio() >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            seen.append((mid, company))
+            cleaned_rows.append(row)
+    return pd.DataFrame(cleaned_rows)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run(n_rows, n_companies, old_limit):
+    df = synthetic_rows(n_rows, n_companies)
+    sample = df.head(old_limit)
+
+    old_time, old_result = timed(lambda: dedup_rows_loop(sample))
+    new_sample_time, new_sample_result = timed(lambda: dedup_rows(sample))
+    new_time, new_result = timed(lambda: dedup_rows(df))
+
+    # ▶️ 기존 방식은 전체 행에 대해 돌리면 너무 오래 걸리므로 표본 시간으로 O(n²) 추정
+    old_estimate = old_time * (n_rows / len(sample)) ** 2
+    return {
+        "rows": n_rows,
+        "sample_rows": len(sample),
+        "old_sample_s": old_time,
+        "new_sample_s": new_sample_time,
+        "old_sample_kept": len(old_result),
+        "new_sample_kept": len(new_sample_result),
+        "new_full_s": new_time,
+        "new_full_kept": len(new_result),
+        "old_full_estimate_s": old_estimate,
+        "speedup_estimate": old_estimate / new_time if new_time else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="smartmerge 중복 제거 벤치마크")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--companies", type=int, default=20000, help="합성 기업명 풀 크기")
+    parser.add_argument("--old-limit", type=int, default=5000, help="기존 방식으로 처리할 표본 행 수")
+    args = parser.parse_args()
+
+    r = run(args.rows, args.companies, args.old_limit)
+    print(f"표본 {r['sample_rows']:,}행: 기존 {r['old_sample_s']:.2f}s (남은 행 {r['old_sample_kept']:,}) / "
+          f"변경 {r['new_sample_s']:.2f}s (남은 행 {r['new_sample_kept']:,})")
+    print(f"전체 {r['rows']:,}행: 변경 {r['new_full_s']:.2f}s (남은 행 {r['new_full_kept']:,}), "
+          f"기존 추정 {r['old_full_estimate_s']:,.0f}s → 약 {r['speedup_estimate']:,.0f}배")
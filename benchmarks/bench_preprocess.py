@@ -0,0 +1,109 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tiktoken
+from token_budget import truncate_to_tokens
+
+# ▶️ preprocess_text 마이크로 벤치마크
+# 기존: 전체 인코딩 1회 + 줄마다 다시 인코딩 / 변경: 인코딩 1회 + 토큰 오프셋으로 문단·문장 경계 절단
+# 사용: python benchmarks/bench_preprocess.py --json-folder "사업보고서 json 폴더" --repeat 5
+
+TOKEN_LIMIT = 6000
+
+SAMPLE_PARAGRAPH = (
+    "당사는 반도체 제조용 소재를 생산하고 있으며, 주요 원재료는 고순도 실리콘 웨이퍼와 특수가스입니다. "
+    "주요 매입처는 SK실트론, 에스케이머티리얼즈 등이며 원재료 가격은 전년 대비 3.5% 상승하였습니다. "
+    "당사 제품의 주요 매출처는 삼성전자, SK하이닉스이며 매출의 약 72%를 차지합니다. "
+    "생산설비의 가동률은 87.2%이며 2024년 중 신규 라인 증설을 계획하고 있습니다.\n"
+)
+
+
+def preprocess_text_linewise(raw_text, max_tokens, tokenizer):
+    """▶️ 기존 main_gpt.preprocess_text 구현 (비교용 사본)"""
+    token_count = len(tokenizer.encode(raw_text))
+    if token_count <= max_tokens:
+        return raw_text
+
+    sentences = raw_text.split("\n")
+    trimmed_text = []
+    total_length = 0
+
+    for sentence in sentences:
+        sentence_length = len(tokenizer.encode(sentence))
+        if total_length + sentence_length > max_tokens:
+            break
+        trimmed_text.append(sentence)
+        total_length += sentence_length
+
+    return "\n".join(trimmed_text)
+
+
+def synthetic_reports():
+    """▶️ 실제 사업보고서 섹션 크기(약 2만~20만 자)를 흉내 낸 합성 텍스트, 개행 제거판 포함"""
+    reports = {}
+    for n_chars in (20000, 60000, 200000):
+        text = (SAMPLE_PARAGRAPH * (n_chars // len(SAMPLE_PARAGRAPH) + 1))[:n_chars]
+        reports[f"synthetic_{n_chars // 1000}k"] = text
+        reports[f"synthetic_{n_chars // 1000}k_no_newline"] = text.replace("\n", "")
+    return reports
+
+
+def load_reports(json_folder, limit):
+    reports = {}
+    for path in sorted(glob.glob(os.path.join(json_folder, "*.json")))[:limit]:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        reports[os.path.basename(path)] = "\n".join(sec["text"] for sec in data.get("sections", []))
+    return reports
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(reports, tokenizer, repeat, max_tokens=TOKEN_LIMIT):
+    rows = []
+    for name, text in reports.items():
+        old_time, old_text = best_time(lambda: preprocess_text_linewise(text, max_tokens, tokenizer), repeat)
+        new_time, (new_text, _) = best_time(lambda: truncate_to_tokens(text, max_tokens, tokenizer), repeat)
+        rows.append({
+            "name": name,
+            "chars": len(text),
+            "tokens": len(tokenizer.encode(text)),
+            "old_ms": old_time * 1000,
+            "new_ms": new_time * 1000,
+            "speedup": old_time / new_time if new_time else float("inf"),
+            "old_kept_tokens": len(tokenizer.encode(old_text)),
+            "new_kept_tokens": len(tokenizer.encode(new_text)),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="preprocess_text 벤치마크")
+    parser.add_argument("--json-folder", help="dart_report.py가 만든 기업별 JSON 폴더 (없으면 합성 텍스트만 사용)")
+    parser.add_argument("--limit", type=int, default=50, help="JSON 파일 최대 개수")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    reports = synthetic_reports()
+    if args.json_folder:
+        reports.update(load_reports(args.json_folder, args.limit))
+
+    rows = run(reports, tokenizer, args.repeat)
+    print(f"{'name':<32}{'chars':>9}{'tokens':>9}{'old ms':>10}{'new ms':>10}{'speedup':>9}{'kept old/new':>16}")
+    for r in rows:
+        print(f"{r['name'][:31]:<32}{r['chars']:>9}{r['tokens']:>9}{r['old_ms']:>10.1f}{r['new_ms']:>10.1f}"
+              f"{r['speedup']:>8.1f}x{r['old_kept_tokens']:>8}/{r['new_kept_tokens']:<7}")
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from report_xml import VALID_TITLES, proc_xml_fast
+
+# ▶️ dart_report.proc_xml 벤치마크
+# 기존: BeautifulSoup(html.parser) 전체 트리 + 섹션마다 get_text() + 표마다 pd.read_html / 변경: lxml + 제목 요소로 섹션 선택
+# 사용: python benchmarks/bench_proc_xml.py --xml-folder "사업보고서 XML 폴더" 또는 --cache-dir "dart_cache 폴더"
+
+
+def proc_xml_legacy(xml_doc):
+    """▶️ 기존 dart_report.proc_xml 구현 (비교용 사본, dart_report는 OpenDartReader 설정이 필요해 직접 import하지 않음)"""
+    xml_file = BeautifulSoup(xml_doc, features="html.parser")
+    extracted_sections = []
+    for section in xml_file.select('section-2'):
+        section_text = section.get_text()
+        tables = []
+        section_title = next((title for title in VALID_TITLES if title in section_text), None)
+        if section_title:
+            for table in section.find_all("table"):
+                try:
+                    df = pd.read_html(StringIO(str(table)))[0]
+                    tables.append([{str(k): v for k, v in row.items()} for row in df.to_dict(orient="records")])
+                except:
+                    continue
+            extracted_sections.append({"title": section_title, "text": section_text.strip(), "tables": tables})
+    return extracted_sections
+
+
+SECTION_TITLES = ["1. 사업의 개요", "2. 주요 제품 및 서비스", VALID_TITLES[0], VALID_TITLES[3], "5. 위험관리 및 파생거래",
+                  "6. 주요계약 및 연구개발활동", "7. 기타 참고사항"]
+
+
+def synthetic_report(n_paragraphs, n_tables, other_scale=3, seed=0):
+    """▶️ DART 사업보고서 XML 구조(SECTION-1/SECTION-2/TITLE/P/TABLE)를 흉내 낸 합성 문서
+
+    대상이 아닌 섹션은 대상 섹션의 other_scale배 분량 (실제 보고서는 재무제표 등 대상 외 분량이 훨씬 큼)
+    """
+    rng = random.Random(seed)
+    companies = ["삼성전자", "SK하이닉스", "LG화학", "포스코", "현대자동차", "한화솔루션", "기타"]
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<DOCUMENT><BODY><SECTION-1><TITLE ATOC="Y">II. 사업의 내용</TITLE>\n']
+    for title in SECTION_TITLES:
+        parts.append(f'<SECTION-2 ACLASS="MANDATORY">\n<TITLE ATOC="Y" AASSOCNOTE="D-0-2-0-0">{title}</TITLE>\n')
+        scale = 1 if title in VALID_TITLES else other_scale
+        for p in range(n_paragraphs * scale):
+            parts.append(f"<P>당사의 주요 {rng.choice(['원재료', '제품', '매출처'])}는 {rng.choice(companies)} 등이며 "
+                         f"전년 대비 {rng.randint(1, 30)}.{rng.randint(0, 9)}% 변동하였습니다.</P>\n")
+        for t in range(n_tables * scale):
+            parts.append('<TABLE BORDER="1"><TBODY>\n<TR><TH ROWSPAN="2">구분</TH><TH COLSPAN="2">매입처</TH>'
+                         '<TH ROWSPAN="2">금액</TH></TR>\n<TR><TH>회사명</TH><TH>비고</TH></TR>\n')
+            for r in range(rng.randint(3, 12)):
+                amount = f"{rng.randint(1, 9_999_999):,}" if rng.random() > 0.1 else "-"
+                parts.append(f"<TR><TD>{rng.choice(['원재료', '상품', '부재료'])}</TD><TD>{rng.choice(companies)}</TD>"
+                             f"<TD>{'' if rng.random() < 0.3 else '주요<BR/>거래처'}</TD><TD ALIGN=\"RIGHT\">{amount}</TD></TR>\n")
+            parts.append("</TBODY></TABLE>\n")
+        parts.append("</SECTION-2>\n")
+    parts.append("</SECTION-1></BODY></DOCUMENT>\n")
+    return "".join(parts)
+
+
+def load_reports(xml_folder=None, cache_dir=None, limit=50):
+    reports = {}
+    if xml_folder:
+        for path in sorted(glob.glob(os.path.join(xml_folder, "*.xml")))[:limit]:
+            with open(path, "r", encoding="utf-8") as f:
+                reports[os.path.basename(path)] = f.read()
+    if cache_dir:
+        from doc_cache import DocCache
+        cache = DocCache(cache_dir)
+        for key in sorted(k for k in cache.index if k.startswith("document/"))[:limit]:
+            content = cache.get(key)
+            reports[key] = content.decode("utf-8") if isinstance(content, bytes) else content
+    return reports
+
+
+def same_output(a, b):
+    """▶️ JSON으로 직렬화했을 때 같은지 (NaN 포함 비교), 본문은 공백 차이 무시 여부를 따로 확인"""
+    def dump(sections, squash_text):
+        return json.dumps([
+            {**s, "text": " ".join(s["text"].split()) if squash_text else s["text"]} for s in sections
+        ], ensure_ascii=False, default=str)
+    return dump(a, False) == dump(b, False), dump(a, True) == dump(b, True)
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(reports, repeat):
+    rows = []
+    for name, xml_doc in reports.items():
+        old_time, old = best_time(lambda: proc_xml_legacy(xml_doc), repeat)
+        new_time, new = best_time(lambda: proc_xml_fast(xml_doc), repeat)
+        exact, same_ignoring_space = same_output(old, new)
+        rows.append({
+            "name": name,
+            "chars": len(xml_doc),
+            "sections": len(new),
+            "tables": sum(len(s["tables"]) for s in new),
+            "old_ms": old_time * 1000,
+            "new_ms": new_time * 1000,
+            "speedup": old_time / new_time if new_time else float("inf"),
+            "exact": exact,
+            "same_ignoring_space": same_ignoring_space,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="proc_xml 벤치마크")
+    parser.add_argument("--xml-folder", help="사업보고서 원문 XML 파일 폴더")
+    parser.add_argument("--cache-dir", help="dart_report.py의 dart_cache 폴더 (document/* 키 사용)")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    reports = {f"synthetic_{p}p_{t}t": synthetic_report(p, t) for p, t in ((20, 2), (80, 6), (200, 15))}
+    reports.update(load_reports(args.xml_folder, args.cache_dir, args.limit))
+
+    rows = run(reports, args.repeat)
+    print(f"{'name':<32}{'chars':>10}{'sec':>5}{'tbl':>5}{'old ms':>10}{'new ms':>9}{'speedup':>9}  same(exact/space)")
+    for r in rows:
+        print(f"{r['name'][:31]:<32}{r['chars']:>10}{r['sections']:>5}{r['tables']:>5}{r['old_ms']:>10.1f}"
+              f"{r['new_ms']:>9.1f}{r['speedup']:>8.1f}x  {r['exact']}/{r['same_ignoring_space']}")
@@ -0,0 +1,185 @@
+import argparse
+import io
+import os
+import random
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_proc_xml import synthetic_report
+
+# ▶️ 벤치마크용 DART 페이지 고정 데이터 (fixture)
+# benchmarks/fixtures/ 에 기록해 둔 실제 페이지가 있으면 그것을, 없으면 같은 구조의 합성 페이지를 사용
+#   report/<rcept_no>.xml   사업보고서 원문 (OpenDART document.xml 압축 해제본)
+#   main/<rcp_no>.html      dart.fss.or.kr/dsaf001/main.do (viewDoc 스크립트 포함)
+#   viewer/<rcp_no>.html    dart.fss.or.kr/report/viewer.do (공급계약 공시 본문)
+#   subdoc/<rcept_no>.html  사업보고서 '사업의 내용' 하위 문서
+# 실제 페이지 기록: python benchmarks/fixtures.py record --dart-key KEY --report 20240312000736 --contract 20240115800123
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+COMPANIES = ["삼성전자", "SK하이닉스", "LG화학", "포스코홀딩스", "현대자동차", "한화솔루션", "셀트리온", "카카오",
+             "NAVER", "기아", "LG에너지솔루션", "삼성SDI", "현대모비스", "KB금융", "신한지주", "SK이노베이션"]
+
+
+def _recorded(kind, key, ext):
+    path = os.path.join(FIXTURE_DIR, kind, f"{key}.{ext}")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def recorded_keys(kind):
+    folder = os.path.join(FIXTURE_DIR, kind)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(folder))
+
+
+class FixturePages:
+    """▶️ 대체 서버(standin_server.py)와 벤치마크가 함께 쓰는 페이지 공급자
+
+    n_companies개 가상 상장사 (종목코드 100000부터), 기업마다 사업보고서 1건 + 공급계약 공시 contracts_per_company건
+    """
+
+    def __init__(self, n_companies=50, contracts_per_company=3, report_size=(40, 4), seed=0):
+        self.n_companies = n_companies
+        self.contracts_per_company = contracts_per_company
+        self.report_size = report_size
+        self.seed = seed
+
+    # ✅ 기업/공시 목록
+    def companies(self):
+        rng = random.Random(self.seed)
+        result = []
+        for i in range(self.n_companies):
+            name = COMPANIES[i] if i < len(COMPANIES) else f"{rng.choice(COMPANIES)}{i}"
+            result.append({"corp_code": f"{10000000 + i:08d}", "corp_name": name,
+                           "corp_eng_name": f"Company {i} Co., Ltd.", "stock_code": f"{100000 + i:06d}"})
+        return result
+
+    def disclosures(self, kind):
+        """OpenDART list.json 행 ("A": 사업보고서, "I": 공급계약체결)"""
+        rows = []
+        for i, company in enumerate(self.companies()):
+            base = {"corp_cls": "Y", "corp_code": company["corp_code"], "corp_name": company["corp_name"],
+                    "stock_code": company["stock_code"], "flr_nm": company["corp_name"], "rm": ""}
+            if kind == "A":
+                rows.append({**base, "report_nm": "사업보고서 (2024.12)", "rcept_no": f"20250310{i:06d}",
+                             "rcept_dt": "20250310"})
+            elif kind == "I":
+                for j in range(self.contracts_per_company):
+                    rows.append({**base, "report_nm": "단일판매ㆍ공급계약체결", "rcept_no": f"2024{j + 1:02d}15{i:06d}",
+                                 "rcept_dt": f"2024{j + 1:02d}15"})
+        return sorted(rows, key=lambda row: row["rcept_no"], reverse=True)
+
+    def corpcode_xml(self):
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<result>\n']
+        for company in self.companies():
+            parts.append(f"<list><corp_code>{company['corp_code']}</corp_code><corp_name>{company['corp_name']}</corp_name>"
+                         f"<corp_eng_name>{company['corp_eng_name']}</corp_eng_name>"
+                         f"<stock_code>{company['stock_code']}</stock_code><modify_date>20250101</modify_date></list>\n")
+        parts.append("</result>\n")
+        return "".join(parts)
+
+    # ✅ 페이지
+    def report_xml(self, rcept_no):
+        recorded = _recorded("report", rcept_no, "xml")
+        if recorded is not None:
+            return recorded
+        paragraphs, tables = self.report_size
+        return synthetic_report(paragraphs, tables, seed=int(rcept_no[-6:] or 0))
+
+    def report_zip(self, rcept_no):
+        """OpenDART document.xml 응답 (원문 XML 1개를 담은 zip)"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f"{rcept_no}.xml", self.report_xml(rcept_no))
+        return buffer.getvalue()
+
+    def main_page(self, rcp_no):
+        recorded = _recorded("main", rcp_no, "html")
+        if recorded is not None:
+            return recorded
+        dcm_no = str(9000000 + int(rcp_no[-6:] or 0))
+        return ("<html><head><title>전자공시시스템</title><script type=\"text/javascript\">\n"
+                "var treeData = [];\nfunction init() {\n"
+                f"    viewDoc(\"{rcp_no}\", \"{dcm_no}\", null, null, null, \"dart3.xsd\", \"\");\n"
+                "}\n</script></head><body onload=\"init()\"><div id=\"listTree\"></div></body></html>")
+
+    def contract_page(self, rcp_no):
+        recorded = _recorded("viewer", rcp_no, "html")
+        if recorded is not None:
+            return recorded
+        rng = random.Random(rcp_no)
+        rows = [
+            ("1. 판매ㆍ공급계약 구분", rng.choice(["공사수주", "공급계약", "판매계약"])),
+            ("2. 체결계약명", f"{rng.choice(['반도체 장비', '2차전지 소재', '선박', '플랜트'])} 공급계약"),
+            ("- 세부내용", "-"),
+            ("3. 계약내역", f"계약금액(원) {rng.randint(1, 999) * 10 ** 8:,}"),
+            ("4. 계약상대", rng.choice(COMPANIES)),
+            ("5. 판매ㆍ공급지역", rng.choice(["대한민국", "미국", "베트남"])),
+        ]
+        style_rows = "".join(f"<tr><td class=\"xforms_input\" style=\"width:30%\">비고 {i}</td>"
+                             f"<td style=\"text-align:left\">{'-' * rng.randint(1, 40)}</td></tr>" for i in range(40))
+        body = "".join(f"<tr><td class=\"xforms_title\">{header}</td><td>{value}</td></tr>" for header, value in rows)
+        return (f"<html><head><meta charset=\"utf-8\"><style>td {{ border: 1px solid #ccc; }}</style></head><body>"
+                f"<table class=\"xforms\" border=\"1\">{body}{style_rows}</table></body></html>")
+
+    def subdoc_page(self, rcept_no):
+        recorded = _recorded("subdoc", rcept_no, "html")
+        if recorded is not None:
+            return recorded
+        rng = random.Random(rcept_no)
+        paragraphs = "".join(f"<p>당사의 주요 매출처는 {rng.choice(COMPANIES)}이며 원재료는 {rng.choice(COMPANIES)}에서 "
+                             f"매입하고 있습니다.&nbsp;전년 대비 {rng.randint(1, 30)}% 증가하였습니다.</p>\n"
+                             for _ in range(300))
+        return f"<html><head><meta charset=\"utf-8\"></head><body><h2>II. 사업의 내용</h2>{paragraphs}</body></html>"
+
+
+def record(api_key, reports, contracts):
+    """▶️ 실제 DART 페이지를 benchmarks/fixtures/에 기록 (네트워크 + API 키 필요)"""
+    import requests
+    from dart_http import http_get
+
+    def save(kind, key, ext, text):
+        os.makedirs(os.path.join(FIXTURE_DIR, kind), exist_ok=True)
+        with open(os.path.join(FIXTURE_DIR, kind, f"{key}.{ext}"), "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ {kind}/{key}.{ext} ({len(text):,}자)")
+
+    for rcept_no in reports:
+        response = requests.get("https://opendart.fss.or.kr/api/document.xml",
+                                params={"crtfc_key": api_key, "rcept_no": rcept_no}, timeout=60)
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            name = sorted(zf.namelist(), key=len)[0]
+            save("report", rcept_no, "xml", zf.read(name).decode("utf-8", errors="replace"))
+
+    for rcp_no in contracts:
+        main_html = http_get(f"https://dart.fss.or.kr/dsaf001/main.do?rcpNo={rcp_no}").text
+        save("main", rcp_no, "html", main_html)
+        import re
+        match = re.search(r'viewDoc\(".*?",\s*"(\d+)"', main_html)
+        if match:
+            response = http_get(f"https://dart.fss.or.kr/report/viewer.do?rcpNo={rcp_no}&dcmNo={match.group(1)}&dtd=HTML")
+            response.encoding = response.apparent_encoding
+            save("viewer", rcp_no, "html", response.text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="벤치마크 fixture 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_record = sub.add_parser("record", help="실제 DART 페이지 기록")
+    p_record.add_argument("--dart-key", required=True)
+    p_record.add_argument("--report", nargs="*", default=[], help="사업보고서 rcept_no")
+    p_record.add_argument("--contract", nargs="*", default=[], help="공급계약 공시 rcp_no")
+    sub.add_parser("list", help="기록된 fixture 목록")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.dart_key, args.report, args.contract)
+    else:
+        for kind in ("report", "main", "viewer", "subdoc"):
+            print(f"{kind}: {len(recorded_keys(kind))}개")
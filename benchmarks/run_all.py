@@ -0,0 +1,399 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+from fixtures import FixturePages
+from standin_server import serve
+
+# ▶️ 오프라인 벤치마크 모음: 로컬 대체 서버(standin_server.py) + fixture 페이지로 수집·분석 단계의 핫 경로를 측정
+# 결과는 benchmarks/results/<시각>_<커밋>.json 으로 저장 → --compare 로 이전 결과와 비교
+# 사용: python benchmarks/run_all.py --repeat 5 --latency 0.02 --rate-limit-rate 0.05
+#       python benchmarks/run_all.py --only proc_xml dedup --compare benchmarks/results/이전결과.json
+# 모듈을 불러올 수 없는 벤치마크(OpenDartReader/openai 미설치 등)는 {"skipped": 사유}로 기록
+
+warnings.filterwarnings('ignore')
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(fn, repeat, setup=None):
+    """▶️ fn을 repeat번 실행한 시간 (setup은 매번 실행 전에 호출, 측정에서 제외)"""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):  # ✅ 단계별 진행 출력은 버림
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+    return {"best_s": min(runs), "median_s": statistics.median(runs), "runs": runs}, result
+
+
+class Context:
+    """벤치마크 공용 설정 (대체 서버 주소, fixture 페이지, 임시 폴더)"""
+
+    def __init__(self, args, server, pages, tmp_dir):
+        self.args = args
+        self.server = server
+        self.state = server.RequestHandlerClass.state
+        self.base_url = f"http://127.0.0.1:{server.server_port}"
+        self.pages = pages
+        self.tmp_dir = tmp_dir
+
+    def folder(self, *parts):
+        path = os.path.join(self.tmp_dir, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def rcept_nos(self, kind):
+        return [row["rcept_no"] for row in self.pages.disclosures(kind)][: self.args.items]
+
+
+# ✅ 사업보고서 원문 파싱
+@benchmark("proc_xml")
+def bench_proc_xml(ctx):
+    from bench_proc_xml import proc_xml_legacy
+    from report_xml import proc_xml_fast
+
+    reports = [ctx.pages.report_xml(rcept_no) for rcept_no in ctx.rcept_nos("A")]
+    legacy, _ = measure(lambda: [proc_xml_legacy(xml) for xml in reports], ctx.args.repeat)
+    fast, _ = measure(lambda: [proc_xml_fast(xml) for xml in reports], ctx.args.repeat)
+    return {"items": len(reports), "chars": sum(map(len, reports)), "legacy": legacy, "fast": fast}
+
+
+@benchmark("text_output")
+def bench_text_output(ctx):
+    import dart_report
+    from doc_cache import DocCache
+
+    rcept_nos = ctx.rcept_nos("A")
+    pages = [ctx.pages.subdoc_page(rcept_no) for rcept_no in rcept_nos]
+    parse, _ = measure(lambda: [dart_report.html_to_text(html) for html in pages], ctx.args.repeat)
+
+    # ✅ 다운로드 포함 (매 실행마다 빈 캐시)
+    urls = [f"{ctx.base_url}/report/subdoc.do?rcpNo={rcept_no}" for rcept_no in rcept_nos]
+    counter = iter(range(1_000_000))
+
+    def fresh_cache():
+        dart_report.doc_cache = DocCache(ctx.folder("text_output", str(next(counter))))
+
+    fetch, _ = measure(lambda: [dart_report.text_output(url) for url in urls], ctx.args.repeat, setup=fresh_cache)
+    return {"items": len(pages), "html_to_text": parse, "text_output": fetch}
+
+
+# ✅ 공급계약 공시 추출 (main.do → viewer.do, 대체 서버의 지연/429 포함)
+@benchmark("extract_contract_info")
+def bench_extract_contract_info(ctx):
+    import dart_deal
+    import dart_http
+    from doc_cache import DocCache, MappingCache
+
+    dart_deal.DART_WEB_BASE = ctx.base_url
+    rcp_nos = ctx.rcept_nos("I")
+    counter = iter(range(1_000_000))
+
+    def fresh_cache():
+        cache_dir = ctx.folder("extract_contract_info", str(next(counter)))
+        dart_deal.doc_cache = DocCache(cache_dir)
+        dart_deal.dcm_no_cache = MappingCache(os.path.join(cache_dir, "dcm_no.json"))
+        dart_http.web_controller = dart_http.AdaptiveRateController(
+            initial_rate=ctx.args.web_rate, max_rate=ctx.args.web_rate * 2)
+
+    def run():
+        with ThreadPoolExecutor(max_workers=dart_deal.MAX_WORKERS) as executor:
+            return list(executor.map(dart_deal.extract_contract_info, rcp_nos))
+
+    throttled_before = ctx.state.counts["throttled"]
+    timing, results = measure(run, ctx.args.repeat, setup=fresh_cache)
+    return {"items": len(rcp_nos), "workers": dart_deal.MAX_WORKERS, "web_rate": ctx.args.web_rate,
+            "throttled": ctx.state.counts["throttled"] - throttled_before,
+            "found": sum(1 for r in results if r["contract_party"] not in ("", "조회 실패")), "extract": timing}
+
+
+# ✅ GPT 입력 전처리 / 분석
+@benchmark("preprocess_text")
+def bench_preprocess_text(ctx):
+    import main_gpt
+    from report_xml import proc_xml_fast
+
+    texts = ["\n".join(sec["text"] for sec in proc_xml_fast(ctx.pages.report_xml(rcept_no)))
+             for rcept_no in ctx.rcept_nos("A")]
+    timing, _ = measure(lambda: [main_gpt.preprocess_text(text) for text in texts], ctx.args.repeat)
+    return {"items": len(texts), "chars": sum(map(len, texts)), "token_limit": main_gpt.TOKEN_LIMIT,
+            "preprocess": timing}
+
+
+@benchmark("analyze_text_with_gpt")
+def bench_analyze_text_with_gpt(ctx):
+    import main_gpt
+    import openai
+
+    openai.api_base = f"{ctx.base_url}/v1"
+    openai.api_key = "sk-standin"
+    main_gpt.llm_cache = None
+    names = [row["corp_name"] for row in ctx.pages.companies()][: ctx.args.gpt_items]
+
+    # ✅ 동기 경로는 429/오류 시 고정 대기(30초/3초)라 오류 주입 없이 요청 지연만 측정
+    saved = ctx.state.rate_limit_rate, ctx.state.fail_rate
+    ctx.state.rate_limit_rate, ctx.state.fail_rate = 0.0, 0.0
+    try:
+        timing, results = measure(lambda: [main_gpt.analyze_text_with_gpt(name, f"{name} 사업의 내용") for name in names],
+                                  ctx.args.repeat)
+    finally:
+        ctx.state.rate_limit_rate, ctx.state.fail_rate = saved
+    return {"items": len(names), "succeeded": sum(1 for parsed, _ in results if parsed), "analyze": timing}
+
+
+@benchmark("chat_client")
+def bench_chat_client(ctx):
+    """비동기 경로 (ChatClient + RateBudget + run_ordered), 429 주입 포함"""
+    from gpt_async import ChatClient, RateBudget, parse_reset, run_ordered
+
+    names = [row["corp_name"] for row in ctx.pages.companies()][: ctx.args.gpt_items]
+    concurrency = 8
+
+    async def one(client, budget, name):
+        body = {"model": "gpt-4", "messages": [{"role": "user", "content": f"offline business report for: {name}"}]}
+        for _ in range(20):
+            await budget.acquire(500)
+            status, headers, payload = await client.create(body)
+            budget.update_from_headers(headers)
+            if status == 429:
+                budget.penalize(float(headers.get("retry-after") or 0) or parse_reset(headers.get("x-ratelimit-reset-requests")))
+                continue
+            if status < 400:
+                return payload
+        return None
+
+    def run():
+        client = ChatClient("sk-standin", f"{ctx.base_url}/v1", pool_size=concurrency)
+        budget = RateBudget(rpm=ctx.args.gpt_rpm, tpm=10 ** 7)
+        results = []
+        asyncio.run(run_ordered(names, lambda name: one(client, budget, name), concurrency,
+                                lambda idx, name, result: results.append(result)))
+        return results, budget.wait_seconds
+
+    throttled_before = ctx.state.counts["throttled"]
+    timing, (results, waited) = measure(run, ctx.args.repeat)
+    return {"items": len(names), "concurrency": concurrency, "rpm": ctx.args.gpt_rpm,
+            "succeeded": sum(1 for r in results if r), "throttled": ctx.state.counts["throttled"] - throttled_before,
+            "budget_wait_s": waited, "requests": timing}
+
+
+# ✅ 병합 단계
+@benchmark("smartmerge_dedup")
+def bench_smartmerge_dedup(ctx):
+    from bench_dedup import synthetic_rows
+    from dedup import dedup_rows
+
+    df = synthetic_rows(ctx.args.dedup_rows, max(1, ctx.args.dedup_rows // 5))
+    timing, result = measure(lambda: dedup_rows(df), ctx.args.repeat)
+    return {"rows": len(df), "kept": len(result), "dedup": timing}
+
+
+@benchmark("finalmerge")
+def bench_finalmerge(ctx):
+    import finalmerge
+
+    folder = ctx.folder("finalmerge", "xlsx")
+    xml_path = os.path.join(ctx.folder("finalmerge"), "CORPCODE.xml")
+    with open(xml_path, "w", encoding="utf-8") as f:
+        f.write(ctx.pages.corpcode_xml())
+
+    names = [company["corp_name"] for company in ctx.pages.companies()]
+    for i, company in enumerate(ctx.pages.companies()):
+        rows = [{"종목명": company["corp_name"], "대분류": "밸류체인", "중분류": role, "소분류": "원재료",
+                 "연관기업": names[(i + k) % len(names)] + ("" if k % 3 else " 주식회사")}
+                for k, role in enumerate(["공급처", "판매처"] * 5, start=1)]
+        pd.DataFrame(rows).to_excel(os.path.join(folder, f"{company['stock_code']}.xlsx"), index=False)
+
+    finalmerge.folder_path = folder
+    finalmerge.XML_FILE = xml_path
+    finalmerge.OUTPUT_BACKEND = "excel"
+    merged_path = os.path.join(folder, "merged_result.xlsx")
+
+    def remove_previous():
+        if os.path.exists(merged_path):
+            os.remove(merged_path)
+
+    timing, final_df = measure(finalmerge.merge_all, ctx.args.repeat, setup=remove_previous)
+    return {"files": len(names), "rows": len(final_df), "workers": finalmerge.MAX_WORKERS,
+            "matched": int((final_df["연관종목코드"] != "").sum()), "merge_all": timing}
+
+
+@benchmark("value_chain_graph")
+def bench_value_chain_graph(ctx):
+    import random
+    from value_chain_graph import ValueChainGraph
+
+    # 상장사 n개 + 비상장 거래처 n/2개, 상장사마다 공급처/판매처 4~12행
+    n = ctx.args.graph_companies
+    rng = random.Random(ctx.args.seed)
+    rows = []
+    for i in range(n):
+        for _ in range(rng.randint(4, 12)):
+            j = rng.randrange(n + n // 2)
+            rows.append({"종목명": f"기업{i}", "중분류": rng.choice(["공급처", "판매처"]), "연관기업": f"기업{j}",
+                         "종목코드": f"{100000 + i:06d}", "연관종목코드": f"{100000 + j:06d}" if j < n else ""})
+    df = pd.DataFrame(rows)
+    path = os.path.join(ctx.folder("value_chain_graph"), "graph")
+
+    build, graph = measure(lambda: ValueChainGraph.build(df), ctx.args.repeat)
+    graph.save(path)
+    load, graph = measure(lambda: ValueChainGraph.load(path), ctx.args.repeat)
+    nodes = [f"{100000 + rng.randrange(n):06d}" for _ in range(50)]
+    upstream, _ = measure(lambda: [graph.upstream(node, hops=3) for node in nodes], ctx.args.repeat)
+    path_query, _ = measure(lambda: [graph.shortest_path(a, b) for a, b in zip(nodes, reversed(nodes))], ctx.args.repeat)
+    exposure, _ = measure(lambda: [graph.exposure(node, hops=3) for node in nodes], ctx.args.repeat)
+
+    # 종목 1%만 바뀐 병합 결과로 증분 갱신
+    changed = df.copy()
+    targets = changed["종목코드"].isin({f"{100000 + i:06d}" for i in range(0, n, 100)})
+    changed.loc[targets, "연관기업"] = changed.loc[targets, "연관기업"] + "B"
+    changed.loc[targets, "연관종목코드"] = ""
+    update, _ = measure(lambda: ValueChainGraph.load(path, mmap=False).update(changed), ctx.args.repeat)
+    return {"companies": n, "rows": len(df), "nodes": graph.n_nodes, "edges": graph.n_edges, "queries": len(nodes),
+            "build": build, "load": load, "upstream_3hop": upstream, "shortest_path": path_query,
+            "exposure_3hop": exposure, "update_1pct": update}
+
+
+# ✅ 전체 시장 공시 목록
+@benchmark("list_disclosures_bulk")
+def bench_list_disclosures_bulk(ctx):
+    import dart_list
+
+    dart_list.OPENDART_LIST_URL = f"{ctx.base_url}/api/list.json"
+    timing, listing = measure(lambda: dart_list.list_disclosures_bulk("standin", "2024-01-01", "2024-12-31", "I"),
+                              ctx.args.repeat)
+    return {"rows": len(listing), "windows": len(dart_list.date_windows("2024-01-01", "2024-12-31")), "list": timing}
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except OSError:
+        return "unknown", False
+    return sha or "unknown", dirty
+
+
+def run_all(args):
+    pages = FixturePages(n_companies=max(args.items, args.gpt_items), seed=args.seed)
+    server = serve(port=0, batch_delay=0.0, fail_rate=args.fail_rate, seed=args.seed, latency=args.latency,
+                   jitter=args.jitter, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, pages=pages)
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("compare", "output", "only")},
+        "benchmarks": {},
+    }
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ctx = Context(args, server, pages, tmp_dir)
+            for name, fn in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                print(f"▶️ {name} ...", end=" ", flush=True)
+                try:
+                    result = fn(ctx)
+                except ImportError as e:
+                    result = {"skipped": f"{type(e).__name__}: {e}"}
+                report["benchmarks"][name] = result
+                print(result.get("skipped") or "완료")
+        report["server"] = dict(ctx.state.counts)
+    finally:
+        server.shutdown()
+    return report
+
+
+def iter_timings(results, prefix=""):
+    """(이름, 측정값) 목록 — measure() 결과가 들어 있는 모든 위치"""
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if "median_s" in value:
+                yield prefix + key, value
+            else:
+                yield from iter_timings(value, f"{prefix}{key}.")
+
+
+def print_report(report, previous=None):
+    old = dict(iter_timings(previous["benchmarks"])) if previous else {}
+    for name, timing in iter_timings(report["benchmarks"]):
+        line = f"{name:45s} 중앙값 {timing['median_s'] * 1000:10.1f}ms  최소 {timing['best_s'] * 1000:10.1f}ms"
+        if name in old and old[name]["median_s"]:
+            line += f"  (이전 대비 {timing['median_s'] / old[name]['median_s']:.2f}배)"
+        print(line)
+    for name, result in report["benchmarks"].items():
+        if "skipped" in result:
+            print(f"{name:45s} 건너뜀 ({result['skipped']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오프라인 벤치마크 (대체 서버 + fixture)")
+    parser.add_argument("--only", nargs="*", help=f"실행할 벤치마크 ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--items", type=int, default=20, help="보고서/공시 개수")
+    parser.add_argument("--gpt-items", type=int, default=20, help="GPT 요청 개수")
+    parser.add_argument("--dedup-rows", type=int, default=20000)
+    parser.add_argument("--graph-companies", type=int, default=3000, help="밸류체인 그래프 상장사 수")
+    parser.add_argument("--latency", type=float, default=0.02, help="대체 서버 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="429 주입 비율")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--web-rate", type=float, default=50.0, help="dart.fss.or.kr 요청 시작 속도(초당)")
+    parser.add_argument("--gpt-rpm", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmarks/results/<시각>_<커밋>.json)")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    report = run_all(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{report['commit']}{'-dirty' if report['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\n▶️ 비교 기준: {previous['commit']} ({previous['timestamp']})")
+        changed = {k: (previous["settings"].get(k), v) for k, v in report["settings"].items()
+                   if previous["settings"].get(k) != v}
+        if changed:
+            print(f"⚠️ 설정이 다름 (이전, 현재): {changed}")
+    print_report(report, previous)
+    print(f"✅ 결과 저장: {output}")
@@ -0,0 +1,96 @@
+import math
+import re
+
+from token_budget import segment_token_counts
+
+# ▶️ 공급처/판매처가 언급될 가능성이 높은 단어 (가중치)
+QUERY_TERMS = {
+    "매입처": 3.0,
+    "매출처": 3.0,
+    "주요 고객": 3.0,
+    "주요고객": 3.0,
+    "판매처": 2.5,
+    "공급처": 2.5,
+    "거래처": 2.0,
+    "구매처": 2.0,
+    "납품": 1.5,
+    "공급": 1.0,
+    "고객": 1.0,
+    "원재료": 1.0,
+    "계약상대": 2.0,
+    "수주": 1.0,
+    "(주)": 0.5,
+    "㈜": 0.5,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+SENTENCE_SPLIT_RE = re.compile(r"(?<=다\.)|(?<=[.!?。])\s+")
+MIN_LINES_FOR_LINE_SPLIT = 5  # ▶️ 줄이 이보다 적으면 (개행 없는 본문) 문장 단위로 분할
+
+
+def split_paragraphs(text):
+    """▶️ 본문을 문단(줄) 단위로 분할, 개행이 거의 없으면 문장 단위로 분할"""
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    if len(lines) >= MIN_LINES_FOR_LINE_SPLIT:
+        return lines
+    return [part.strip() for part in SENTENCE_SPLIT_RE.split(text) if part and part.strip()]
+
+
+def table_to_lines(table):
+    """▶️ proc_xml이 만든 표(행 dict 목록)를 행마다 "열: 값 | 열: 값" 한 줄로 변환"""
+    lines = []
+    for row in table:
+        cells = [f"{k}: {v}" for k, v in row.items() if v is not None and str(v) not in ("", "nan")]
+        if cells:
+            lines.append(" | ".join(cells))
+    return lines
+
+
+def bm25_scores(units, terms=QUERY_TERMS):
+    """▶️ 단위(문단/표 행)별 BM25 점수 (질의어 부분 문자열 빈도 기준, 기업 1곳의 문서 안에서 idf 계산)"""
+    n_units = len(units)
+    if n_units == 0:
+        return []
+    avg_len = sum(len(u) for u in units) / n_units or 1.0
+    tf = [{t: u.count(t) for t in terms} for u in units]
+    df = {t: sum(1 for counts in tf if counts[t]) for t in terms}
+
+    scores = []
+    for unit, counts in zip(units, tf):
+        score = 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(unit) / avg_len)
+        for t, weight in terms.items():
+            if counts[t]:
+                idf = math.log(1 + (n_units - df[t] + 0.5) / (df[t] + 0.5))
+                score += weight * idf * counts[t] * (BM25_K1 + 1) / (counts[t] + norm)
+        scores.append(score)
+    return scores
+
+
+def pack_context(sections, max_tokens, tokenizer):
+    """▶️ 점수가 높은 문단/표 행부터 토큰 한도까지 담고, 남는 예산은 문서 순서대로 채움
+
+    반환: (압축된 본문, 원래 토큰 수, 압축 후 토큰 수) — 선택된 단위는 원래 순서로 이어 붙임
+    """
+    units = []
+    for sec in sections:
+        units.extend(split_paragraphs(sec.get("text", "")))
+        for table in sec.get("tables", []):
+            units.extend(table_to_lines(table))
+
+    joined, unit_tokens = segment_token_counts(units, tokenizer)  # ▶️ 전체를 한 번만 인코딩 (줄바꿈은 앞 단위에 포함)
+    original_tokens = sum(unit_tokens)
+    if original_tokens <= max_tokens:
+        return joined, original_tokens, original_tokens
+
+    scores = bm25_scores(units)
+    ranked = sorted((i for i in range(len(units)) if scores[i] > 0), key=lambda i: (-scores[i], i))
+    rest = [i for i in range(len(units)) if scores[i] <= 0]
+
+    selected, used = set(), 0
+    for i in ranked + rest:
+        if used + unit_tokens[i] <= max_tokens:
+            selected.add(i)
+            used += unit_tokens[i]
+
+    return "\n".join(units[i] for i in sorted(selected)), original_tokens, used
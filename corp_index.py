@@ -0,0 +1,116 @@
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from dedup import FuzzyDeduper, ngrams, normalize_name
+
+INDEX_VERSION = 1
+RESOLVE_THRESHOLD = 0.9  # ▶️ 유사 이름 매칭 기준 (중복 제거보다 엄격하게)
+
+
+def _fingerprint(*paths):
+    """▶️ 원본 파일(zip, xml)의 크기·수정 시각 → 바뀌면 색인 재생성"""
+    result = []
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            result.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return result
+
+
+class CorpIndex:
+    """▶️ CORPCODE.xml 색인: 종목코드/고유번호 → 기업명, 기업명 → 코드, 유사 기업명 검색
+
+    상장사와 비상장사 이름이 같으면 상장사를 우선함
+    """
+
+    def __init__(self, corp_codes, corp_names, stock_codes, eng_names):
+        self.corp_codes = corp_codes
+        self.corp_names = corp_names
+        self.stock_codes = stock_codes
+        self.eng_names = eng_names
+        self.by_stock = {code: i for i, code in enumerate(stock_codes) if code}
+        self.by_corp = {code: i for i, code in enumerate(corp_codes)}
+        self.by_name = {}
+        for i in sorted(range(len(corp_names)), key=lambda i: not stock_codes[i]):
+            for name in (corp_names[i], eng_names[i]):
+                if name:
+                    self.by_name.setdefault(normalize_name(name), i)
+        self._fuzzy = None
+
+    @classmethod
+    def from_xml(cls, xml_file):
+        corp_codes, corp_names, stock_codes, eng_names = [], [], [], []
+        for corp in ET.parse(xml_file).getroot().findall("list"):
+            corp_codes.append((corp.findtext("corp_code") or "").strip())
+            corp_names.append((corp.findtext("corp_name") or "").strip())
+            stock_codes.append((corp.findtext("stock_code") or "").strip())
+            eng_names.append((corp.findtext("corp_eng_name") or "").strip())
+        return cls(corp_codes, corp_names, stock_codes, eng_names)
+
+    @classmethod
+    def load(cls, xml_file, zip_file=None, cache_path=None):
+        """▶️ 저장된 색인(pickle)을 읽고, 없거나 원본이 바뀌었으면 XML을 파싱해 다시 저장"""
+        cache_path = cache_path or f"{xml_file}.idx.pkl"
+        fingerprint = _fingerprint(zip_file, xml_file)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as f:
+                    cached = pickle.load(f)
+                if cached["version"] == INDEX_VERSION and cached["fingerprint"] == fingerprint:
+                    return cached["index"]
+            except Exception as e:
+                print(f"⚠️ 기업 코드 색인 읽기 실패, 다시 생성: {e}")
+
+        index = cls.from_xml(xml_file)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": INDEX_VERSION, "fingerprint": fingerprint, "index": index}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        return index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_fuzzy"] = None  # ✅ 유사 검색 색인은 필요할 때 생성
+        return state
+
+    def stock_to_name(self):
+        return {self.stock_codes[i]: self.corp_names[i] for i in self.by_stock.values()}
+
+    def listed_eng_aliases(self):
+        """▶️ 상장사 영문명 → 한글 기업명"""
+        return {self.eng_names[i]: self.corp_names[i] for i in self.by_stock.values() if self.eng_names[i]}
+
+    def name(self, code):
+        """종목코드(6자리) 또는 고유번호(8자리) → 기업명"""
+        i = self.by_stock.get(code, self.by_corp.get(code))
+        return None if i is None else self.corp_names[i]
+
+    def _record(self, i, score):
+        return {"corp_name": self.corp_names[i], "stock_code": self.stock_codes[i],
+                "corp_code": self.corp_codes[i], "score": score}
+
+    def lookup(self, name):
+        """정규화 이름이 정확히 같은 기업 (없으면 None)"""
+        i = self.by_name.get(normalize_name(name))
+        return None if i is None else self._record(i, 1.0)
+
+    def fuzzy(self, name, threshold=RESOLVE_THRESHOLD):
+        """유사도가 가장 높은 기업 (기준 미만이면 None), 첫 호출 시 n-gram 색인 생성"""
+        if self._fuzzy is None or self._fuzzy[0].threshold != threshold:
+            keys = list(self.by_name)
+            matcher = FuzzyDeduper(threshold, gram_counts=Counter(g for key in keys for g in ngrams(key)))
+            for key in keys:
+                matcher.add("", key)
+            self._fuzzy = (matcher, [self.by_name[key] for key in keys])
+        matcher, positions = self._fuzzy
+        best = matcher.best_match("", normalize_name(name))
+        return None if best is None else self._record(positions[best[0]], best[1])
+
+    def resolve(self, name, threshold=RESOLVE_THRESHOLD):
+        """정확 매칭 → 유사 매칭 순으로 기업 찾기"""
+        if not isinstance(name, str) or not name.strip():
+            return None
+        return self.lookup(name) or self.fuzzy(name, threshold)
@@ -0,0 +1,178 @@
+import re
+from collections import deque
+
+from dedup import normalize_name
+
+# ▶️ 역할(공급처/판매처) 판단용 키워드
+SUPPLIER_KEYWORDS = ["매입처", "공급처", "구매처", "공급사", "공급업체", "매입", "원재료", "조달"]
+BUYER_KEYWORDS = ["매출처", "판매처", "납품처", "주요 고객", "주요고객", "고객사", "고객", "거래처", "수주", "납품"]
+KEYWORD_ROLES = {**{kw: "suppliers" for kw in SUPPLIER_KEYWORDS}, **{kw: "buyers" for kw in BUYER_KEYWORDS}}
+KEYWORD_RE = re.compile("|".join(re.escape(kw) for kw in sorted(KEYWORD_ROLES, key=len, reverse=True)))
+CATEGORY_COLUMNS = ["품목", "품 목", "원재료", "제품", "구분", "매출유형", "용도"]
+
+CONTEXT_WINDOW = 40  # ▶️ 본문 매칭 앞뒤로 키워드를 찾을 글자 수
+MIN_TEXT_NAME_LEN = 3  # ▶️ 본문에서는 3글자 이상 기업명만 매칭 (2글자는 일반 단어와 겹치는 경우가 많음)
+
+# ▶️ 근거별 신뢰도
+CONFIDENCE_TABLE = 1.0  # 표 안에서 역할이 분명한 열/행
+CONFIDENCE_TEXT_KEYWORD = 0.7  # 본문, 주변에 역할 키워드 있음
+CONFIDENCE_TEXT_SECTION = 0.3  # 본문, 섹션 제목으로만 역할 추정
+
+
+class AhoCorasick:
+    """▶️ 다중 패턴 문자열 매칭 오토마톤 (텍스트 길이에 비례하는 시간으로 모든 기업명을 한 번에 탐색)"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.built = False
+
+    def add(self, pattern, value):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = nxt
+        self.output[node].append((len(pattern), value))
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if node else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+        self.built = True
+
+    def find_all(self, text):
+        """(시작, 끝, value) 목록 (겹치는 매칭 모두 포함)"""
+        if not self.built:
+            self.build()
+        node = 0
+        matches = []
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.output[node]:
+                matches.append((i - length + 1, i + 1, value))
+        return matches
+
+    def find_longest(self, text):
+        """겹치는 매칭 중 왼쪽부터 가장 긴 것만 남김"""
+        result, last_end = [], -1
+        for start, end, value in sorted(self.find_all(text), key=lambda m: (m[0], -(m[1] - m[0]))):
+            if start >= last_end:
+                result.append((start, end, value))
+                last_end = end
+        return result
+
+
+class CounterpartyMatcher:
+    """▶️ 상장사 이름/별칭 사전으로 본문과 표에서 공급처·판매처 후보를 찾는 결정적 추출기"""
+
+    def __init__(self, stock_to_name, aliases=None):
+        self.names = {}  # 정규화 이름 → 대표 기업명
+        self.automaton = AhoCorasick()
+        for name in list(stock_to_name.values()) + list((aliases or {}).keys()):
+            canonical = (aliases or {}).get(name, name)
+            key = normalize_name(name)
+            if len(key) < 2 or key in self.names:
+                continue
+            self.names[key] = canonical
+            if len(key) >= MIN_TEXT_NAME_LEN:
+                self.automaton.add(key, canonical)
+        self.automaton.build()
+
+    @staticmethod
+    def _role_from_text(text):
+        """키워드 위치로 역할 추정 (가장 가까운 키워드 기준), 없으면 None"""
+        best = None
+        center = len(text) // 2
+        for m in KEYWORD_RE.finditer(text):
+            distance = abs(m.start() - center)
+            if best is None or distance < best[0]:
+                best = (distance, KEYWORD_ROLES[m.group()])
+        return best[1] if best else None
+
+    def _match_table(self, table, section_role, own_key, found):
+        for row in table:
+            header_role = self._role_from_text(" ".join(str(k) for k in row.keys()))
+            category = next((str(v) for k, v in row.items()
+                             if any(c in str(k) for c in CATEGORY_COLUMNS) and str(v) not in ("", "nan")), None)
+            for column, value in row.items():
+                value_key = normalize_name(value)
+                if not value_key or value_key == own_key:
+                    continue
+                role = self._role_from_text(str(column)) or header_role
+                # ▶️ 셀 전체가 기업명이면 2글자 이름도 인정, 아니면 셀 안에서 긴 이름 탐색
+                if value_key in self.names:
+                    companies = [self.names[value_key]]
+                else:
+                    companies = [c for _, _, c in self.automaton.find_longest(value_key)]
+                for company in companies:
+                    if normalize_name(company) == own_key:
+                        continue
+                    confidence = CONFIDENCE_TABLE if role else CONFIDENCE_TEXT_SECTION
+                    self._add(found, role or section_role, category, company, confidence)
+
+    def _match_text(self, text, section_role, own_key, found):
+        for start, end, company in self.automaton.find_longest(text):
+            if normalize_name(company) == own_key:
+                continue
+            window = text[max(0, start - CONTEXT_WINDOW):end + CONTEXT_WINDOW]
+            role = self._role_from_text(window)
+            confidence = CONFIDENCE_TEXT_KEYWORD if role else CONFIDENCE_TEXT_SECTION
+            self._add(found, role or section_role, None, company, confidence)
+
+    @staticmethod
+    def _add(found, role, category, company, confidence):
+        if role is None:
+            return
+        key = (role, company)
+        entry = found.get(key)
+        if entry is None or confidence > entry["confidence"]:
+            found[key] = {"role": role, "category": category, "company": company, "confidence": confidence}
+        elif entry["category"] is None and category:
+            entry["category"] = category
+
+    def extract(self, company_name, sections):
+        """▶️ ({"suppliers": [...], "buyers": [...]} GPT 결과와 같은 항목 형식, 신뢰도 0~1, 표 근거 항목 수) 반환
+
+        신뢰도 = 찾은 항목들의 근거 신뢰도 평균 (항목이 없으면 0, 항목 수는 반영하지 않음)
+        표 근거 항목 수 = 표 안에서 역할이 분명한 열/행으로 찾은 항목 수 (GPT 생략 여부 판단용)
+        업종은 판단하지 않음 (main_gpt가 이전 GPT 결과나 짧은 분류 요청으로 채움)
+        """
+        own_key = normalize_name(company_name)
+        found = {}
+        for sec in sections:
+            title = sec.get("title", "")
+            section_role = "suppliers" if "원재료" in title else "buyers" if "매출" in title else None
+            self._match_text(normalize_text(sec.get("text", "")), section_role, own_key, found)
+            for table in sec.get("tables", []):
+                self._match_table(table, section_role, own_key, found)
+
+        result = {"suppliers": [], "buyers": []}
+        for entry in found.values():
+            default_category = "원재료" if entry["role"] == "suppliers" else "제품"
+            result[entry["role"]].append({"category": entry["category"] or default_category,
+                                          "company": entry["company"]})
+
+        confidence = sum(e["confidence"] for e in found.values()) / len(found) if found else 0.0
+        table_hits = sum(1 for e in found.values() if e["confidence"] >= CONFIDENCE_TABLE)
+        return result, confidence, table_hits
+
+
+def normalize_text(text):
+    """▶️ 본문도 기업명 사전과 같은 방식으로 정규화 (dedup.normalize_name: 법인 표기·공백·구두점 제거, 소문자, 약칭 통일)"""
+    return normalize_name(text)
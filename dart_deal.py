@@ -4,10 +4,15 @@ import pandas as pd
 import OpenDartReader
 from tqdm import tqdm
 from datetime import datetime as dt, timedelta
-import requests
 from bs4 import BeautifulSoup
 import re
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dart_http import call_opendart, http_get
+from doc_cache import DocCache, MappingCache
+from dart_list import list_disclosures_bulk, group_by_stock_code
+from run_state import RunState
+from output_store import OutputStore, write_excel_atomic
+from metrics import metrics, init_from_cli
 
 warnings.filterwarnings('ignore')
 
@@ -17,35 +22,69 @@ new_project_dir = os.path.join(base_dir, "폴더 입력")
 
 # ✅ 저장할 폴더 경로
 new_data_dir = os.path.join(new_project_dir, "결과물 폴더명 입력")
-os.makedirs(new_data_dir, exist_ok=True)  # ✅ 폴더 없으면 자동 생성
 
-print("✅ Script started...")
+# 📌 결과 저장 방식: "excel" = 기업별 .xlsx / "parquet" = 단계·종목별 Parquet 데이터셋 (smartmerge/finalmerge와 같은 경로 사용)
+OUTPUT_BACKEND = "excel"
+OUTPUT_STAGE = "deal"
+store_root = os.path.join(new_project_dir, "output_store")
+output_store = OutputStore(store_root) if OUTPUT_BACKEND == "parquet" else None
 
-# 📌 OpenDart API 설정
-api_key = 'DART API KEY'  # 🔴 실제 API 키 입력 필요
-dart = OpenDartReader(api_key)
+# 📌 동시 처리 기업 수 (웹 요청 속도는 dart_http의 적응형 제어기가 조절)
+MAX_WORKERS = 8
 
-# 📌 KOSPI 기업 리스트 로드
-list_df = pd.read_excel(os.path.join(base_dir, 'data', '02.mktcap_3000.xlsx'), sheet_name='list', index_col=0)
+# 📌 True면 전체 시장 공시 목록을 월 단위로 한 번에 받아 기업별로 나눔 (기업별 dart.company/dart.list 호출 생략)
+BULK_LISTING = True
+
+# 📌 True면 이미 처리한 공시(rcept_no)는 건너뛰고 새 공시만 추출하여 기존 엑셀에 추가
+INCREMENTAL = True
+state_path = os.path.join(new_project_dir, "run_state_deal.json")
+
+# 📌 DART 웹 주소 (벤치마크 시 standin_server.py 주소로 바꿔 오프라인 실행)
+DART_WEB_BASE = "https://dart.fss.or.kr"
+
+# 📌 공시 원문/dcmNo 캐시 (재실행 시 네트워크 대신 사용)
+cache_dir = os.path.join(new_project_dir, "dart_cache")
+doc_cache = DocCache(cache_dir)
+dcm_no_cache = MappingCache(os.path.join(cache_dir, "dcm_no.json"))
+metrics.track_cache("deal_doc_cache", lambda: doc_cache)
 
 def get_dcm_no(rcp_no):
     """📌 DART에서 dcmNo 찾기"""
-    main_url = f"https://dart.fss.or.kr/dsaf001/main.do?rcpNo={rcp_no}"
-    headers = {"User-Agent": "Mozilla/5.0"}
+    cached = dcm_no_cache.get(rcp_no)
+    if cached:
+        return cached
 
-    response = requests.get(main_url, headers=headers)
+    main_url = f"{DART_WEB_BASE}/dsaf001/main.do?rcpNo={rcp_no}"
+
+    response = http_get(main_url)
     soup = BeautifulSoup(response.text, 'html.parser')
 
     script_tag = soup.find("script", string=re.compile("viewDoc"))
     if script_tag:
         match = re.search(r'viewDoc\(".*?",\s*"(\d+)"', script_tag.text)
         if match:
+            dcm_no_cache.put(rcp_no, match.group(1))
             return match.group(1)
     return None
 
 def get_dart_document_url(rcp_no, dcm_no):
     """📌 DART 본문 HTML URL 가져오기"""
-    return f"https://dart.fss.or.kr/report/viewer.do?rcpNo={rcp_no}&dcmNo={dcm_no}&dtd=HTML"
+    return f"{DART_WEB_BASE}/report/viewer.do?rcpNo={rcp_no}&dcmNo={dcm_no}&dtd=HTML"
+
+def fetch_document_html(doc_url):
+    """📌 DART 본문 HTML 다운로드 (인코딩 자동 감지)"""
+    print(f"🔍 Fetching contract details from: {doc_url}")
+
+    response = http_get(doc_url)
+    if response.status_code != 200:
+        return ""  # ✅ 오류 페이지는 캐시하지 않음
+
+    # 🔹 인코딩 확인 및 설정
+    encoding = response.apparent_encoding
+    response.encoding = encoding
+    print(f"✅ Detected encoding: {encoding}")
+
+    return response.text
 
 def extract_contract_info(rcp_no):
     """📌 DART에서 계약 정보 추출"""
@@ -56,18 +95,8 @@ def extract_contract_info(rcp_no):
 
     doc_url = get_dart_document_url(rcp_no, dcm_no)
 
-    print(f"🔍 Fetching contract details from: {doc_url}")
-    time.sleep(3)
-
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(doc_url, headers=headers)
-
-    # 🔹 인코딩 확인 및 설정
-    encoding = response.apparent_encoding
-    response.encoding = encoding
-    print(f"✅ Detected encoding: {encoding}")
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+    html = doc_cache.get_or_fetch(f"viewer/{rcp_no}/{dcm_no}", lambda: fetch_document_html(doc_url))
+    soup = BeautifulSoup(html, 'html.parser')
 
     contract_info = {
         "contract_type": "",
@@ -94,55 +123,143 @@ def extract_contract_info(rcp_no):
 
     return contract_info
 
-def process_disclosures(Dart_df):
-    """📌 공시 데이터를 처리하여 개별 엑셀 파일로 저장"""
-    for i in tqdm(Dart_df.index):
-        try:
-            code = i[1:]
-
-            # ✅ 다트 API에서 기업명 가져오기
-            company_info = dart.company(code)
-            stock_name = company_info['corp_name'] if company_info is not None else "조회 실패"
-
-            enddate = dt.today().strftime('%Y-%m-%d')
-            startdate = (dt.today() - timedelta(days=3*365)).strftime('%Y-%m-%d')
-
-            result_list = dart.list(code, start=startdate, end=enddate, kind='I', final=False)
-            disclosures = result_list[result_list.report_nm.str.contains("공급계약체결")]
-
-            if disclosures.empty:
-                continue  # 🔹 공시가 없으면 다음 기업으로
-
-            extracted_reports = []
-            for _, result in disclosures.iterrows():
-                rcp_no = result['rcept_no']
-                contract_info = extract_contract_info(rcp_no)
-
-                # ✅ 엑셀 양식에 맞게 데이터 추가
-                extracted_reports.append({
-                    "종목명": stock_name,
-                    "대분류": contract_info["contract_type"],  # ✅ contract_type → 대분류
-                    "중분류": "판매처",  # ✅ "판매처"로 고정
-                    "소분류": contract_info["contract_name"],  # ✅ contract_name → 소분류
-                    "연관기업": contract_info["contract_party"],  # ✅ contract_party → 연관기업
-                })
-
-            # ✅ DataFrame 변환 및 중복 제거
-            df_result = pd.DataFrame(extracted_reports)
-
-            # ✅ 🔥 중복 제거 (대분류, 소분류, 연관기업이 동일한 경우)
-            df_result.drop_duplicates(subset=["대분류", "소분류", "연관기업"], keep="first", inplace=True)
-
-            # ✅ 공시 데이터가 있는 경우만 파일 저장
-            if not df_result.empty:
-                excel_output_path = os.path.join(new_data_dir, f"{code}.xlsx")  # ✅ 기업별 개별 파일 저장
-                df_result.to_excel(excel_output_path, index=False, engine="openpyxl")
-                print(f"✅ 저장 완료: {excel_output_path}")
-
-        except Exception as e:
-            print(f"❌ Error processing disclosures for {code}: {e}")
-            continue
-
-# ✅ 실행
-process_disclosures(list_df)
-print("✅ Data extraction complete.")
+def extraction_failed(contract_info):
+    """📌 dcmNo/본문 조회 실패 또는 빈 본문(비정상 응답) → 다음 증분 실행에서 다시 처리할 공시"""
+    return contract_info["contract_type"] == "조회 실패" or not any(contract_info.values())
+
+def get_date_range():
+    """📌 조회 기간 (최근 3년)"""
+    enddate = dt.today().strftime('%Y-%m-%d')
+    startdate = (dt.today() - timedelta(days=3*365)).strftime('%Y-%m-%d')
+    return startdate, enddate
+
+def list_company_disclosures(code):
+    """📌 한 기업의 기업명과 공급계약체결 공시 목록 조회 (기업별 API 호출)"""
+    # ✅ 다트 API에서 기업명 가져오기
+    company_info = call_opendart(dart.company, code)
+    stock_name = company_info['corp_name'] if company_info is not None else "조회 실패"
+
+    startdate, enddate = get_date_range()
+    result_list = call_opendart(dart.list, code, start=startdate, end=enddate, kind='I', final=False)
+    disclosures = result_list[result_list.report_nm.str.contains("공급계약체결")]
+    return stock_name, disclosures
+
+@metrics.timed("deal")
+def process_company(code, stock_name=None, disclosures=None, state=None):
+    """📌 한 기업의 공급계약체결 공시를 추출하여 엑셀 파일로 저장
+
+    disclosures를 넘기면 (일괄 조회 결과) 기업별 목록 조회를 건너뜀
+    state를 넘기면 이미 처리한 rcept_no는 건너뛰고, 결과를 기존 엑셀 파일에 추가
+    → 모든 공시를 추출·저장했으면 True (증분 실행에서는 추출에 실패한 공시를 저장·기록하지 않고 다음 실행에서 재시도)
+    """
+    try:
+        if disclosures is None:
+            stock_name, disclosures = list_company_disclosures(code)
+
+        seen = set(state.get(code, [])) if state is not None else set()
+        disclosures = disclosures[~disclosures['rcept_no'].isin(seen)]
+
+        if disclosures.empty:
+            return True  # 🔹 공시가 없으면 다음 기업으로
+
+        extracted_reports = []
+        succeeded = set()
+        for _, result in disclosures.iterrows():
+            rcp_no = result['rcept_no']
+            contract_info = extract_contract_info(rcp_no)
+            if not extraction_failed(contract_info):
+                succeeded.add(rcp_no)
+            elif state is not None:
+                continue
+
+            # ✅ 엑셀 양식에 맞게 데이터 추가
+            extracted_reports.append({
+                "종목명": stock_name,
+                "대분류": contract_info["contract_type"],  # ✅ contract_type → 대분류
+                "중분류": "판매처",  # ✅ "판매처"로 고정
+                "소분류": contract_info["contract_name"],  # ✅ contract_name → 소분류
+                "연관기업": contract_info["contract_party"],  # ✅ contract_party → 연관기업
+            })
+
+        # ✅ DataFrame 변환 및 중복 제거
+        df_result = pd.DataFrame(extracted_reports, columns=["종목명", "대분류", "중분류", "소분류", "연관기업"])
+
+        # ✅ 증분 실행이면 기존 결과 뒤에 새 공시를 이어 붙임
+        excel_output_path = os.path.join(new_data_dir, f"{code}.xlsx")  # ✅ 기업별 개별 파일 저장
+        if state is not None and output_store is not None:
+            existing = output_store.read(OUTPUT_STAGE, code)
+            if existing is not None:
+                df_result = pd.concat([existing.drop(columns=["종목코드"]), df_result], ignore_index=True)
+        elif state is not None and os.path.exists(excel_output_path):
+            df_result = pd.concat([pd.read_excel(excel_output_path), df_result], ignore_index=True)
+
+        # ✅ 🔥 중복 제거 (대분류, 소분류, 연관기업이 동일한 경우)
+        df_result.drop_duplicates(subset=["대분류", "소분류", "연관기업"], keep="first", inplace=True)
+
+        # ✅ 공시 데이터가 있는 경우만 파일 저장
+        if not df_result.empty and output_store is not None:
+            output_store.write(OUTPUT_STAGE, code, df_result)
+            print(f"✅ 저장 완료: {OUTPUT_STAGE}/{code}")
+        elif not df_result.empty:
+            write_excel_atomic(df_result, excel_output_path)
+            print(f"✅ 저장 완료: {excel_output_path}")
+
+        if state is not None and succeeded:
+            state.set(code, sorted(seen | succeeded))
+        return len(succeeded) == len(disclosures)
+
+    except Exception as e:
+        metrics.error("deal")
+        print(f"❌ Error processing disclosures for {code}: {e}")
+        return False
+
+def process_disclosures(Dart_df, max_workers=MAX_WORKERS, bulk=BULK_LISTING, incremental=INCREMENTAL):
+    """📌 공시 데이터를 처리하여 개별 엑셀 파일로 저장 (기업 단위 동시 처리)"""
+    codes = [i[1:] for i in Dart_df.index]
+    state = RunState(state_path) if incremental else None
+
+    if bulk:
+        # ✅ 전체 시장 공시 목록을 한 번에 받아 종목코드로 매칭 (기업명도 같은 목록에서 사용)
+        # ✅ 증분 실행이면 마지막 동기화 날짜 이후 공시만 조회
+        startdate, enddate = get_date_range()
+        if state is not None and state.last_sync:
+            startdate = state.last_sync
+        listing = list_disclosures_bulk(dart.api_key, startdate, enddate, kind='I')
+        groups = group_by_stock_code(listing, codes, pattern="공급계약체결")
+        print(f"✅ 일괄 조회 완료: 공시 {len(listing)}건 중 대상 기업 {len(groups)}개")
+        jobs = [(code, group["corp_name"].iloc[0], group, state) for code, group in groups.items()]
+    else:
+        jobs = [(code, None, None, state) for code in codes]
+
+    if max_workers <= 1:
+        results = [process_company(*job) for job in tqdm(jobs)]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(process_company, *job) for job in jobs]
+            results = [future.result() for future in tqdm(as_completed(futures), total=len(futures))]
+
+    if state is not None:
+        # ✅ 실패한 기업이 있으면 마지막 동기화 날짜를 유지 (다음 일괄 조회가 같은 기간을 다시 받아 재시도)
+        failed = results.count(False)
+        if failed:
+            print(f"⚠️ {failed}개 기업 처리 실패: 마지막 동기화 날짜 유지 ({state.last_sync})")
+        else:
+            state.last_sync = dt.today().strftime('%Y-%m-%d')
+        state.save()
+
+if __name__ == "__main__":
+    init_from_cli("deal")  # ✅ 실행 지표 (--metrics-dir, --profile cprofile|sample)
+    os.makedirs(new_data_dir, exist_ok=True)  # ✅ 폴더 없으면 자동 생성
+
+    print("✅ Script started...")
+
+    # 📌 OpenDart API 설정
+    api_key = 'DART API KEY'  # 🔴 실제 API 키 입력 필요
+    dart = OpenDartReader(api_key)
+
+    # 📌 KOSPI 기업 리스트 로드
+    list_df = pd.read_excel(os.path.join(base_dir, 'data', '02.mktcap_3000.xlsx'), sheet_name='list', index_col=0)
+
+    # ✅ 실행
+    process_disclosures(list_df)
+    print("✅ Data extraction complete.")
@@ -0,0 +1,156 @@
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+
+# 📌 OpenDART 호출 한도 설정 (키 1개 기준)
+# - 일 20,000건 한도, 분당 과도한 호출 시 일시 차단되므로 분당 요청 수를 제한
+OPENDART_REQUESTS_PER_MIN = 600
+OPENDART_BURST = 10
+
+
+class TokenBucket:
+    """📌 스레드 안전 토큰 버킷 (초당 rate 개 충전, 최대 capacity 개 저장)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """토큰이 생길 때까지 대기 후 소비, 대기한 시간(초)을 반환"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+# ✅ 같은 프로세스 안의 모든 OpenDART 호출이 공유하는 리미터
+opendart_limiter = TokenBucket(OPENDART_REQUESTS_PER_MIN / 60.0, OPENDART_BURST)
+
+
+def call_opendart(func, *args, **kwargs):
+    """📌 OpenDartReader 호출을 공용 리미터를 거쳐 실행"""
+    metrics.rate_limit_wait("opendart", opendart_limiter.acquire())
+    with metrics.request("opendart.fss.or.kr"):
+        return func(*args, **kwargs)
+
+
+# 📌 dart.fss.or.kr 웹 페이지 요청용 적응형 속도 제어 설정
+WEB_INITIAL_RATE = 2.0   # 초당 요청 수 시작값
+WEB_MIN_RATE = 0.2
+WEB_MAX_RATE = 10.0
+WEB_MAX_RETRIES = 5
+WEB_POOL_SIZE = 16
+WEB_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class AdaptiveRateController:
+    """📌 성공 시 속도를 조금씩 올리고, 429/5xx 응답 시 절반으로 줄이는 속도 제어기 (AIMD)"""
+
+    def __init__(self, initial_rate=WEB_INITIAL_RATE, min_rate=WEB_MIN_RATE, max_rate=WEB_MAX_RATE,
+                 increase=0.1, decrease=0.5):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.bucket = TokenBucket(initial_rate, 1)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def wait(self):
+        """다음 요청을 보내도 될 때까지 대기, 대기한 시간(초)을 반환"""
+        with self.lock:
+            pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        return max(pause, 0.0) + self.bucket.acquire()
+
+    def on_success(self):
+        with self.bucket.lock:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        with self.bucket.lock:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate * self.decrease)
+        if retry_after:
+            with self.lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """📌 keep-alive 연결을 재사용하는 공용 requests 세션 (스레드 간 공유)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=WEB_POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers.update(WEB_HEADERS)
+        return _session
+
+
+web_controller = AdaptiveRateController()
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def http_get(url, controller=None, max_retries=WEB_MAX_RETRIES, **kwargs):
+    """📌 공용 세션 + 적응형 속도 제어로 GET 요청 (429/5xx, 연결 오류 시 백오프 후 재시도)"""
+    controller = controller or web_controller
+    kwargs.setdefault("timeout", 30)
+    session = get_session()
+    host = urlsplit(url).netloc
+
+    for attempt in range(max_retries + 1):
+        metrics.rate_limit_wait("web", controller.wait())
+        try:
+            with metrics.request(host) as record:
+                response = session.get(url, **kwargs)
+                record["status"] = response.status_code
+        except requests.RequestException:
+            metrics.retry("web", "connection")
+            if attempt == max_retries:
+                raise
+            controller.on_throttle(2 ** attempt)
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            metrics.retry("web", "rate_limit" if response.status_code == 429 else "server_error")
+            if attempt == max_retries:
+                response.raise_for_status()
+            controller.on_throttle(_retry_after_seconds(response) or 2 ** attempt)
+            continue
+
+        controller.on_success()
+        return response
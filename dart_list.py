@@ -0,0 +1,80 @@
+import pandas as pd
+from datetime import datetime as dt, timedelta
+from dateutil.relativedelta import relativedelta
+from dart_http import call_opendart, get_session
+
+# 📌 OpenDART 공시검색 API (corp_code 없이 조회하면 전체 시장 공시, 기간은 최대 3개월)
+OPENDART_LIST_URL = "https://opendart.fss.or.kr/api/list.json"
+PAGE_COUNT = 100
+
+
+def date_windows(start, end, freq="M"):
+    """📌 조회 기간을 월('M') 또는 일('D') 단위 구간으로 분할"""
+    start_dt = dt.strptime(start, '%Y-%m-%d')
+    end_dt = dt.strptime(end, '%Y-%m-%d')
+    step = relativedelta(months=1) if freq == "M" else timedelta(days=1)
+
+    windows = []
+    cur = start_dt
+    while cur <= end_dt:
+        nxt = min(cur + step - timedelta(days=1), end_dt)
+        windows.append((cur.strftime('%Y%m%d'), nxt.strftime('%Y%m%d')))
+        cur = nxt + timedelta(days=1)
+    return windows
+
+
+def list_window(api_key, bgn_de, end_de, kind, final=False):
+    """📌 한 구간의 전체 시장 공시 목록 (페이지 단위로 끝까지 조회)"""
+    session = get_session()
+    rows = []
+    page_no = 1
+
+    while True:
+        params = {
+            "crtfc_key": api_key,
+            "bgn_de": bgn_de,
+            "end_de": end_de,
+            "pblntf_ty": kind,
+            "last_reprt_at": "Y" if final else "N",
+            "page_no": page_no,
+            "page_count": PAGE_COUNT,
+        }
+        jo = call_opendart(session.get, OPENDART_LIST_URL, params=params, timeout=30).json()
+
+        if jo["status"] == "013":  # ✅ 조회된 데이터 없음
+            break
+        if jo["status"] != "000":
+            raise ValueError(f"OpenDART list 오류 ({jo['status']}): {jo.get('message')}")
+
+        rows.extend(jo["list"])
+        if page_no >= int(jo["total_page"]):
+            break
+        page_no += 1
+
+    return rows
+
+
+def list_disclosures_bulk(api_key, start, end, kind, final=False, freq="M"):
+    """📌 기간 내 전체 시장 공시 목록을 한 번에 조회 (기업별 dart.list 호출 대체)
+
+    결과 컬럼은 dart.list와 동일 (corp_code, corp_name, stock_code, report_nm, rcept_no, rcept_dt, ...)
+    이며, dart.list처럼 최신 공시가 먼저 오도록 rcept_no 내림차순 정렬
+    """
+    rows = []
+    for bgn_de, end_de in date_windows(start, end, freq):
+        rows.extend(list_window(api_key, bgn_de, end_de, kind, final))
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=["corp_code", "corp_name", "stock_code", "report_nm", "rcept_no", "rcept_dt"])
+
+    df = df.drop_duplicates(subset="rcept_no")
+    return df.sort_values(by="rcept_no", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def group_by_stock_code(listing, codes, pattern=None):
+    """📌 종목코드 목록에 해당하는 공시만 남기고 (report_nm 패턴 필터 포함) 종목코드별로 분할"""
+    mask = listing["stock_code"].isin(set(codes))
+    if pattern:
+        mask &= listing["report_nm"].str.contains(pattern, na=False)
+    return {code: group.reset_index(drop=True) for code, group in listing[mask].groupby("stock_code", sort=False)}
@@ -7,7 +7,21 @@ from dateutil.relativedelta import relativedelta
 from datetime import datetime as dt
 from bs4 import BeautifulSoup
 import urllib.request as urlreq
+from urllib.parse import urlsplit
 import json
+import queue
+import threading
+from io import StringIO
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dart_http import call_opendart
+from doc_cache import DocCache
+from dart_list import list_disclosures_bulk, group_by_stock_code
+from run_state import RunState
+from report_xml import proc_xml_fast
+from report_store import ReportStore
+from metrics import metrics, init_from_cli
 
 warnings.filterwarnings('ignore')
 
@@ -16,16 +30,55 @@ base_dir = os.path.abspath("폴더 경로 설정")
 new_project_dir = os.path.join(base_dir, "코드")
 new_data_dir = os.path.join(new_project_dir, "mktcap_3000_사업보고서_json")
 
-# 📌 새로운 폴더 생성 (없으면 생성)
-os.makedirs(new_data_dir, exist_ok=True)
+# 📌 동시 조회 스레드 수 (1이면 기존처럼 순차 실행)
+MAX_WORKERS = 8
 
-def text_output(url_link):
-    """URL에서 HTML 내용을 가져와 텍스트로 변환"""
-    url_open = urlreq.urlopen(url_link).read()
-    soup = BeautifulSoup(url_open, 'html5lib')
+# 📌 True면 최근 12개월 전체 시장 정기공시 목록을 한 번에 받아 기업별로 나눔 (기업별 dart.list 호출 생략)
+BULK_LISTING = True
+
+# 📌 True면 마지막 실행 이후 새 사업보고서가 올라온 종목만 다시 추출 (일괄 조회 모드에서 사용)
+INCREMENTAL = True
+state_path = os.path.join(new_project_dir, "run_state_report.json")
+
+# 📌 True면 lxml 기반 proc_xml_fast로 섹션 추출 (실패하면 기존 proc_xml로 다시 추출)
+USE_FAST_XML = True
+
+# 📌 True면 조회(스레드)와 파싱(프로세스)을 나눈 파이프라인으로 실행 (MAX_WORKERS > 1일 때)
+USE_PARSE_POOL = True
+PARSE_WORKERS = os.cpu_count() or 1  # 파싱 프로세스 수
+QUEUE_SIZE = 32  # 파싱 대기 원문 최대 개수 (가득 차면 조회 스레드가 대기)
+
+# 📌 저장 형식: "json" = 기업별 {code}.json / "shard" = 압축 샤드 + 색인 (report_store.py, main_gpt.py에서 바로 읽음)
+REPORT_FORMAT = "json"
+report_store_dir = os.path.join(new_project_dir, "mktcap_3000_사업보고서_shard")
+report_store = ReportStore(report_store_dir) if REPORT_FORMAT == "shard" else None
+
+# 📌 보고서를 찾지 못했을 때 저장하는 값
+EMPTY_RESULT = {"report_nm": "조회 데이터 없음", "rcept_no": "조회 데이터 없음"}
+
+# 📌 공시 원문 캐시 (rcept_no는 공시 후 바뀌지 않으므로 재실행 시 네트워크 대신 사용)
+cache_dir = os.path.join(new_project_dir, "dart_cache")
+doc_cache = DocCache(cache_dir)
+metrics.track_cache("report_doc_cache", lambda: doc_cache)
+
+def download_html(url_link):
+    with metrics.request(urlsplit(url_link).netloc):
+        return urlreq.urlopen(url_link).read()
+
+def fetch_html(url_link):
+    """URL의 HTML 원문 (캐시 우선)"""
+    return doc_cache.get_or_fetch(f"html/{url_link}", lambda: download_html(url_link))
+
+def html_to_text(html):
+    """HTML 원문을 텍스트로 변환"""
+    soup = BeautifulSoup(html, 'html5lib')
     wording = soup.select('body')[0].get_text().replace("\n", "").replace("\xa0", "")
     return wording
 
+def text_output(url_link):
+    """URL에서 HTML 내용을 가져와 텍스트로 변환"""
+    return html_to_text(fetch_html(url_link))
+
 def proc_xml(xml_doc):
     """📌 사업 보고서 XML에서 '3. 원재료 및 생산설비'와 '4. 매출 및 수주상황' 부분을 추출 (텍스트 + 표)"""
     xml_file = BeautifulSoup(xml_doc, features="html.parser")
@@ -58,7 +111,7 @@ def proc_xml(xml_doc):
             # ✅ 표 데이터 추출 및 JSON-friendly 변환
             for table in section.find_all("table"):
                 try:
-                    df = pd.read_html(str(table))[0]  # 표를 DataFrame으로 변환
+                    df = pd.read_html(StringIO(str(table)))[0]  # 표를 DataFrame으로 변환 (pandas 2.1+에서 deprecated된 HTML 문자열 직접 전달 대신 StringIO 사용)
                     tables_json = [{str(k): v for k, v in row.items()} for row in df.to_dict(orient="records")]
                     tables.append(tables_json)
                 except:
@@ -73,89 +126,354 @@ def proc_xml(xml_doc):
 
     return extracted_sections  # ✅ JSON-friendly 구조로 반환
 
-def get_buss_detail(Dart_df):
-    """📌 DART에서 기업별 사업 보고서를 가져와서 JSON 저장 (기업별 개별 JSON 파일 생성)"""
-    enddate = dt.today().strftime('%Y-%m-%d')
-
-    for i in tqdm(Dart_df.index):
+def extract_sections(xml_doc):
+    """📌 섹션 추출 (USE_FAST_XML이면 빠른 경로 우선, 오류 시 기존 proc_xml)"""
+    if USE_FAST_XML:
         try:
-            code = i[1:]  # ✅ 기업 코드 추출
-            startdate = dt.strftime(dt.strptime(enddate, '%Y-%m-%d') - relativedelta(months=12), '%Y-%m-%d')
-            result_list = dart.list(code, start=startdate, kind='A', final=False)
-
-            try:
-                result_list['Rpt_Date'] = result_list.report_nm.apply(lambda x: str.split(x, "(")[1].replace(')', ''))
-                result_list = result_list.sort_values(by='Rpt_Date', ascending=False)
-            except:
-                pass
-
-            if len(result_list) == 0:
-                raise ValueError('조회 데이터 없음')
-
-            for _, result in result_list.iterrows():
-                if '정정' not in result.report_nm:
-                    result_temp = {
-                        "report_nm": result["report_nm"],
-                        "rcept_no": result["rcept_no"]
-                    }
-                    break
-
-            # ✅ 텍스트 + 표 데이터 추출
-            sections = proc_xml(dart.document(result_temp["rcept_no"]))
-
-            if not sections:
-                raise ValueError('Scraped wrong report.')
+            return proc_xml_fast(xml_doc)
+        except Exception as e:
+            print(f"⚠️ proc_xml_fast 실패, 기존 방식으로 추출: {e}")
+    return proc_xml(xml_doc)
+
+def fetch_document(rcept_no):
+    """📌 사업 보고서 원문 XML (캐시 우선)"""
+    return doc_cache.get_or_fetch(f"document/{rcept_no}", lambda: call_opendart(dart.document, rcept_no))
+
+def get_start_date(enddate):
+    """📌 최근 12개월 조회 시작일"""
+    return dt.strftime(dt.strptime(enddate, '%Y-%m-%d') - relativedelta(months=12), '%Y-%m-%d')
+
+def fetch_report(code, enddate, result_list=None):
+    """📌 최근 12개월 사업 보고서 선택 + 원문 XML 조회 → (result_temp, xml_doc)
+
+    result_list를 넘기면 (일괄 조회 결과) 최근 12개월 목록 조회를 건너뜀
+    """
+    if result_list is None:
+        result_list = call_opendart(dart.list, code, start=get_start_date(enddate), kind='A', final=False)
+
+    try:
+        result_list['Rpt_Date'] = result_list.report_nm.apply(lambda x: str.split(x, "(")[1].replace(')', ''))
+        result_list = result_list.sort_values(by='Rpt_Date', ascending=False)
+    except:
+        pass
+
+    if len(result_list) == 0:
+        raise ValueError('조회 데이터 없음')
+
+    for _, result in result_list.iterrows():
+        if '정정' not in result.report_nm:
+            result_temp = {
+                "report_nm": result["report_nm"],
+                "rcept_no": result["rcept_no"]
+            }
+            break
+
+    return result_temp, fetch_document(result_temp["rcept_no"])
+
+def fetch_subdoc(code, enddate):
+    """📌 (대체 경로) 전체 기간 목록에서 보고서 선택 + '사업의 내용' 원문 HTML 조회 → (result_temp, html)"""
+    result_list = call_opendart(dart.list, code, end=enddate, kind='A', final=False)
+
+    for _, result in result_list.iterrows():
+        if '정정' not in result.report_nm:
+            result_temp = {
+                "report_nm": result["report_nm"],
+                "rcept_no": result["rcept_no"]
+            }
+
+    # ✅ 사업의 내용 섹션 URL 직접 가져오기
+    listofsubdocs = call_opendart(dart.sub_docs, result_temp["rcept_no"], match='사업의 내용')
+    dcmno = listofsubdocs.iloc[0]['url'][:-4]
+    return result_temp, fetch_html(dcmno)
+
+def parse_raw(kind, raw):
+    """📌 원문 → 섹션 목록 ("xml": 사업 보고서 원문, "html": 사업의 내용 원문, "empty": 보고서 없음)"""
+    if kind == "xml":
+        return extract_sections(raw)
+    if kind == "html":
+        return [{
+            "title": "사업의 내용",
+            "text": html_to_text(raw),
+            "tables": []
+        }]
+    return []
+
+@metrics.timed("report")
+def fetch_buss_detail(code, enddate, result_list=None):
+    """📌 한 기업의 최신 사업 보고서를 조회하여 결과 dict 반환 (조회와 파싱을 한 스레드에서 순서대로 실행)
+
+    result_list를 넘기면 (일괄 조회 결과) 최근 12개월 목록 조회를 건너뜀
+    """
+    try:
+        result_temp, xml_doc = fetch_report(code, enddate, result_list)
+
+        # ✅ 텍스트 + 표 데이터 추출
+        sections = parse_raw("xml", xml_doc)
+
+        if not sections:
+            raise ValueError('Scraped wrong report.')
+    except:
+        try:
+            result_temp, html = fetch_subdoc(code, enddate)
+            sections = parse_raw("html", html)
         except:
+            result_temp = dict(EMPTY_RESULT)
+            sections = []
+
+    # ✅ JSON-friendly 데이터 변환
+    result_temp["sections"] = sections
+    return result_temp
+
+@metrics.timed("report_fetch")
+def fetch_raw(code, enddate, result_list=None, fallback=False):
+    """📌 파싱 전 원문 조회 → (result_temp, kind, raw) (12개월 보고서 → 대체 경로 → 조회 데이터 없음 순)"""
+    try:
+        if fallback:
+            result_temp, raw = fetch_subdoc(code, enddate)
+            return result_temp, "html", raw
+        result_temp, raw = fetch_report(code, enddate, result_list)
+        return result_temp, "xml", raw
+    except Exception:
+        if not fallback:
+            return fetch_raw(code, enddate, result_list, fallback=True)
+        return dict(EMPTY_RESULT), "empty", None
+
+@metrics.timed("report_parse")
+def parse_and_save(code, result_temp, kind, raw):
+    """📌 (파싱 프로세스에서 실행) 원문 파싱 + {code}.json 저장 → 저장한 rcept_no
+
+    사업 보고서 XML에서 섹션을 찾지 못하면 None (조회 스레드가 대체 경로로 다시 조회)
+    """
+    try:
+        sections = parse_raw(kind, raw)
+    except Exception:
+        sections = None
+
+    if kind == "xml" and not sections:
+        return None
+    if sections is None:
+        result_temp, sections = dict(EMPTY_RESULT), []
+
+    result_temp = {**result_temp, "sections": sections}
+    save_buss_detail(code, result_temp)
+    return result_temp["rcept_no"]
+
+def run_parse_pipeline(jobs, enddate, state, fetch_workers, parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE):
+    """📌 조회 → 파싱 파이프라인 (jobs: [(code, result_list), ...]) → {종목코드: 저장한 rcept_no (실패 시 None)}
+
+    - 조회 스레드(fetch_workers)는 원문을 크기 제한 큐에 넣고, 큐가 가득 차면 대기 (backpressure)
+    - 메인 스레드는 큐에서 원문을 꺼내 파싱 프로세스 풀에 넘김 (처리 중인 원문은 parse_workers * 2개까지)
+    - 메모리에 올라가는 원문은 최대 queue_size + parse_workers * 2 + fetch_workers개
+    - OpenDART 속도 제한과 CPU 중 느린 쪽에 맞춰 다른 쪽이 기다리므로 병목 자원을 끝까지 사용
+    - 조회 예외·파싱 프로세스 풀 중단(BrokenProcessPool)은 해당 종목 실패로 기록하고 큐를 계속 비움 (멈추지 않음)
+    """
+    if not jobs:
+        return {}
+
+    results = {}
+    raw_queue = queue.Queue(maxsize=queue_size)
+    slots = threading.Semaphore(parse_workers * 2)
+    lock = threading.Lock()
+    remaining = [len(jobs)]
+    broken = threading.Event()
+    progress = tqdm(total=len(jobs))
+
+    def fetch(code, result_list, fallback=False):
+        """조회 스레드: 원문을 받아 큐에 넣음"""
+        try:
+            result_temp, kind, raw = fetch_raw(code, enddate, result_list, fallback)
+        except Exception as e:
+            print(f"⚠️ {code} 조회 실패: {e}")
+            finish(code, None)
+            return
+        raw_queue.put((code, result_temp, kind, raw))  # ✅ 큐가 가득 차면 파싱이 따라올 때까지 대기
+
+    def finish(code, rcept_no):
+        results[code] = rcept_no
+        if rcept_no is not None:
+            state.set(code, rcept_no)
+        progress.update(1)
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                raw_queue.put(None)  # ✅ 모든 종목 처리 완료 → 메인 루프 종료
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+
+        def on_parsed(code, future):
             try:
-                code = i[1:]
-                result_list = dart.list(code, end=enddate, kind='A', final=False)
-
-                for _, result in result_list.iterrows():
-                    if '정정' not in result.report_nm:
-                        result_temp = {
-                            "report_nm": result["report_nm"],
-                            "rcept_no": result["rcept_no"]
-                        }
-
-                # ✅ 사업의 내용 섹션 URL 직접 가져오기
-                listofsubdocs = dart.sub_docs(result_temp["rcept_no"], match='사업의 내용')
-                dcmno = listofsubdocs.iloc[0]['url'][:-4]
-
-                sections = [{
-                    "title": "사업의 내용",
-                    "text": text_output(dcmno),
-                    "tables": []
-                }]
-            except:
-                result_temp = {
-                    "report_nm": "조회 데이터 없음",
-                    "rcept_no": "조회 데이터 없음",
-                    "sections": []
-                }
-
-        # ✅ JSON-friendly 데이터 변환
-        result_temp["sections"] = sections
-
-        # ✅ 모든 키를 문자열로 변환하여 JSON 오류 방지
-        cleaned_result_temp = {str(k): v for k, v in result_temp.items()}
-
-        # ✅ 기업별 JSON 파일 생성
-        json_file_path = os.path.join(new_data_dir, f"{code}.json")
-        with open(json_file_path, "w", encoding="utf-8") as f:
-            json.dump(cleaned_result_temp, f, ensure_ascii=False, indent=4)
-
+                rcept_no = future.result()
+            except Exception as e:
+                # ✅ 저장하지 못한 종목은 상태에 기록하지 않음 (다음 증분 실행에서 다시 처리)
+                if isinstance(e, BrokenProcessPool):
+                    broken.set()
+                print(f"⚠️ {code} 파싱 실패: {e}")
+                finish(code, None)
+                return
+            finally:
+                slots.release()
+            if rcept_no is None:
+                fetchers.submit(fetch, code, None, True)
+            else:
+                finish(code, rcept_no)
+
+        for code, result_list in jobs:
+            fetchers.submit(fetch, code, result_list)
+
+        while True:
+            item = raw_queue.get()
+            if item is None:
+                break
+            if broken.is_set():
+                finish(item[0], None)  # ✅ 풀이 멈춘 뒤 도착한 원문은 실패로 기록 (조회 스레드가 큐에서 막히지 않도록 계속 비움)
+                continue
+            slots.acquire()
+            try:
+                future = parsers.submit(parse_and_save, *item)
+            except BrokenProcessPool as e:
+                slots.release()
+                broken.set()
+                print(f"⚠️ {item[0]} 파싱 실패: {e}")
+                finish(item[0], None)
+                continue
+            future.add_done_callback(partial(on_parsed, item[0]))
+
+    if broken.is_set():
+        print("❌ 파싱 프로세스 풀이 중단되어 남은 종목을 실패로 기록함 (다음 증분 실행에서 재시도)")
+
+    progress.close()
+    return results
+
+def save_buss_detail(code, result_temp):
+    """📌 조회 결과를 기업별 JSON 파일로 저장 (REPORT_FORMAT이 "shard"면 샤드 저장소에 저장)"""
+    if report_store is not None:
+        report_store.write(code, result_temp)
+        return
+
+    # ✅ 모든 키를 문자열로 변환하여 JSON 오류 방지
+    cleaned_result_temp = {str(k): v for k, v in result_temp.items()}
+
+    # ✅ 기업별 JSON 파일 생성
+    # ✅ 임시 파일에 쓴 뒤 교체 (중단되거나 여러 작업자가 같은 종목을 써도 반쯤 쓴 파일이 남지 않음)
+    json_file_path = os.path.join(new_data_dir, f"{code}.json")
+    tmp_path = f"{json_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cleaned_result_temp, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, json_file_path)
+
+def has_buss_detail(code):
+    """📌 저장된 결과가 있는지 (JSON 파일 또는 샤드 색인)"""
+    if report_store is not None:
+        return report_store.exists(code)
+    return os.path.exists(os.path.join(new_data_dir, f"{code}.json"))
+
+def report_failed(code, rcept_no, groups):
+    """📌 저장 실패, 또는 결과가 '조회 데이터 없음'인데 일괄 목록으로 보고서가 없음을 확인할 수 없는 종목
+
+    (조회 오류는 fetch_raw가 '조회 데이터 없음'으로 바꾸므로 목록에 보고서가 있으면 조회 실패로 봄)
+    """
+    if rcept_no is None:
+        return True
+    if rcept_no != EMPTY_RESULT["rcept_no"]:
+        return False
+    if groups is None:
+        return True
+    group = groups.get(code)
+    return group is not None and (~group.report_nm.str.contains('정정')).any()
+
+def select_changed_codes(codes, groups, state):
+    """📌 증분 실행 대상: 처음 보는 종목, 결과가 없는 종목, 마지막 처리 이후 새 보고서(정정 제외)가 있는 종목"""
+    new_codes, changed_codes = set(), []
+    for code in codes:
+        previous = state.get(code)
+        if previous is None or not has_buss_detail(code):
+            new_codes.add(code)
+            changed_codes.append(code)
+            continue
+
+        group = groups.get(code)
+        if group is None:
+            continue
+        rcept_nos = group.loc[~group.report_nm.str.contains('정정'), 'rcept_no']
+        if (rcept_nos != previous).any():
+            changed_codes.append(code)
+
+    return changed_codes, new_codes
+
+def get_buss_detail(Dart_df, max_workers=MAX_WORKERS, bulk=BULK_LISTING, incremental=INCREMENTAL,
+                    use_parse_pool=USE_PARSE_POOL):
+    """📌 DART에서 기업별 사업 보고서를 가져와서 JSON 저장 (기업별 개별 JSON 파일 생성)
+
+    max_workers > 1 이면 스레드 풀로 동시 조회 (OpenDART 호출은 공용 토큰 버킷으로 속도 제한)
+    use_parse_pool이면 파싱은 프로세스 풀에서 실행 (run_parse_pipeline)
+    incremental이면 상태 파일의 마지막 동기화 날짜 이후 목록만 받아 바뀐 종목만 처리
+    """
+    enddate = dt.today().strftime('%Y-%m-%d')
+    codes = [i[1:] for i in Dart_df.index]  # ✅ 기업 코드 추출
+
+    state = RunState(state_path)
+    incremental = incremental and bulk and state.last_sync is not None
+
+    groups = None
+    new_codes = set()
+    if bulk:
+        startdate = state.last_sync if incremental else get_start_date(enddate)
+        listing = list_disclosures_bulk(dart.api_key, startdate, enddate, kind='A')
+        groups = group_by_stock_code(listing, codes)
+        print(f"✅ 일괄 조회 완료 ({startdate}~{enddate}): 정기공시 {len(listing)}건 중 대상 기업 {len(groups)}개")
+
+        if incremental:
+            codes, new_codes = select_changed_codes(codes, groups, state)
+            print(f"✅ 증분 실행: 변경/신규 종목 {len(codes)}개만 처리")
+
+    def get_result_list(code):
+        # ✅ 일괄 목록에 없는 기업은 빈 목록 → 기존과 같이 전체 기간 재조회 경로로 처리
+        # ✅ 증분 실행에서 처음 보는 종목은 최근 12개월 목록을 기업별로 조회
+        if groups is not None and code not in new_codes:
+            return groups.get(code, pd.DataFrame(columns=["report_nm", "rcept_no"]))
+        return None
+
+    def run(code):
+        result_temp = fetch_buss_detail(code, enddate, get_result_list(code))
+        save_buss_detail(code, result_temp)
+        state.set(code, result_temp["rcept_no"])
+        return code, result_temp["rcept_no"]
+
+    if max_workers > 1 and use_parse_pool:
+        results = run_parse_pipeline([(code, get_result_list(code)) for code in codes], enddate, state, max_workers)
+    elif max_workers <= 1:
+        results = dict(run(code) for code in tqdm(codes))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run, code) for code in codes]
+            results = dict(future.result() for future in tqdm(as_completed(futures), total=len(futures)))
+
+    # ✅ 실패한 종목이 있으면 마지막 동기화 날짜를 유지 (다음 증분 실행이 같은 기간 목록으로 재시도)
+    failed = [code for code, rcept_no in results.items() if report_failed(code, rcept_no, groups)]
+    if failed:
+        print(f"⚠️ {len(failed)}개 종목 조회 실패 (예: {', '.join(failed[:5])}): 마지막 동기화 날짜 유지 ({state.last_sync})")
+    else:
+        state.last_sync = enddate
+    state.save()
     return True
 
 
-# 📌 리스트 불러오기
-list_df = pd.read_excel(os.path.join(base_dir, 'data', '02.mktcap_3000.xlsx'), sheet_name='list', index_col=0)
+if __name__ == "__main__":
+    # 📌 실행 지표 (--metrics-dir, --profile cprofile|sample)
+    init_from_cli("report")
+
+    # 📌 새로운 폴더 생성 (없으면 생성)
+    os.makedirs(new_data_dir, exist_ok=True)
 
-# 📌 OpenDart API 사용 설정
-api_key = 'DART API KEY'  # 🔴 실제 OpenDart API 키 입력 필요
-dart = OpenDartReader(api_key)
+    # 📌 리스트 불러오기
+    list_df = pd.read_excel(os.path.join(base_dir, 'data', '02.mktcap_3000.xlsx'), sheet_name='list', index_col=0)
 
-# 📌 데이터 추출 실행
-buss_df = get_buss_detail(list_df)
+    # 📌 OpenDart API 사용 설정
+    api_key = 'DART API KEY'  # 🔴 실제 OpenDart API 키 입력 필요
+    dart = OpenDartReader(api_key)
 
-print('finished')
+    # 📌 데이터 추출 실행
+    buss_df = get_buss_detail(list_df)
 
+    print('finished')
@@ -0,0 +1,173 @@
+import math
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+# 📐 기존 smartmerge와 같은 기준: 같은 중분류 안에서 SequenceMatcher 유사도 0.85 이상이면 중복
+SIMILARITY_THRESHOLD = 0.85
+NGRAM_SIZE = 2
+
+# ✅ 법인 형태 표기 (비교 시 제거)
+LEGAL_FORM_RE = re.compile(
+    r"\(주\)|㈜|주식회사|\(유\)|유한회사|\(株\)|\bco\.,?\s*ltd\b\.?|\bltd\b\.?|\binc\b\.?|\bcorp(oration)?\b\.?",
+    re.IGNORECASE,
+)
+PUNCT_RE = re.compile(r"[\s\.,·&'\"\-_/()\[\]]+")
+
+# ✅ 영문 약칭의 한글 표기 → 영문 (예: 엘지화학 = LG화학)
+NAME_VARIANTS = {
+    "엘지": "lg",
+    "에스케이": "sk",
+    "씨제이": "cj",
+    "케이티": "kt",
+    "지에스": "gs",
+    "에이치디": "hd",
+    "엘에스": "ls",
+    "디비": "db",
+    "케이씨씨": "kcc",
+    "에쓰오일": "s-oil",
+}
+NAME_VARIANTS_RE = re.compile("|".join(sorted(NAME_VARIANTS, key=len, reverse=True)))
+
+
+def normalize_name(name):
+    """📐 비교용 기업명: 법인 표기·공백·구두점 제거, 소문자, 한글/영문 약칭 통일"""
+    text = LEGAL_FORM_RE.sub("", str(name)).lower()
+    text = NAME_VARIANTS_RE.sub(lambda m: NAME_VARIANTS[m.group()], text)
+    return PUNCT_RE.sub("", text)
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """📐 n-gram 목록 (같은 n-gram이 반복되면 "ab#1", "ab#2"처럼 구분하여 중복 개수까지 비교)"""
+    if len(text) <= n:
+        return [text]
+    seen = Counter()
+    grams = []
+    for i in range(len(text) - n + 1):
+        gram = text[i:i + n]
+        seen[gram] += 1
+        grams.append(gram if seen[gram] == 1 else f"{gram}#{seen[gram]}")
+    return grams
+
+
+def shared_ngrams_bound(total_length, threshold):
+    """📐 유사도가 threshold 이상인 두 이름이 반드시 공유하는 2-gram 개수의 하한
+
+    ratio = 2M/T ≥ t (M: 일치 글자 수, T: 두 이름 길이 합)이고, 일치 구간 k개는 불일치 글자로만
+    나뉘므로 k - 1 ≤ T - 2M → 공유 2-gram ≥ M - k ≥ T(1.5t - 1) - 1
+    """
+    return max(1, math.ceil(total_length * (1.5 * threshold - 1) - 1 - 1e-9))
+
+
+def partner_lengths(length, threshold):
+    """📐 유사도가 threshold 이상이 될 수 있는 상대 이름 길이 범위 (2·min/(합) ≥ t)"""
+    low = math.ceil(length * threshold / (2 - threshold) - 1e-9)
+    high = math.floor(length * (2 - threshold) / threshold + 1e-9)
+    return range(low, high + 1)
+
+
+class FuzzyDeduper:
+    """📐 블록(중분류)별 n-gram 접두 색인(prefix filtering)으로 후보만 골라 유사도를 계산하는 중복 판별기
+
+    2-gram을 드문 것부터 정렬했을 때, 공유 2-gram이 o개 이상인 두 이름은 각자 앞쪽 (개수 - o + 1)개
+    안에서 반드시 하나를 공유하므로 그 부분만 색인/조회해도 전체 비교와 결과가 같음
+    색인은 (2-gram, 이름 길이)로 나눠 가능한 상대 길이별로 필요한 만큼만 조회
+    gram_counts: 전체 이름의 2-gram 빈도 (정렬 기준, 없으면 문자열 순)
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, n=NGRAM_SIZE, gram_counts=None):
+        self.threshold = threshold
+        self.n = n
+        self.gram_counts = gram_counts or {}
+        self.names = defaultdict(list)  # 블록 → 남긴 (이름, 2-gram 집합) 목록
+        self.exact = defaultdict(dict)  # 블록 → 남긴 이름 → 번호
+        self.index = defaultdict(lambda: defaultdict(list))  # 블록 → (n-gram, 길이) → 이름 번호 목록
+        self.comparisons = 0
+        self._bounds = {}
+
+    def _bound(self, total_length):
+        bound = self._bounds.get(total_length)
+        if bound is None:
+            bound = self._bounds[total_length] = shared_ngrams_bound(total_length, self.threshold)
+        return bound
+
+    def _prefix_size(self, n_grams, total_length):
+        return max(1, n_grams - self._bound(total_length) + 1)
+
+    def _similarity(self, a, a_grams, b, b_grams):
+        """SequenceMatcher 유사도 (기준 미달이 확실하면 계산 없이 0.0)"""
+        total = len(a) + len(b)
+        # ✅ 길이 차이와 공유 2-gram 개수로 먼저 걸러낸 뒤 SequenceMatcher 계산
+        if 2 * min(len(a), len(b)) < self.threshold * total:
+            return 0.0
+        if len(a) > self.n and len(b) > self.n and len(a_grams & b_grams) < self._bound(total):
+            return 0.0
+        matcher = SequenceMatcher(None, a, b)
+        # ✅ 빠른 상한값으로 먼저 걸러낸 뒤 정확한 유사도 계산
+        if matcher.real_quick_ratio() < self.threshold or matcher.quick_ratio() < self.threshold:
+            return 0.0
+        self.comparisons += 1
+        return matcher.ratio()
+
+    def _grams(self, name):
+        grams = set(ngrams(name, self.n))
+        return grams, sorted(grams, key=lambda g: (self.gram_counts.get(g, 0), g))
+
+    def _candidates(self, block, name, ordered):
+        index = self.index[block]
+        candidates = set()
+        for partner_length in partner_lengths(len(name), self.threshold):
+            for gram in ordered[:self._prefix_size(len(ordered), len(name) + partner_length)]:
+                candidates.update(index.get((gram, partner_length), ()))
+        return candidates
+
+    def add(self, block, name, grams=None, ordered=None):
+        """이름 등록 → 번호 반환 (색인에는 가장 짧은 상대 기준, 즉 가장 긴 접두로 등록)"""
+        if grams is None:
+            grams, ordered = self._grams(name)
+        names = self.names[block]
+        idx = len(names)
+        names.append((name, grams))
+        self.exact[block].setdefault(name, idx)
+        shortest = partner_lengths(len(name), self.threshold).start
+        for gram in ordered[:self._prefix_size(len(ordered), len(name) + shortest)]:
+            self.index[block][(gram, len(name))].append(idx)
+        return idx
+
+    def best_match(self, block, name):
+        """가장 유사한 등록 이름의 (번호, 유사도), 기준 이상이 없으면 None"""
+        if name in self.exact[block]:
+            return self.exact[block][name], 1.0
+        grams, ordered = self._grams(name)
+        names = self.names[block]
+        best = None
+        for idx in sorted(self._candidates(block, name, ordered)):
+            score = self._similarity(name, grams, *names[idx])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (idx, score)
+        return best
+
+    def is_duplicate(self, block, name):
+        """중복이면 True, 아니면 이름을 등록하고 False"""
+        if name in self.exact[block]:
+            return True
+
+        grams, ordered = self._grams(name)
+        names = self.names[block]
+        for idx in self._candidates(block, name, ordered):
+            if self._similarity(name, grams, *names[idx]) >= self.threshold:
+                return True
+
+        self.add(block, name, grams, ordered)
+        return False
+
+
+def dedup_rows(df, block_col="중분류", name_col="연관기업", threshold=SIMILARITY_THRESHOLD):
+    """📐 블록 값이 같고 이름이 유사한 행은 처음 나온 행만 남김 (블록/이름이 비어 있는 행은 제거)"""
+    valid = df[block_col].notna() & df[name_col].notna()
+    names = [normalize_name(name) if ok else None for name, ok in zip(df[name_col], valid)]
+    gram_counts = Counter(gram for name in set(names) if name is not None for gram in ngrams(name))
+
+    deduper = FuzzyDeduper(threshold, gram_counts=gram_counts)
+    keep = [ok and not deduper.is_duplicate(block, name) for block, name, ok in zip(df[block_col], names, valid)]
+    return df[keep]
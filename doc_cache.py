@@ -0,0 +1,187 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+# 📌 기본 캐시 용량 (압축 후 기준, 초과 시 오래 안 쓴 문서부터 삭제)
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+FLUSH_EVERY = 50  # ✅ 새 문서 N건마다 인덱스 파일 저장
+
+
+def _atomic_write_json(path, obj):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class DocCache:
+    """📌 공시 원문 디스크 캐시 (rcept_no/dcmNo 등 키 → gzip 압축 blob, 내용 해시로 저장)
+
+    - blobs/ab/<sha256>.gz : 원문 내용 (같은 내용은 한 번만 저장)
+    - index.json : 키 → {digest, size, atime, text}
+    - 전체 크기가 max_bytes를 넘으면 최근 사용 시각(atime)이 오래된 키부터 삭제 (LRU)
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.touched = False  # ✅ 읽기로 atime만 바뀐 경우 (종료 시 저장)
+        self.hits = 0
+        self.misses = 0
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        # ✅ 같은 blob을 여러 키가 가리킬 수 있으므로 digest 기준으로 크기/참조 수 관리
+        self.refs = Counter(e["digest"] for e in self.index.values())
+        self.sizes = {e["digest"]: e["size"] for e in self.index.values()}
+        self.total_bytes = sum(self.sizes.values())
+        atexit.register(self.flush)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, "blobs", digest[:2], f"{digest}.gz")
+
+    def get(self, key):
+        """캐시된 내용 반환 (str로 저장된 경우 str, 없으면 None)"""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._blob_path(entry["digest"]), "rb") as f:
+                    data = gzip.decompress(f.read())
+            except OSError:
+                # ✅ blob이 지워졌으면 캐시 미스로 처리
+                self._drop(key)
+                self.touched = True
+                self.misses += 1
+                return None
+            entry["atime"] = time.time()
+            self.touched = True
+            self.hits += 1
+        return data.decode("utf-8") if entry.get("text") else data
+
+    def put(self, key, content):
+        """내용(str 또는 bytes)을 압축 저장"""
+        is_text = isinstance(content, str)
+        data = content.encode("utf-8") if is_text else content
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        compressed = gzip.compress(data)  # ✅ 압축은 잠금 밖에서 (다른 작업자의 캐시 조회를 막지 않도록)
+
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is not None and entry["digest"] == digest and os.path.exists(blob_path):
+                # ✅ 같은 키에 같은 내용 (동시 get_or_fetch 등): 참조 수는 그대로 두고 사용 시각만 갱신
+                entry["atime"] = time.time()
+                self.touched = True
+                return
+            if entry is not None:
+                self._drop(key)  # ✅ blob을 쓰기 전에 제거 (같은 digest의 blob이 사라진 경우 새로 쓴 파일을 지우지 않도록)
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, blob_path)
+            size = os.path.getsize(blob_path)
+            self.index[key] = {"digest": digest, "size": size, "atime": time.time(), "text": is_text}
+            if self.refs[digest] == 0:
+                self.sizes[digest] = size
+                self.total_bytes += size
+            self.refs[digest] += 1
+            self._evict()
+            self.dirty += 1
+            if self.dirty >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def get_or_fetch(self, key, fetch):
+        """캐시에 있으면 반환, 없으면 fetch()로 받아와 저장 후 반환 (빈 응답은 저장하지 않음)"""
+        content = self.get(key)
+        if content is not None:
+            return content
+        content = fetch()
+        if content:
+            self.put(key, content)
+        return content
+
+    def _drop(self, key):
+        """키를 인덱스에서 제거하고, 더 이상 참조되지 않는 blob 파일은 삭제"""
+        digest = self.index.pop(key)["digest"]
+        self.refs[digest] -= 1
+        if self.refs[digest] > 0:
+            return
+        del self.refs[digest]
+        self.total_bytes -= self.sizes.pop(digest, 0)
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, _ in sorted(self.index.items(), key=lambda kv: kv[1]["atime"]):
+            if self.total_bytes <= target:
+                break
+            self._drop(key)
+
+    def _flush_locked(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _atomic_write_json(self.index_path, self.index)
+        self.dirty = 0
+        self.touched = False
+
+    def flush(self):
+        """인덱스 파일 저장 (프로그램 종료 시 자동 호출)
+
+        바뀐 내용이 없으면 저장하지 않음 (캐시를 쓰지 않는 파싱 프로세스가 오래된 인덱스로 덮어쓰지 않도록)
+        """
+        with self.lock:
+            if self.dirty or self.touched:
+                self._flush_locked()
+
+
+class MappingCache:
+    """📌 작은 키-값 매핑 캐시 (예: rcept_no → dcmNo), JSON 파일 하나로 저장"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        atexit.register(self.flush)
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.dirty += 1
+            if self.dirty >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        _atomic_write_json(self.path, self.data)
+        self.dirty = 0
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._flush_locked()
@@ -1,31 +1,88 @@
 import os
 import pandas as pd
 import glob
+from concurrent.futures import ProcessPoolExecutor
+from corp_index import CorpIndex
+from output_store import OutputStore
+from metrics import metrics, init_from_cli
 
 # 폴더 경로
 folder_path = r"폴더 경로 설정"
-all_files = glob.glob(os.path.join(folder_path, "*.xlsx"))
 
-# 결과 저장용 리스트
-df_list = []
+# 연관기업 → 종목코드/고유번호 매칭용 (main_gpt.py가 받아둔 CORPCODE.xml)
+XML_FILE = "CORPCODE.xml"
+ZIP_FILE = "corp_code.zip"
+RESOLVE_THRESHOLD = 0.9
 
-for file in all_files:
+# 저장 방식: "excel" = 폴더의 .xlsx 병합 / "parquet" = 데이터셋의 병합 단계를 한 번에 읽음 (엑셀은 선택)
+OUTPUT_BACKEND = "excel"
+store_root = r"결과 데이터셋 경로 입력"
+INPUT_STAGE = "merged"
+EXPORT_EXCEL = True
+
+# 병렬 로드: 엑셀 파일 읽기(openpyxl)를 여러 프로세스에 나눠 실행 (1이면 순차 처리)
+MAX_WORKERS = os.cpu_count() or 1
+CHUNKSIZE = 32  # 작업 묶음 크기
+
+def load_file(file):
+    """파일 하나 로드 + 종목코드 열 추가 (작업 프로세스에서 실행)"""
     stock_code = os.path.basename(file).split('.')[0]  # 파일명에서 종목코드 추출
     df = pd.read_excel(file)
 
     # 파일마다 종목코드 열 추가
     df["종목코드"] = stock_code
+    return df
+
+def merge_all():
+    """전체 병합 + 연관기업 코드 매칭 후 저장, 병합 결과 반환 (pipeline.py에서도 호출)"""
+    if OUTPUT_BACKEND == "parquet":
+        # 종목코드는 데이터셋에 이미 들어 있음
+        final_df = OutputStore(store_root).scan(INPUT_STAGE)
+    else:
+        all_files = glob.glob(os.path.join(folder_path, "*.xlsx"))
+
+        # 결과 저장용 리스트 (파일 순서 유지)
+        if MAX_WORKERS <= 1:
+            df_list = [load_file(file) for file in all_files]
+        else:
+            with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                df_list = list(executor.map(load_file, all_files, chunksize=CHUNKSIZE))
+
+        # 모든 파일 합치기
+        final_df = pd.concat(df_list, ignore_index=True)
+
+    # 연관기업 이름을 종목코드(상장사)/고유번호로 변환 (같은 이름은 한 번만 검색)
+    # CORPCODE.xml이 없으면 매칭 없이 병합만 (코드 열은 빈 값)
+    if os.path.exists(XML_FILE):
+        corp_index = CorpIndex.load(XML_FILE, ZIP_FILE)
+        resolved = {name: corp_index.resolve(name, RESOLVE_THRESHOLD) for name in final_df["연관기업"].dropna().unique()}
+        matched = sum(1 for r in resolved.values() if r)
+        print(f"연관기업 코드 매칭: {matched}/{len(resolved)}개")
+    else:
+        resolved = {}
+        print(f"⚠️ {XML_FILE} 없음: 연관기업 코드 매칭 생략 (연관종목코드/연관고유번호는 빈 값)")
+    final_df["연관종목코드"] = final_df["연관기업"].map(lambda name: (resolved.get(name) or {}).get("stock_code", ""))
+    final_df["연관고유번호"] = final_df["연관기업"].map(lambda name: (resolved.get(name) or {}).get("corp_code", ""))
 
-    df_list.append(df)
+    # 열 순서 정리 (종목코드를 F열로)
+    cols = ["종목명", "대분류", "중분류", "소분류", "연관기업", "종목코드", "연관종목코드", "연관고유번호"]
+    final_df = final_df[cols]
 
-# 모든 파일 합치기
-final_df = pd.concat(df_list, ignore_index=True)
+    # parquet이면 병합 결과도 parquet으로 저장 (임시 파일 → 교체)
+    if OUTPUT_BACKEND == "parquet":
+        parquet_path = os.path.join(store_root, "merged_result.parquet")
+        final_df.to_parquet(f"{parquet_path}.tmp", index=False)
+        os.replace(f"{parquet_path}.tmp", parquet_path)
+        print(f"병합 완료: {parquet_path}")
 
-# 열 순서 정리 (종목코드를 F열로)
-cols = ["종목명", "대분류", "중분류", "소분류", "연관기업", "종목코드"]
-final_df = final_df[cols]
+    # 엑셀로 저장
+    if OUTPUT_BACKEND != "parquet" or EXPORT_EXCEL:
+        save_path = os.path.join(folder_path, "merged_result.xlsx")
+        final_df.to_excel(save_path, index=False)
+        print(f"병합 완료: {save_path}")
+    return final_df
 
-# 엑셀로 저장
-save_path = os.path.join(folder_path, "merged_result.xlsx")
-final_df.to_excel(save_path, index=False)
-print(f"병합 완료: {save_path}")
+if __name__ == "__main__":
+    init_from_cli("finalmerge")  # 실행 지표 (--metrics-dir, --profile cprofile|sample)
+    with metrics.span("finalmerge"):
+        merge_all()
@@ -0,0 +1,141 @@
+import asyncio
+import re
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+
+# ▶️ 계정 등급에 맞춰 조정 (OpenAI 대시보드의 Rate limits 참고)
+DEFAULT_RPM = 500
+DEFAULT_TPM = 40000
+
+
+def parse_reset(value):
+    """▶️ x-ratelimit-reset-* 헤더 값("6m0s", "1.5s", "20ms")을 초 단위로 변환"""
+    if not value:
+        return None
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+
+class RateBudget:
+    """▶️ 분당 요청 수(RPM)와 분당 토큰 수(TPM)를 함께 관리하는 비동기 토큰 버킷
+
+    - acquire(tokens): 요청 1건 + 예상 토큰만큼 여유가 생길 때까지 대기
+    - update_from_headers(): 응답의 x-ratelimit-* 헤더로 남은 한도를 보정
+    - penalize(): 429 응답 시 지정 시간 동안 모든 요청 중지
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests_left = float(rpm)
+        self.tokens_left = float(tpm)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.requests_left = min(self.rpm, self.requests_left + elapsed * self.rpm / 60)
+        self.tokens_left = min(self.tpm, self.tokens_left + elapsed * self.tpm / 60)
+        self.updated = now
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.tpm)  # ✅ 한도보다 큰 요청도 언젠가는 보낼 수 있도록
+        async with self.lock:  # ✅ 먼저 기다린 작업이 먼저 나가도록 직렬화
+            while True:
+                self._refill()
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0:
+                    if self.requests_left >= 1 and self.tokens_left >= tokens:
+                        self.requests_left -= 1
+                        self.tokens_left -= tokens
+                        return
+                    wait = max((1 - self.requests_left) * 60 / self.rpm,
+                               (tokens - self.tokens_left) * 60 / self.tpm)
+                self.wait_seconds += wait
+                metrics.rate_limit_wait("gpt", wait)
+                await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        self._refill()
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.requests_left = min(self.requests_left, float(remaining_requests))
+            if float(remaining_requests) <= 0:
+                self.penalize(parse_reset(headers.get("x-ratelimit-reset-requests")))
+        if remaining_tokens is not None:
+            self.tokens_left = min(self.tokens_left, float(remaining_tokens))
+            if float(remaining_tokens) <= 0:
+                self.penalize(parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+    def penalize(self, seconds):
+        if seconds:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class ChatClient:
+    """▶️ chat/completions 호출용 HTTP 클라이언트 (응답 헤더의 rate limit 정보를 쓰기 위해 직접 호출)"""
+
+    def __init__(self, api_key, api_base, organization=None, pool_size=32, timeout=300):
+        self.url = f"{api_base.rstrip('/')}/chat/completions"
+        self.host = urlsplit(self.url).netloc
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=pool_size))
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        if organization:
+            self.session.headers["OpenAI-Organization"] = organization
+
+    def _post(self, body):
+        with metrics.request(self.host) as record:
+            response = self.session.post(self.url, json=body, timeout=self.timeout)
+            record["status"] = response.status_code
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"error": {"message": response.text[:200]}}
+        return response.status_code, response.headers, payload
+
+    async def create(self, body):
+        """(status_code, headers, json) 반환, 네트워크 호출은 스레드에서 실행"""
+        return await asyncio.to_thread(self._post, body)
+
+
+async def run_ordered(items, worker, concurrency, on_result):
+    """▶️ worker(item)를 최대 concurrency개 동시에 실행, on_result(idx, item, result)는 입력 순서대로 호출
+
+    worker가 예외를 던지면 result 자리에 예외 객체가 전달됨
+    """
+    queue = asyncio.Queue()
+    for idx, item in enumerate(items):
+        queue.put_nowait((idx, item))
+
+    finished = {}
+    next_idx = 0
+
+    async def loop():
+        nonlocal next_idx
+        while True:
+            try:
+                idx, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await worker(item)
+            except Exception as e:
+                result = e
+            finished[idx] = result
+            while next_idx in finished:
+                on_result(next_idx, items[next_idx], finished.pop(next_idx))
+                next_idx += 1
+
+    await asyncio.gather(*(loop() for _ in range(max(1, concurrency))))
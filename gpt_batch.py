@@ -0,0 +1,146 @@
+import json
+import os
+import time
+import requests
+
+# ▶️ OpenAI Batch API 설정 (로컬 대체 서버로 테스트할 때는 api_base만 바꿔서 사용)
+OPENAI_API_BASE = "https://api.openai.com/v1"
+CHAT_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchClient:
+    """▶️ OpenAI Batch API 최소 클라이언트 (files 업로드 → batches 생성/조회 → 결과 파일 다운로드)"""
+
+    def __init__(self, api_key, api_base=OPENAI_API_BASE, organization=None, timeout=120):
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        if organization:
+            self.session.headers["OpenAI-Organization"] = organization
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"OpenAI API 오류 {response.status_code}: {response.text[:300]}")
+        return response
+
+    def upload_file(self, path):
+        with open(path, "rb") as f:
+            response = self.session.post(
+                f"{self.api_base}/files",
+                files={"file": (os.path.basename(path), f, "application/jsonl")},
+                data={"purpose": "batch"},
+                timeout=self.timeout,
+            )
+        return self._check(response).json()["id"]
+
+    def create_batch(self, input_file_id, metadata=None):
+        payload = {"input_file_id": input_file_id, "endpoint": CHAT_ENDPOINT, "completion_window": "24h"}
+        if metadata:
+            payload["metadata"] = metadata
+        response = self.session.post(f"{self.api_base}/batches", json=payload, timeout=self.timeout)
+        return self._check(response).json()
+
+    def get_batch(self, batch_id):
+        response = self.session.get(f"{self.api_base}/batches/{batch_id}", timeout=self.timeout)
+        return self._check(response).json()
+
+    def download_file(self, file_id):
+        response = self.session.get(f"{self.api_base}/files/{file_id}/content", timeout=self.timeout)
+        return self._check(response).text
+
+
+def write_batch_file(path, items, model, system_message):
+    """▶️ 배치 입력 JSONL 작성 (items: [(custom_id, prompt)], custom_id = 종목코드)"""
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, prompt in items:
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": CHAT_ENDPOINT,
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": prompt},
+                    ],
+                },
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def wait_for_batch(client, batch_id, poll_interval=60):
+    """▶️ 배치가 끝날 때까지 주기적으로 상태 조회"""
+    while True:
+        batch = client.get_batch(batch_id)
+        counts = batch.get("request_counts") or {}
+        print(f"⏳ 배치 {batch_id}: {batch['status']} "
+              f"({counts.get('completed', 0)}/{counts.get('total', 0)} 완료, 실패 {counts.get('failed', 0)})")
+        if batch["status"] in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def iter_batch_output(client, batch):
+    """▶️ 결과/오류 파일을 읽어 (custom_id, 응답 본문 content 또는 None, 오류 메시지) 반환"""
+    for key in ("output_file_id", "error_file_id"):
+        file_id = batch.get(key)
+        if not file_id:
+            continue
+        for line in client.download_file(file_id).splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                error = record.get("error") or response.get("body", {}).get("error") or {}
+                yield record["custom_id"], None, str(error.get("message", error))[:100]
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            yield record["custom_id"], content, ""
+
+
+def run_batch(client, items, work_dir, model, system_message, parse, poll_interval=60, max_rounds=3):
+    """▶️ 배치 제출 → 결과 수집, 실패한 custom_id는 새 배치로 다시 제출 (최대 max_rounds회)
+
+    parse(content)는 파싱된 결과를 반환하거나 예외를 던짐
+    반환: (results {custom_id: (parsed, 원본 응답 content)}, failures {custom_id: 실패 사유})
+    """
+    prompts = dict(items)
+    results, failures = {}, {}
+    pending = list(prompts)
+
+    for round_no in range(1, max_rounds + 1):
+        if not pending:
+            break
+
+        input_path = os.path.join(work_dir, f"batch_requests_r{round_no}.jsonl")
+        write_batch_file(input_path, [(cid, prompts[cid]) for cid in pending], model, system_message)
+        file_id = client.upload_file(input_path)
+        batch = client.create_batch(file_id, metadata={"round": str(round_no)})
+        print(f"📤 배치 제출 (라운드 {round_no}): {batch['id']} / 요청 {len(pending)}건")
+
+        batch = wait_for_batch(client, batch["id"], poll_interval)
+
+        answered = set()
+        for custom_id, content, error in iter_batch_output(client, batch):
+            answered.add(custom_id)
+            if content is None:
+                failures[custom_id] = f"Batch Error: {error}"
+                continue
+            try:
+                results[custom_id] = (parse(content), content)
+                failures.pop(custom_id, None)
+            except Exception as e:
+                failures[custom_id] = f"Parsing Failed: {e}"
+
+        for custom_id in pending:
+            if custom_id not in answered:
+                failures[custom_id] = f"No Response (batch {batch['status']})"
+
+        pending = [cid for cid in pending if cid not in results]
+        if pending:
+            print(f"🔁 실패 {len(pending)}건 재배치 예정")
+
+    return results, {cid: reason for cid, reason in failures.items() if cid not in results}
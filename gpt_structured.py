@@ -0,0 +1,283 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from metrics import metrics
+
+# ▶️ 추출 결과 JSON 스키마 (function calling의 parameters로 전달)
+FUNCTION_NAME = "record_value_chain"
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "industry": {"type": "string", "description": "Main industry sector of the target company"},
+        "suppliers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "Raw material or service category"},
+                    "company": {"type": "string", "description": "Exact name of supplier company"},
+                },
+                "required": ["category", "company"],
+                "additionalProperties": False,
+            },
+        },
+        "buyers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "Product or service type"},
+                    "company": {"type": "string", "description": "Exact name of buyer company"},
+                },
+                "required": ["category", "company"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["industry", "suppliers", "buyers"],
+    "additionalProperties": False,
+}
+
+# ▶️ 1K 토큰당 가격 (USD, 입력/출력) — 계정 요금표에 맞춰 수정
+PRICES_PER_1K = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+
+# ▶️ 재요청 사유 중 응답 형식 문제로 생긴 것 (rate limit/네트워크 오류와 구분)
+FORMAT_REASONS = ("json", "refusal")
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def structured_request(strict=False):
+    """▶️ ChatCompletion 요청에 추가할 인자 (tools + tool_choice로 함수 호출 강제)
+
+    strict=True는 JSON 스키마를 정확히 따르도록 강제 (지원 모델에서만 사용)
+    """
+    function = {
+        "name": FUNCTION_NAME,
+        "description": "Record the industry, suppliers and buyers extracted from the business report.",
+        "parameters": EXTRACTION_SCHEMA,
+    }
+    if strict:
+        function["strict"] = True
+    return {
+        "tools": [{"type": "function", "function": function}],
+        "tool_choice": {"type": "function", "function": {"name": FUNCTION_NAME}},
+    }
+
+
+def message_content(message):
+    """▶️ 응답 메시지에서 JSON 문자열 추출 (tool_calls → function_call → content 순)"""
+    tool_calls = message.get("tool_calls") or []
+    if tool_calls:
+        return tool_calls[0]["function"]["arguments"] or ""
+    function_call = message.get("function_call")
+    if function_call:
+        return function_call["arguments"] or ""
+    return message.get("content") or ""
+
+
+def _truncation_candidate(text):
+    """▶️ 잘린 JSON에서 마지막으로 완성된 값까지만 남기고 열린 괄호를 닫은 문자열 (불가능하면 None)
+
+    객체는 키 → 콜론 → 값 순서를 추적해, 값이 끝난 위치(문자열 값 / 닫힌 괄호 / 빈 괄호 직후)만 자름
+    """
+    stack = []  # [괄호, 다음에 올 것]
+    in_string = False
+    escaped = False
+    safe = None
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if stack and stack[-1][0] == "{" and stack[-1][1] == "key":
+                    stack[-1][1] = "colon"
+                else:
+                    if stack:
+                        stack[-1][1] = "comma"
+                    safe = (i + 1, [frame[0] for frame in stack])
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append([ch, "key" if ch == "{" else "value"])
+            safe = (i + 1, [frame[0] for frame in stack])
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if stack:
+                stack[-1][1] = "comma"
+            safe = (i + 1, [frame[0] for frame in stack])
+            if not stack:
+                break
+        elif ch == ":" and stack:
+            stack[-1][1] = "value"
+        elif ch == "," and stack:
+            stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+
+    if safe is None:
+        return None
+    end, open_brackets = safe
+    closers = "".join("}" if bracket == "{" else "]" for bracket in reversed(open_brackets))
+    return text[:end] + closers
+
+
+def repair_json(text):
+    """▶️ 형식이 깨진 JSON을 로컬에서 복구 (마크다운/앞뒤 설명 제거, 끝 쉼표 제거, 잘린 응답 닫기)
+
+    복구하지 못하면 None
+    """
+    text = re.sub(r"```(?:json)?", "", text)
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    for candidate in (text, _TRAILING_COMMA_RE.sub(r"\1", text)):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+    candidate = _truncation_candidate(text)
+    if candidate is None:
+        return None
+    try:
+        return json.loads(_TRAILING_COMMA_RE.sub(r"\1", candidate))
+    except ValueError:
+        return None
+
+
+def normalize_result(parsed):
+    """▶️ 스키마 형태로 정리 (industry 문자열, suppliers/buyers는 category·company가 있는 항목만)"""
+    if not isinstance(parsed, dict):
+        raise ValueError("JSON 객체가 아님")
+    result = {"industry": str(parsed.get("industry") or "기타").strip()}
+    for role in ("suppliers", "buyers"):
+        entries = parsed.get(role) or []
+        if not isinstance(entries, list):
+            entries = []
+        result[role] = [
+            {"category": str(entry.get("category") or "").strip(), "company": str(entry["company"]).strip()}
+            for entry in entries
+            if isinstance(entry, dict) and entry.get("company") and str(entry["company"]).strip()
+        ]
+    return result
+
+
+def parse_extraction(text):
+    """▶️ 응답 JSON 파싱 → (결과, 로컬 복구 여부), 복구도 실패하면 ValueError
+
+    복구는 마지막 목록(buyers) 안에서 잘린 경우까지만 인정 (잘린 항목만 버리고 나머지는 사용)
+    """
+    try:
+        return normalize_result(json.loads(text)), False
+    except ValueError:
+        pass
+    repaired = repair_json(text)
+    if repaired is None:
+        raise ValueError("JSON 파싱 실패 (로컬 복구 불가)")
+    # ▶️ 필수 키가 빠질 만큼 일찍 잘린 응답은 빈 결과로 받아들이지 않고 재요청
+    if not isinstance(repaired, dict) or any(key not in repaired for key in EXTRACTION_SCHEMA["required"]):
+        raise ValueError("JSON 파싱 실패 (필수 키 누락)")
+    return normalize_result(repaired), True
+
+
+class ExtractionStats:
+    """▶️ 실행 단위 GPT 추출 통계 (재요청률과 그 토큰 비용 측정)
+
+    - response(usage): 응답을 받을 때마다 토큰 사용량 기록
+    - retry(reason, usage): 응답을 버리고 다시 요청할 때 (버린 응답의 토큰은 낭비로 집계)
+    - finish(success, repaired): 프롬프트 1건의 최종 결과
+    """
+
+    def __init__(self, model, prices=None):
+        self.model = model
+        self.prices = prices or PRICES_PER_1K
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.prompts = 0
+        self.succeeded = 0
+        self.cached = 0
+        self.repaired = 0
+        self.retries = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+
+    def response(self, usage):
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens", 0) or 0
+        completion_tokens = usage.get("completion_tokens", 0) or 0
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        metrics.gpt_usage(self.model, prompt_tokens, completion_tokens, self.cost(prompt_tokens, completion_tokens))
+        return usage
+
+    def retry(self, reason, usage=None):
+        usage = usage or {}
+        metrics.retry("gpt", reason)
+        with self.lock:
+            self.retries[reason] += 1
+            self.wasted_prompt_tokens += usage.get("prompt_tokens", 0) or 0
+            self.wasted_completion_tokens += usage.get("completion_tokens", 0) or 0
+
+    def cache_hit(self):
+        with self.lock:
+            self.cached += 1
+
+    def finish(self, success, repaired=False):
+        with self.lock:
+            self.prompts += 1
+            self.succeeded += int(success)
+            self.repaired += int(success and repaired)
+
+    def cost(self, prompt_tokens, completion_tokens):
+        price_in, price_out = self.prices.get(self.model, (0.0, 0.0))
+        return prompt_tokens / 1000 * price_in + completion_tokens / 1000 * price_out
+
+    def to_dict(self):
+        with self.lock:
+            format_retries = sum(self.retries[r] for r in FORMAT_REASONS)
+            return {
+                "model": self.model,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "elapsed_seconds": round(time.time() - self.started, 1),
+                "prompts": self.prompts,
+                "succeeded": self.succeeded,
+                "cached": self.cached,
+                "requests": self.requests,
+                "retries": dict(self.retries),
+                "format_retry_rate": format_retries / self.requests if self.requests else 0.0,
+                "locally_repaired": self.repaired,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost(self.prompt_tokens, self.completion_tokens), 4),
+                "wasted_prompt_tokens": self.wasted_prompt_tokens,
+                "wasted_completion_tokens": self.wasted_completion_tokens,
+                "wasted_cost_usd": round(self.cost(self.wasted_prompt_tokens, self.wasted_completion_tokens), 4),
+            }
+
+    def summary(self):
+        d = self.to_dict()
+        return (f"GPT 요청 {d['requests']}건 (프롬프트 {d['prompts']}건, 성공 {d['succeeded']}, 캐시 {d['cached']}), "
+                f"형식 재요청률 {d['format_retry_rate'] * 100:.1f}% {d['retries']}, 로컬 복구 {d['locally_repaired']}건, "
+                f"비용 ${d['cost_usd']:.2f} 중 재요청 낭비 ${d['wasted_cost_usd']:.2f}")
+
+    def save(self, path):
+        """실행 1회 = JSONL 한 줄로 추가 기록"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
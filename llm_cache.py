@@ -0,0 +1,97 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# ▶️ 기본값: 90일 지난 응답은 무효, 전체 1GB 초과 시 오래 안 쓴 응답부터 삭제
+DEFAULT_TTL_SECONDS = 90 * 24 * 3600
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+
+class LLMCache:
+    """▶️ GPT 응답 캐시 (SQLite 파일 1개)
+
+    키 = sha256(모델명 + 시스템 메시지 + 완성된 프롬프트) → 원본 응답과 파싱된 JSON 저장
+    """
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                raw_response TEXT,
+                parsed TEXT,
+                created REAL,
+                accessed REAL,
+                size INTEGER
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, system_message, prompt):
+        digest = hashlib.sha256()
+        for part in (model, system_message, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key):
+        """(raw_response, parsed) 반환, 없거나 만료되면 None"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT raw_response, parsed, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key, model, raw_response, parsed):
+        now = time.time()
+        parsed_text = json.dumps(parsed, ensure_ascii=False)
+        size = len(raw_response.encode("utf-8")) + len(parsed_text.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, raw_response, parsed_text, now, now, size),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"LLM 캐시 적중 {self.hits}건 / 조회 {total}건 ({rate:.1f}%)"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -7,9 +7,25 @@ import tiktoken
 import time
 import zipfile
 import requests
-import xml.etree.ElementTree as ET
 import re
+import hashlib
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from run_state import RunState
+from gpt_batch import BatchClient, run_batch
+from gpt_async import ChatClient, RateBudget, parse_reset, run_ordered
+from llm_cache import LLMCache
+from token_budget import truncate_to_tokens
+from context_pack import pack_context
+from counterparty_match import CounterpartyMatcher
+from dedup import normalize_name
+from corp_index import CorpIndex
+from output_store import OutputStore, write_excel_atomic
+from report_store import ReportStore
+from gpt_structured import ExtractionStats, message_content, parse_extraction, structured_request
+from metrics import metrics, init_from_cli
 
 # ▶️ DART API 키 설정
 DART_API_KEY = "DART API KEY"
@@ -26,10 +42,76 @@ json_folder = r"json 폴더 경로 입력"
 output_folder = r"결과 폴더 경로 입력"
 os.makedirs(output_folder, exist_ok=True)
 
+# ▶️ 입력 형식: "json" = json_folder의 {code}.json / "shard" = dart_report.py의 샤드 저장소 (필요한 부분만 압축 해제)
+INPUT_FORMAT = "json"
+report_store_dir = r"샤드 저장소 경로 입력"
+
+# ▶️ 결과 저장 방식: "excel" = 종목별 .xlsx / "parquet" = 단계·종목별 Parquet 데이터셋 (dart_deal/smartmerge와 같은 경로 사용)
+OUTPUT_BACKEND = "excel"
+OUTPUT_STAGE = "gpt"
+store_root = r"결과 데이터셋 경로 입력"
+output_store = OutputStore(store_root) if OUTPUT_BACKEND == "parquet" else None
+
+# ▶️ 증분 실행: 지난 실행 이후 내용이 바뀐 JSON만 GPT에 다시 보냄
+INCREMENTAL = True
+state_path = os.path.join(output_folder, "run_state_gpt.json")
+
+# ▶️ GPT 모델 및 시스템 메시지
+GPT_MODEL = "gpt-4"
+SYSTEM_MESSAGE = "You extract business relations and industry classification from financial reports."
+
+# ▶️ Batch API 모드: 전체 프롬프트를 JSONL로 묶어 한 번에 제출 (실패 종목은 자동 재제출)
+USE_BATCH_API = False
+OPENAI_API_BASE = "https://api.openai.com/v1"  # 로컬 대체 서버 테스트 시 예: "http://127.0.0.1:8765/v1"
+BATCH_POLL_INTERVAL = 60
+BATCH_MAX_ROUNDS = 3
+
+# ▶️ 비동기 동시 처리 모드: RPM/TPM 한도 안에서 여러 종목을 동시에 요청 (계정 등급에 맞춰 조정)
+USE_ASYNC = False
+ASYNC_CONCURRENCY = 8
+RPM_LIMIT = 500
+TPM_LIMIT = 40000
+EXPECTED_COMPLETION_TOKENS = 1000  # 응답 토큰 예상치 (TPM 예산 계산용)
+
+# ▶️ 순차/청크 모드 요청 속도 제한: None이면 제한 없음 (work_queue.py 작업자가 (요청 버킷, 토큰 버킷)으로 설정)
+sync_limiters = None
+
+# ▶️ 구조화 출력: function calling(JSON 스키마)으로 응답 형식을 고정 (잘린 JSON은 모드와 관계없이 재요청 전에 로컬 복구)
+USE_STRUCTURED_OUTPUT = False
+STRUCTURED_STRICT = False  # 스키마 강제(strict)는 지원 모델(gpt-4o-2024-08-06 이후)에서만 True
+stats_path = os.path.join(output_folder, "gpt_run_stats.jsonl")  # 실행마다 재요청률/토큰 비용 한 줄씩 기록
+gpt_stats = ExtractionStats(GPT_MODEL)
+
+# ▶️ GPT 응답 캐시: 같은 모델 + 같은 프롬프트면 API를 호출하지 않고 저장된 응답 사용
+USE_LLM_CACHE = True
+llm_cache_path = os.path.join(output_folder, "llm_cache.sqlite")
+LLM_CACHE_TTL_DAYS = 90
+llm_cache = None  # ▶️ 실행 시 생성
+metrics.track_cache("llm_cache", lambda: llm_cache)
+
 # ▶️ GPT 토큰 제한
 TOKEN_LIMIT = 6000
 tokenizer = tiktoken.get_encoding("cl100k_base")
 
+# ▶️ 청크 분할 모드: 토큰 한도를 넘는 본문을 버리지 않고 여러 청크로 나눠 동시에 추출한 뒤 병합
+USE_CHUNKING = False
+CHUNK_OVERLAP = 200
+MAX_CHUNKS = 8
+CHUNK_CONCURRENCY = 4
+
+# ▶️ 컨텍스트 압축 모드: 본문 문단과 표 행을 매입처/매출처 관련도(BM25)로 점수화하여 높은 것부터 토큰 한도까지 담음
+USE_CONTEXT_PACKING = False
+
+# ▶️ 사전 매칭: 상장사 이름 사전으로 본문/표에서 공급처·판매처 후보를 먼저 찾아 GPT 호출을 줄임
+#   - 표 근거 후보 PREEXTRACT_MIN_HITS개 이상 + 신뢰도 PREEXTRACT_SKIP_CONFIDENCE 이상: GPT 추출 생략
+#     (업종은 이전 GPT 결과에서 가져오고, 없으면 본문 앞 INDUSTRY_SAMPLE_TOKENS 토큰만 GPT로 보내 분류)
+#   - 후보 PREEXTRACT_MIN_HITS개 이상 + 신뢰도 PREEXTRACT_MIN_CONFIDENCE 이상: 후보를 힌트로 모든 청크 프롬프트에 추가
+USE_DICT_PREEXTRACT = False
+PREEXTRACT_SKIP_CONFIDENCE = 0.9
+PREEXTRACT_MIN_CONFIDENCE = 0.8
+PREEXTRACT_MIN_HITS = 2  # 표 1건만 맞아도 평균 신뢰도는 1.0이므로 건수도 함께 확인
+INDUSTRY_SAMPLE_TOKENS = 600
+
 # ▶️ DART 종목코드 → 기업명 매핑
 def download_and_extract_corpcode():
     if not os.path.exists(XML_FILE):
@@ -41,38 +123,20 @@ def download_and_extract_corpcode():
             zip_ref.extractall()
         print("\u2705 CORPCODE.xml \ucd94\ucd9c \uc644\ub8cc")
 
-def load_stock_code_to_company_name():
-    stock_to_name = {}
+# ▶️ CORPCODE.xml은 처음 한 번만 파싱하고 색인(pickle)으로 저장, zip/xml이 바뀌면 다시 생성
+def load_corp_index():
     download_and_extract_corpcode()
-    tree = ET.parse(XML_FILE)
-    root = tree.getroot()
+    return CorpIndex.load(XML_FILE, ZIP_FILE)
 
-    for corp in root.findall("list"):
-        stock_code = corp.find("stock_code").text
-        corp_name = corp.find("corp_name").text
-        if stock_code:
-            stock_to_name[stock_code] = corp_name
+def load_stock_code_to_company_name():
+    return load_corp_index().stock_to_name()
 
-    return stock_to_name
+# ▶️ 텍스트 전처리 (잘라낸 텍스트와 토큰 수 반환, 인코딩 1회 + 문단/문장 경계에서 자르기)
+def preprocess_text_with_count(raw_text, max_tokens=TOKEN_LIMIT):
+    return truncate_to_tokens(raw_text, max_tokens, tokenizer)
 
-# ▶️ 텍스트 전처리
 def preprocess_text(raw_text, max_tokens=TOKEN_LIMIT):
-    token_count = len(tokenizer.encode(raw_text))
-    if token_count <= max_tokens:
-        return raw_text
-
-    sentences = raw_text.split("\n")
-    trimmed_text = []
-    total_length = 0
-
-    for sentence in sentences:
-        sentence_length = len(tokenizer.encode(sentence))
-        if total_length + sentence_length > max_tokens:
-            break
-        trimmed_text.append(sentence)
-        total_length += sentence_length
-
-    return "\n".join(trimmed_text)
+    return preprocess_text_with_count(raw_text, max_tokens)[0]
 
 # ▶️ GPT 응답 마크다운 제거 및 JSON 블록만 추출
 def clean_response(response_text):
@@ -83,9 +147,98 @@ def clean_response(response_text):
     else:
         return text
 
-# ▶️ GPT 분석 함수 (자동 재시도 포함)
-def analyze_text_with_gpt(company_name, raw_text, max_retry=3):
-    trimmed_text = preprocess_text(raw_text)
+# ▶️ 사전 매칭 힌트 문단 (프롬프트의 본문 앞에 붙일 텍스트와 토큰 수, 힌트가 없으면 빈 문자열)
+def hint_block_with_tokens(hints):
+    if not hints:
+        return "", 0
+    block = f"{hints}\n\n"
+    return block, len(tokenizer.encode(block))
+
+# ▶️ 본문을 토큰 한도 이하 청크로 분할 (한도 이내면 그대로 1개, reserve = 청크마다 붙는 힌트 토큰 수)
+_text_splitters = {}
+
+def split_into_chunks(raw_text, reserve=0):
+    if not USE_CHUNKING:
+        return [raw_text]
+    chunk_size = TOKEN_LIMIT - reserve
+    if chunk_size not in _text_splitters:
+        _text_splitters[chunk_size] = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base", chunk_size=chunk_size, chunk_overlap=CHUNK_OVERLAP
+        )
+    chunks = _text_splitters[chunk_size].split_text(raw_text) or [raw_text]
+    if len(chunks) > MAX_CHUNKS:
+        print(f"⚠️ 청크 {len(chunks)}개 중 앞 {MAX_CHUNKS}개만 사용")
+        chunks = chunks[:MAX_CHUNKS]
+    return chunks
+
+# ▶️ 청크별 추출 결과 병합 (industry는 최빈값, 공급처/판매처는 category + 기업명 기준 중복 제거)
+def merge_chunk_results(chunk_results):
+    """chunk_results: [(parsed 또는 None, 응답 요약)] → (병합된 결과 또는 None, 응답 요약, 실패한 청크 수)
+
+    일부 청크만 실패하면 나머지로 병합하되 실패 수를 함께 반환 (save_company_result가 완료로 기록하지 않음)
+    """
+    if len(chunk_results) == 1:
+        parsed, summary = chunk_results[0]
+        return parsed, summary, 0 if parsed is not None else 1
+    parsed_list = [parsed for parsed, _ in chunk_results if parsed is not None]
+    failed_chunks = len(chunk_results) - len(parsed_list)
+    if not parsed_list:
+        return None, chunk_results[0][1] if chunk_results else "", failed_chunks
+    if len(parsed_list) < len(chunk_results):
+        print(f"⚠️ 청크 {len(chunk_results)}개 중 {len(chunk_results) - len(parsed_list)}개 추출 실패, 나머지로 병합")
+
+    industries = Counter(p.get("industry") for p in parsed_list if p.get("industry"))
+    merged = {"industry": industries.most_common(1)[0][0] if industries else "기타", "suppliers": [], "buyers": []}
+
+    for role in ("suppliers", "buyers"):
+        seen = set()
+        for parsed in parsed_list:
+            for entry in parsed.get(role, []):
+                key = (str(entry.get("category", "")).strip(), normalize_name(entry.get("company", "")))
+                if key not in seen:
+                    seen.add(key)
+                    merged[role].append(entry)
+
+    return merged, next(summary for parsed, summary in chunk_results if parsed is not None), failed_chunks
+
+# ▶️ GPT 거절성 응답 감지 / JSON 파싱
+REFUSAL_KEYWORDS = ["don't have access", "cannot access", "cannot browse"]
+
+def is_refusal(raw_content):
+    return any(kw in raw_content.lower() for kw in REFUSAL_KEYWORDS)
+
+def parse_gpt_content(raw_content):
+    if is_refusal(raw_content):
+        raise ValueError("GPT가 데이터 접근 불가 응답을 반환")
+    return parse_extraction(clean_response(raw_content))[0]
+
+def build_request_messages(prompt):
+    """▶️ 요청 본문 (구조화 출력 모드면 tools/tool_choice 추가)"""
+    body = {
+        "model": GPT_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if USE_STRUCTURED_OUTPUT:
+        body.update(structured_request(STRUCTURED_STRICT))
+    return body
+
+# ▶️ GPT 프롬프트 생성
+_prompt_overhead_tokens = None
+
+def build_prompt(company_name, raw_text, hints=""):
+    return build_prompt_with_tokens(company_name, raw_text, hints)[0]
+
+def build_prompt_with_tokens(company_name, raw_text, hints=""):
+    """프롬프트와 예상 입력 토큰 수 반환 (본문 토큰 수는 전처리 결과를 재사용, 안내문 토큰 수는 최초 1회만 계산)
+
+    사전 매칭 힌트가 있으면 본문 앞에 붙이고 그 토큰 수만큼 본문 한도를 줄임 (힌트가 없으면 프롬프트는 기존과 동일)
+    """
+    global _prompt_overhead_tokens
+    hint_block, hint_tokens = hint_block_with_tokens(hints)
+    trimmed_text, text_tokens = preprocess_text_with_count(raw_text, TOKEN_LIMIT - hint_tokens)
 
     prompt = f"""
 You are an AI assistant specializing in analyzing financial and business reports.
@@ -137,96 +290,448 @@ Example Output:
 
 Now analyze the following offline business report for: {company_name}
 
-{trimmed_text}
+{hint_block}{trimmed_text}
 """
+    if _prompt_overhead_tokens is None:
+        _prompt_overhead_tokens = (len(tokenizer.encode(prompt)) - text_tokens - hint_tokens
+                                   + len(tokenizer.encode(SYSTEM_MESSAGE)))
+    return prompt, text_tokens + hint_tokens + _prompt_overhead_tokens
+
+# ▶️ GPT 응답 캐시 조회/저장
+def cache_lookup(prompt):
+    """(캐시 키, 캐시된 (raw_response, parsed) 또는 None) 반환"""
+    if llm_cache is None:
+        return None, None
+    key = LLMCache.make_key(GPT_MODEL, SYSTEM_MESSAGE, prompt)
+    return key, llm_cache.get(key)
+
+def cache_store(key, raw_content, parsed_json):
+    if llm_cache is not None and key is not None:
+        llm_cache.put(key, GPT_MODEL, raw_content, parsed_json)
+
+# ▶️ GPT 분석 함수 (자동 재시도 포함)
+def analyze_text_with_gpt(company_name, raw_text, max_retry=3, hints=""):
+    prompt, prompt_tokens = build_prompt_with_tokens(company_name, raw_text, hints)
+    cache_key, cached = cache_lookup(prompt)
+    if cached is not None:
+        print(f"💾 캐시된 GPT 응답 사용: {company_name}")
+        gpt_stats.cache_hit()
+        return cached[1], cached[0][:100]
 
     attempt = 0
     while attempt < max_retry:
+        usage = None
+        if sync_limiters is not None:
+            request_bucket, token_bucket = sync_limiters
+            metrics.rate_limit_wait("gpt", request_bucket.acquire()
+                                    + token_bucket.acquire(min(prompt_tokens + EXPECTED_COMPLETION_TOKENS, token_bucket.capacity)))
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You extract business relations and industry classification from financial reports."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            raw_content = response.choices[0].message.content
+            with metrics.request("openai"):
+                response = openai.ChatCompletion.create(**build_request_messages(prompt))
+            usage = gpt_stats.response(response.get("usage"))
+            raw_content = message_content(response.choices[0].message)
             print("📤 GPT 응답:")
             print(raw_content.encode("utf-8", errors="replace").decode("utf-8"))
 
-            if any(kw in raw_content.lower() for kw in ["don't have access", "cannot access", "cannot browse"]):
+            if is_refusal(raw_content):
                 print("\u26a0\ufe0f \uc774\uc0c1 \uc751\ub2f5 \uac10\uc9c0, \uc7ac\uc2dc\ub3c4...")
+                gpt_stats.retry("refusal", usage)
                 attempt += 1
                 time.sleep(3)
                 continue
 
+            # ▶️ 잘리거나 형식이 깨진 JSON은 로컬에서 먼저 복구 (복구 불가일 때만 재요청)
             cleaned_content = clean_response(raw_content)
-            parsed_json = json.loads(cleaned_content)
+            parsed_json, repaired = parse_extraction(cleaned_content)
+            if repaired:
+                print("🩹 JSON 로컬 복구 성공")
+            cache_store(cache_key, raw_content, parsed_json)
+            gpt_stats.finish(True, repaired)
             return parsed_json, raw_content[:100]
 
-        except json.JSONDecodeError:
+        except ValueError:
             print("\u274c JSON \ud30c\uc2f1 \uc2e4\ud328. \uc7ac\uc2dc\ub3c4...")
+            gpt_stats.retry("json", usage)
             attempt += 1
             time.sleep(3)
 
         except openai.error.RateLimitError as e:
             wait_time = 30
             print(f"\u26a0\ufe0f Rate Limit \ubc1c\uc0dd, {wait_time}\ucd08 \ub300\uae30 \ud6c4 \uc7ac\uc2dc\ub3c4...")
+            gpt_stats.retry("rate_limit")
             time.sleep(wait_time)
 
         except Exception as e:
             print(f"\u26a0\ufe0f GPT \uc694\uccad \uc911 \uc608\uc678 \ubc1c\uc0dd: {e}")
+            gpt_stats.retry("error", usage)
             attempt += 1
             time.sleep(3)
 
     print("\ud83d\udeab \ucd5c\ub300 \uc7ac\uc2dc\ub3c4 \ucd08\uacfc. \ubd84\uc11d \uc2e4\ud328.")
+    gpt_stats.finish(False)
     return None, ""
 
-# ▶️ 전체 JSON 파일 처리
-if __name__ == "__main__":
-    stock_to_name = load_stock_code_to_company_name()
-    json_files = glob.glob(os.path.join(json_folder, "*.json"))
-    total_files = len(json_files)
+# ▶️ GPT 비동기 분석 함수 (종목별로 재시도, rate limit 헤더로 전체 속도 조절)
+async def analyze_text_with_gpt_async(client, budget, company_name, raw_text, max_retry=3, max_rate_limit_retry=10,
+                                      hints=""):
+    prompt, prompt_tokens = build_prompt_with_tokens(company_name, raw_text, hints)
+    cache_key, cached = cache_lookup(prompt)
+    if cached is not None:
+        gpt_stats.cache_hit()
+        return cached[1], cached[0][:100]
 
-    fail_list = []
+    body = build_request_messages(prompt)
+
+    attempt = 0
+    rate_limited = 0
+    while attempt < max_retry:
+        await budget.acquire(prompt_tokens + EXPECTED_COMPLETION_TOKENS)
+        try:
+            status, headers, payload = await client.create(body)
+        except Exception as e:
+            print(f"⚠️ GPT 요청 중 예외 발생 ({company_name}): {e}")
+            gpt_stats.retry("error")
+            attempt += 1
+            await asyncio.sleep(3)
+            continue
+
+        budget.update_from_headers(headers)
+
+        if status == 429:
+            gpt_stats.retry("rate_limit")
+            rate_limited += 1
+            if rate_limited > max_rate_limit_retry:
+                break
+            wait_time = float(headers.get("retry-after") or 0) or parse_reset(headers.get("x-ratelimit-reset-tokens")) or 30
+            budget.penalize(wait_time)
+            print(f"⚠️ Rate Limit 발생 ({company_name}), {wait_time:.1f}초 대기 후 재시도...")
+            continue
+
+        if status >= 400:
+            print(f"⚠️ GPT 요청 중 예외 발생 ({company_name}): HTTP {status} {payload.get('error', {}).get('message', '')}")
+            gpt_stats.retry("error")
+            attempt += 1
+            await asyncio.sleep(3)
+            continue
+
+        usage = gpt_stats.response(payload.get("usage"))
+        raw_content = message_content(payload["choices"][0]["message"])
+        if is_refusal(raw_content):
+            print(f"⚠️ 이상 응답 감지 ({company_name}), 재시도...")
+            gpt_stats.retry("refusal", usage)
+            attempt += 1
+            await asyncio.sleep(3)
+            continue
 
-    for idx, json_file in enumerate(json_files, start=1):
         try:
-            with open(json_file, "r", encoding="utf-8") as file:
-                data = json.load(file)
+            parsed_json, repaired = parse_extraction(clean_response(raw_content))
+        except ValueError:
+            print(f"❌ JSON 파싱 실패 ({company_name}). 재시도...")
+            gpt_stats.retry("json", usage)
+            attempt += 1
+            await asyncio.sleep(3)
+            continue
 
-            ticker_code = os.path.basename(json_file).replace(".json", "")
-            company_name = stock_to_name.get(ticker_code, ticker_code)
+        cache_store(cache_key, raw_content, parsed_json)
+        gpt_stats.finish(True, repaired)
+        return parsed_json, raw_content[:100]
 
-            print(f"▶ [{idx}/{total_files}] Processing: {ticker_code} ({company_name})...")
+    print(f"🚫 최대 재시도 초과. 분석 실패: {company_name}")
+    gpt_stats.finish(False)
+    return None, ""
+
+# ▶️ 종목 단위 분석 (청크가 여러 개면 동시에 추출 후 병합, 사전 매칭 힌트는 모든 청크에 붙임)
+def analyze_company_with_gpt(company_name, raw_text, hints=""):
+    chunks = split_into_chunks(raw_text, hint_block_with_tokens(hints)[1])
+    if len(chunks) == 1:
+        return merge_chunk_results([analyze_text_with_gpt(company_name, chunks[0], hints=hints)])
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as executor:
+        chunk_results = list(executor.map(lambda chunk: analyze_text_with_gpt(company_name, chunk, hints=hints), chunks))
+    return merge_chunk_results(chunk_results)
+
+async def analyze_company_with_gpt_async(client, budget, company_name, raw_text, hints=""):
+    chunks = split_into_chunks(raw_text, hint_block_with_tokens(hints)[1])
+    chunk_results = await asyncio.gather(
+        *(analyze_text_with_gpt_async(client, budget, company_name, chunk, hints=hints) for chunk in chunks)
+    )
+    return merge_chunk_results(chunk_results)
+
+# ▶️ 처리 대상 로드 (변경 없는 종목은 건너뜀)
+# report_store를 넘기면 json_files 대신 샤드 저장소의 종목코드 목록을 처리 (내용 해시는 색인에서 읽음)
+def load_tasks(json_files, stock_to_name, state, fail_list, report_store=None, verbose=True):
+    tasks = []
+    skipped = 0
+    need_sections = USE_DICT_PREEXTRACT or USE_CONTEXT_PACKING
+    for json_file in json_files:
+        ticker_code = os.path.basename(json_file).replace(".json", "")
+        company_name = stock_to_name.get(ticker_code, ticker_code)
+        try:
+            if report_store is not None:
+                content_hash = report_store.content_hash(ticker_code)
+            else:
+                with open(json_file, "rb") as file:
+                    raw_bytes = file.read()
+                data = json.loads(raw_bytes.decode("utf-8"))
+                content_hash = hashlib.sha256(raw_bytes).hexdigest()
 
-            full_text = "\n".join([sec["text"] for sec in data.get("sections", [])])
-            extracted_data, response_summary = analyze_text_with_gpt(company_name, full_text)
+            excel_path = os.path.join(output_folder, f"{ticker_code}.xlsx")
 
-            if extracted_data is None:
-                fail_list.append([ticker_code, company_name, "Parsing Failed or Empty Response", response_summary])
+            # ▶️ 내용이 그대로이고 결과(엑셀 또는 데이터셋)가 있으면 건너뜀
+            if output_store is not None:
+                has_result = output_store.exists(OUTPUT_STAGE, ticker_code)
+            else:
+                has_result = os.path.exists(excel_path)
+            if state is not None and state.get(ticker_code) == content_hash and has_result:
+                skipped += 1
                 continue
 
-            industry_category = extracted_data.get("industry", "기타")
-            processed_data = []
+            # ▶️ 샤드 저장소는 본문만 필요하면 표 프레임을 풀지 않음
+            if report_store is None:
+                sections = data.get("sections", [])
+                texts = [sec["text"] for sec in sections]
+            elif need_sections:
+                sections = report_store.sections(ticker_code)
+                texts = [sec["text"] for sec in sections]
+            else:
+                sections, texts = None, report_store.texts(ticker_code)
+            task = {
+                "ticker_code": ticker_code,
+                "company_name": company_name,
+                "full_text": "\n".join(texts),
+                "content_hash": content_hash,
+                "excel_path": excel_path,
+            }
+            if USE_DICT_PREEXTRACT:
+                task["sections"] = sections
+            if USE_CONTEXT_PACKING:
+                task["full_text"], task["original_tokens"], task["packed_tokens"] = pack_context(
+                    sections, TOKEN_LIMIT, tokenizer
+                )
+            tasks.append(task)
+        except Exception as e:
+            print(f"⚠️ {json_file} 처리 중 오류 발생: {str(e)}")
+            fail_list.append([ticker_code, company_name, f"Exception: {str(e)}", ""])
+
+    if state is not None and verbose:
+        print(f"⏭️ 변경 없음으로 건너뛴 종목: {skipped}개")
+    if USE_CONTEXT_PACKING and tasks:
+        original = sum(task["original_tokens"] for task in tasks)
+        packed = sum(task["packed_tokens"] for task in tasks)
+        saved = (1 - packed / original) * 100 if original else 0.0
+        print(f"📉 컨텍스트 압축: 입력 토큰 {original:,} → {packed:,} ({saved:.1f}% 절감, 종목 {len(tasks)}개)")
+    return tasks
+
+# ▶️ GPT 결과를 종목별 엑셀로 저장
+# ▶️ 일부 청크만 실패(failed_chunks > 0)하면 결과는 저장하되 상태에 완료로 기록하지 않고 실패 목록에 추가
+#    → 다음 증분 실행/파이프라인 재실행에서 다시 처리 (LLM 캐시를 쓰면 성공한 청크는 캐시로 응답, 실패한 청크만 재요청)
+def save_company_result(task, extracted_data, response_summary, fail_list, state, progress="", failed_chunks=0):
+    ticker_code = task["ticker_code"]
+    company_name = task["company_name"]
+    try:
+        if extracted_data is None:
+            fail_list.append([ticker_code, company_name, "Parsing Failed or Empty Response", response_summary])
+            return
+        if task.get("dictionary_result"):
+            # ✅ 업종만 분류하려고 본문 앞부분만 보낸 종목: 사전 매칭 결과와 병합
+            extracted_data = merge_chunk_results([(extracted_data, response_summary),
+                                                  (task["dictionary_result"], "")])[0]
+
+        industry_category = extracted_data.get("industry", "기타")
+        processed_data = []
+
+        for supplier in extracted_data.get("suppliers", []):
+            processed_data.append([company_name, industry_category, "공급처", supplier["category"], supplier["company"]])
+
+        for buyer in extracted_data.get("buyers", []):
+            processed_data.append([company_name, industry_category, "판매처", buyer["category"], buyer["company"]])
+
+        df = pd.DataFrame(processed_data, columns=["종목명", "대분류", "중분류", "소분류", "연관기업"])
+        if output_store is not None:
+            output_store.write(OUTPUT_STAGE, ticker_code, df)
+            saved_to = f"{OUTPUT_STAGE}/{ticker_code}"
+        else:
+            write_excel_atomic(df, task["excel_path"])
+            saved_to = task["excel_path"]
+        if failed_chunks:
+            print(f"⚠️ {progress}{ticker_code} ({company_name}): 청크 {failed_chunks}개 실패, 일부 결과만 저장 → {saved_to}")
+            fail_list.append([ticker_code, company_name, f"Partial: {failed_chunks} chunk(s) failed", response_summary])
+            return
+        if state is not None:
+            state.set(ticker_code, task["content_hash"])
+
+        print(f"✅ {progress}{ticker_code} ({company_name}): 저장 완료 → {saved_to}")
+
+    except Exception as e:
+        print(f"⚠️ {progress}{ticker_code} 처리 중 오류 발생: {str(e)}")
+        fail_list.append([ticker_code, company_name, f"Exception: {str(e)}", ""])
+
+# ▶️ 사전 매칭 후보 → 프롬프트 본문 앞에 붙일 힌트 문단
+def format_dictionary_hints(candidates):
+    lines = ["Dictionary-matched candidates (include only if the text below confirms the relationship; "
+             "also extract companies not listed here):"]
+    for role in ("suppliers", "buyers"):
+        if candidates[role]:
+            names = ", ".join(f"{entry['company']} ({entry['category']})" for entry in candidates[role])
+            lines.append(f"- {role}: {names}")
+    return "\n".join(lines)
+
+# ▶️ 이전 GPT 결과의 업종 (결과가 없거나 업종이 비어 있으면 None)
+def previous_industry(task):
+    if output_store is not None:
+        df = output_store.read(OUTPUT_STAGE, task["ticker_code"])
+    elif os.path.exists(task["excel_path"]):
+        df = pd.read_excel(task["excel_path"])
+    else:
+        df = None
+    if df is None or df.empty:
+        return None
+    industries = df["대분류"].dropna().astype(str)
+    industries = industries[industries != "기타"]
+    return industries.iloc[0] if len(industries) else None
+
+# ▶️ 사전 매칭 (신뢰도 구간별 처리, GPT로 보낼 종목만 반환)
+#   - 높음: GPT 추출 생략 → 이전 업종으로 바로 저장, 이전 업종이 없으면 본문 앞부분만 GPT로 보내 업종 분류
+#   - 중간: 후보 목록을 힌트로 모든 청크 프롬프트에 추가 (컨텍스트 압축 시 힌트 토큰만큼 줄여서 다시 압축)
+def preextract_tasks(tasks, matcher, fail_list, state):
+    remaining, skipped, sampled, hinted = [], 0, 0, 0
+    for task in tasks:
+        sections = task.pop("sections", None) or []
+        candidates, confidence, table_hits = matcher.extract(task["company_name"], sections)
+        hits = len(candidates["suppliers"]) + len(candidates["buyers"])
+        if table_hits >= PREEXTRACT_MIN_HITS and confidence >= PREEXTRACT_SKIP_CONFIDENCE:
+            industry = previous_industry(task)
+            if industry is not None:
+                save_company_result(task, {"industry": industry, **candidates}, "", fail_list, state,
+                                    progress=f"[사전 매칭 {confidence:.2f}] ")
+                skipped += 1
+                continue
+            task["full_text"] = preprocess_text(task["full_text"], INDUSTRY_SAMPLE_TOKENS)
+            task["dictionary_result"] = candidates
+            sampled += 1
+        elif hits >= PREEXTRACT_MIN_HITS and confidence >= PREEXTRACT_MIN_CONFIDENCE:
+            task["hints"] = format_dictionary_hints(candidates)
+            if USE_CONTEXT_PACKING:
+                hint_tokens = hint_block_with_tokens(task["hints"])[1]
+                task["full_text"] = pack_context(sections, TOKEN_LIMIT - hint_tokens, tokenizer)[0]
+            hinted += 1
+        remaining.append(task)
+    print(f"📖 사전 매칭: GPT 생략 {skipped}개, 업종만 분류 {sampled}개, 후보 힌트 추가 {hinted}개 / {len(tasks)}개")
+    return remaining
+
+# ▶️ 순차 처리 (종목마다 ChatCompletion 1회)
+def run_sequential(tasks, fail_list, state):
+    total = len(tasks)
+    for idx, task in enumerate(tasks, start=1):
+        print(f"▶ [{idx}/{total}] Processing: {task['ticker_code']} ({task['company_name']})...")
+        try:
+            with metrics.span("gpt", task["ticker_code"]):
+                extracted_data, response_summary, failed_chunks = analyze_company_with_gpt(
+                    task["company_name"], task["full_text"], task.get("hints", "")
+                )
+        except Exception as e:
+            print(f"⚠️ [{idx}/{total}] {task['ticker_code']} 처리 중 오류 발생: {str(e)}")
+            fail_list.append([task["ticker_code"], task["company_name"], f"Exception: {str(e)}", ""])
+            continue
+        save_company_result(task, extracted_data, response_summary, fail_list, state, progress=f"[{idx}/{total}] ",
+                            failed_chunks=failed_chunks)
+
+# ▶️ Batch API 처리 (custom_id = 종목코드, 청크 분할 시 "종목코드#청크번호", 캐시에 있는 요청은 제출하지 않음)
+def run_batch_mode(tasks, fail_list, state):
+    prompts, cache_keys, cached_results, chunk_ids = {}, {}, {}, {}
+    for task in tasks:
+        hints = task.get("hints", "")
+        chunks = split_into_chunks(task["full_text"], hint_block_with_tokens(hints)[1])
+        ids = [task["ticker_code"]] if len(chunks) == 1 else [f"{task['ticker_code']}#{i}" for i in range(len(chunks))]
+        chunk_ids[task["ticker_code"]] = ids
+        for custom_id, chunk in zip(ids, chunks):
+            prompt = build_prompt(task["company_name"], chunk, hints)
+            cache_keys[custom_id], cached = cache_lookup(prompt)
+            if cached is not None:
+                cached_results[custom_id] = (cached[1], cached[0])
+            else:
+                prompts[custom_id] = prompt
+
+    results, failures = {}, {}
+    if prompts:
+        client = BatchClient(openai.api_key, api_base=OPENAI_API_BASE, organization=openai.organization)
+        results, failures = run_batch(
+            client, list(prompts.items()), output_folder, GPT_MODEL, SYSTEM_MESSAGE, parse_gpt_content,
+            poll_interval=BATCH_POLL_INTERVAL, max_rounds=BATCH_MAX_ROUNDS,
+        )
+        for custom_id, (extracted_data, raw_content) in results.items():
+            cache_store(cache_keys[custom_id], raw_content, extracted_data)
+    results.update(cached_results)
+
+    for task in tasks:
+        ticker_code = task["ticker_code"]
+        chunk_results = [
+            (results[cid][0], results[cid][1][:100]) if cid in results else (None, "")
+            for cid in chunk_ids[ticker_code]
+        ]
+        extracted_data, response_summary, failed_chunks = merge_chunk_results(chunk_results)
+        if extracted_data is not None:
+            save_company_result(task, extracted_data, response_summary, fail_list, state, failed_chunks=failed_chunks)
+        else:
+            reason = next((failures[cid] for cid in chunk_ids[ticker_code] if cid in failures), "No Response")
+            fail_list.append([ticker_code, task["company_name"], reason, ""])
+
+# ▶️ 비동기 동시 처리 (결과 저장과 실패 목록은 입력 순서대로 기록)
+def run_async_mode(tasks, fail_list, state):
+    client = ChatClient(openai.api_key, OPENAI_API_BASE, organization=openai.organization, pool_size=ASYNC_CONCURRENCY)
+    budget = RateBudget(RPM_LIMIT, TPM_LIMIT)
+    total = len(tasks)
+
+    async def worker(task):
+        with metrics.span("gpt", task["ticker_code"]):
+            return await analyze_company_with_gpt_async(client, budget, task["company_name"], task["full_text"],
+                                                        task.get("hints", ""))
+
+    def on_result(idx, task, result):
+        if isinstance(result, Exception):
+            print(f"⚠️ [{idx + 1}/{total}] {task['ticker_code']} 처리 중 오류 발생: {str(result)}")
+            fail_list.append([task["ticker_code"], task["company_name"], f"Exception: {str(result)}", ""])
+            return
+        extracted_data, response_summary, failed_chunks = result
+        save_company_result(task, extracted_data, response_summary, fail_list, state, progress=f"[{idx + 1}/{total}] ",
+                            failed_chunks=failed_chunks)
+
+    asyncio.run(run_ordered(tasks, worker, ASYNC_CONCURRENCY, on_result))
+    print(f"⏱️ rate limit 대기 시간 합계: {budget.wait_seconds:.1f}초")
 
-            for supplier in extracted_data.get("suppliers", []):
-                processed_data.append([company_name, industry_category, "공급처", supplier["category"], supplier["company"]])
+# ▶️ 전체 JSON 파일 처리
+if __name__ == "__main__":
+    init_from_cli("gpt")  # ▶️ 실행 지표 (--metrics-dir, --profile cprofile|sample)
+    corp_index = load_corp_index()
+    stock_to_name = corp_index.stock_to_name()
+    report_store = ReportStore(report_store_dir) if INPUT_FORMAT == "shard" else None
+    json_files = report_store.codes() if report_store is not None else glob.glob(os.path.join(json_folder, "*.json"))
 
-            for buyer in extracted_data.get("buyers", []):
-                processed_data.append([company_name, industry_category, "판매처", buyer["category"], buyer["company"]])
+    fail_list = []
+    state = RunState(state_path) if INCREMENTAL else None
+    if USE_LLM_CACHE:
+        llm_cache = LLMCache(llm_cache_path, ttl_seconds=LLM_CACHE_TTL_DAYS * 24 * 3600)
+    tasks = load_tasks(json_files, stock_to_name, state, fail_list, report_store)
+    if USE_DICT_PREEXTRACT:
+        matcher = CounterpartyMatcher(stock_to_name, corp_index.listed_eng_aliases())
+        tasks = preextract_tasks(tasks, matcher, fail_list, state)
+
+    if USE_BATCH_API:
+        run_batch_mode(tasks, fail_list, state)
+    elif USE_ASYNC:
+        run_async_mode(tasks, fail_list, state)
+    else:
+        run_sequential(tasks, fail_list, state)
 
-            df = pd.DataFrame(processed_data, columns=["종목명", "대분류", "중분류", "소분류", "연관기업"])
-            excel_path = os.path.join(output_folder, f"{ticker_code}.xlsx")
-            df.to_excel(excel_path, index=False)
+    if state is not None:
+        state.save()
 
-            print(f"✅ [{idx}/{total_files}] {ticker_code} ({company_name}): 엑셀 저장 완료 → {excel_path}")
+    if gpt_stats.requests or gpt_stats.cached:
+        print(f"📊 {gpt_stats.summary()}")
+        gpt_stats.save(stats_path)
 
-        except Exception as e:
-            print(f"⚠️ [{idx}/{total_files}] {json_file} 처리 중 오류 발생: {str(e)}")
-            ticker_code = os.path.basename(json_file).replace(".json", "")
-            company_name = stock_to_name.get(ticker_code, ticker_code)
-            fail_list.append([ticker_code, company_name, f"Exception: {str(e)}", ""])
+    if llm_cache is not None:
+        print(f"💾 {llm_cache.summary()}")
+        llm_cache.close()
 
     if fail_list:
         fail_df = pd.DataFrame(fail_list, columns=["종목코드", "기업명", "실패 이유", "GPT 응답 요약"])
@@ -0,0 +1,405 @@
+import argparse
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# 📌 실행 지표 수집 (단계·종목별 소요 시간, HTTP 요청 수/지연, 재시도, 속도 제한 대기, GPT 토큰/비용, 캐시 적중률)
+# - 트레이스: metrics/<단계>-<run_id>.trace.jsonl (종목 단위 구간, HTTP 요청 1건마다 한 줄, 작업 프로세스도 같은 파일에 추가)
+# - Prometheus: metrics/<단계>.prom (node_exporter textfile collector 형식, 실행 종료 시 덮어씀)
+# - 프로파일: --profile cprofile (메인 스레드, .prof) / --profile sample (전체 스레드 샘플링, flamegraph용 .folded)
+# 사용: python dart_deal.py --metrics-dir metrics --profile sample
+METRICS_DIR = "metrics"
+PREFIX = "valuechain"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SAMPLE_INTERVAL = 0.005  # 샘플링 프로파일러 간격(초)
+PROFILE_TOP = 30  # 종료 시 출력할 상위 함수 수
+
+HELP = {
+    "stage_seconds": "종목 1건 처리 시간 (단계별)",
+    "tickers_total": "처리한 종목 수",
+    "errors_total": "처리 중 오류 수",
+    "http_requests_total": "HTTP 요청 수",
+    "http_request_seconds": "HTTP 요청 지연",
+    "retries_total": "재시도 수 (사유별)",
+    "rate_limit_wait_seconds_total": "속도 제한으로 대기한 시간 합계",
+    "gpt_tokens_total": "GPT 토큰 수",
+    "gpt_cost_usd_total": "GPT 예상 비용 (USD)",
+    "cache_requests_total": "캐시 조회 수",
+    "cache_hit_ratio": "캐시 적중률",
+    "run_seconds": "실행 시간",
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)  # ✅ 누적 (le 이하인 관측 수)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class SamplingProfiler:
+    """📌 모든 스레드의 호출 스택을 주기적으로 기록 (스레드 풀 작업까지 보임, 오버헤드는 간격에 비례)"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self, path):
+        """샘플링 종료 후 folded 형식 저장 (flamegraph.pl / speedscope 입력), 함수별 자체 샘플 상위 목록 반환"""
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        own = Counter()
+        for stack, count in self.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        total = sum(own.values()) or 1
+        return [f"{count / total * 100:5.1f}%  {name}" for name, count in own.most_common(PROFILE_TOP)]
+
+
+class Metrics:
+    """📌 프로세스 전역 지표 저장소 (스레드 안전)
+
+    - span(stage, ticker) / timed(stage): 종목 단위 처리 시간 (트레이스 한 줄 + 히스토그램)
+    - request(host): HTTP 요청 1건 지연/결과, retry(source, reason), rate_limit_wait(limiter, seconds)
+    - gpt_usage(model, ...): 토큰/비용, track_cache(name, get_cache): hits/misses가 있는 캐시를 종료 시 집계
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.caches = {}
+        self.stage = None
+        self.run_id = None
+        self.out_dir = None
+        self.started = time.time()
+        self._trace = None
+        self._trace_pid = None
+        self._owner_pid = None
+        self._profiler = None
+        self._exported = False
+
+    # ✅ 설정
+    def configure(self, stage, out_dir=METRICS_DIR, run_id=None):
+        """지표 내보내기 시작 (이 프로세스와 여기서 만든 작업 프로세스가 같은 트레이스 파일에 기록)"""
+        self.stage = stage
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.out_dir = out_dir
+        self.started = time.time()
+        self._owner_pid = os.getpid()
+        os.makedirs(out_dir, exist_ok=True)
+
+    @property
+    def trace_path(self):
+        if self.out_dir is None:
+            return None
+        return os.path.join(self.out_dir, f"{self.stage}-{self.run_id}.trace.jsonl")
+
+    def event(self, kind, **fields):
+        """트레이스 한 줄 추가 (설정 전이면 무시)"""
+        if self.out_dir is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "pid": os.getpid(), "type": kind, **fields},
+                          ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            # ✅ fork로 만든 작업 프로세스는 자기 파일 핸들로 이어 씀
+            if self._trace is None or self._trace_pid != os.getpid():
+                self._trace = open(self.trace_path, "a", encoding="utf-8")
+                self._trace_pid = os.getpid()
+            self._trace.write(line)
+            self._trace.flush()
+
+    # ✅ 기록
+    def inc(self, name, value=1.0, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage, ticker=None):
+        """종목(또는 단계 전체) 처리 구간, 예외가 빠져나가면 status=error"""
+        record = {"status": "ok"}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("stage_seconds", seconds, stage=stage)
+            self.inc("tickers_total", stage=stage, status=record["status"])
+            self.event("span", stage=stage, ticker=ticker, seconds=round(seconds, 4), **record)
+
+    def timed(self, stage):
+        """데코레이터: 첫 번째 인자를 종목코드로 보고 span으로 감쌈"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, args[0] if args else None):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def error(self, stage):
+        self.inc("errors_total", stage=stage)
+
+    def http(self, host, status, seconds):
+        self.inc("http_requests_total", host=host, status=str(status))
+        self.observe("http_request_seconds", seconds, host=host)
+        self.event("http", host=host, status=status, seconds=round(seconds, 4))
+
+    @contextmanager
+    def request(self, host):
+        """HTTP 요청 1건 (record["status"]에 응답 코드를 넣으면 그대로, 아니면 ok/error)"""
+        record = {"status": "ok"}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            self.http(host, record["status"], time.perf_counter() - start)
+
+    def retry(self, source, reason):
+        self.inc("retries_total", source=source, reason=reason)
+
+    def rate_limit_wait(self, limiter, seconds):
+        if seconds and seconds > 0:
+            self.inc("rate_limit_wait_seconds_total", seconds, limiter=limiter)
+
+    def gpt_usage(self, model, prompt_tokens, completion_tokens, cost):
+        self.inc("gpt_tokens_total", prompt_tokens, model=model, direction="in")
+        self.inc("gpt_tokens_total", completion_tokens, model=model, direction="out")
+        self.inc("gpt_cost_usd_total", cost, model=model)
+
+    def track_cache(self, name, get_cache):
+        """get_cache()가 돌려주는 캐시(hits/misses 속성)를 내보낼 때 집계 (None이면 건너뜀)"""
+        self.caches[name] = get_cache
+
+    # ✅ 내보내기
+    def _cache_counts(self):
+        counts = {}
+        for name, get_cache in self.caches.items():
+            cache = get_cache()
+            if cache is not None:
+                counts[name] = (cache.hits, cache.misses)
+        return counts
+
+    def snapshot(self):
+        """현재 지표 dict (트레이스 마지막 줄과 요약 출력에 사용)"""
+        with self.lock:
+            counters = {f"{name}{_format_labels(labels)}": value for (name, labels), value in self.counters.items()}
+            stages = {}
+            for (name, labels), h in self.histograms.items():
+                if name == "stage_seconds":
+                    stages[dict(labels)["stage"]] = {"count": h.count, "seconds": round(h.sum, 3),
+                                                     "mean": round(h.sum / h.count, 4) if h.count else 0.0}
+        caches = {name: {"hits": hits, "misses": misses,
+                         "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0}
+                  for name, (hits, misses) in self._cache_counts().items()}
+        return {"stage": self.stage, "run_id": self.run_id, "run_seconds": round(time.time() - self.started, 3),
+                "stages": stages, "caches": caches, "counters": counters}
+
+    def prometheus_text(self):
+        lines = []
+
+        def header(name, kind):
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        with self.lock:
+            by_name = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                by_name[name].append((labels, value))
+            for name in sorted(by_name):
+                full = header(name, "counter")
+                for labels, value in sorted(by_name[name]):
+                    lines.append(f"{full}{_format_labels(labels)} {value:g}")
+
+            hist_by_name = defaultdict(list)
+            for (name, labels), h in self.histograms.items():
+                hist_by_name[name].append((labels, h))
+            for name in sorted(hist_by_name):
+                full = header(name, "histogram")
+                for labels, h in sorted(hist_by_name[name], key=lambda item: item[0]):
+                    for bound, count in zip(h.buckets, h.counts):
+                        lines.append(f"{full}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{full}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {h.sum:g}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {h.count}")
+
+        caches = self._cache_counts()
+        if caches:
+            full = header("cache_requests_total", "counter")
+            for name, (hits, misses) in sorted(caches.items()):
+                lines.append(f"{full}{_format_labels((('cache', name), ('result', 'hit')))} {hits}")
+                lines.append(f"{full}{_format_labels((('cache', name), ('result', 'miss')))} {misses}")
+            full = header("cache_hit_ratio", "gauge")
+            for name, (hits, misses) in sorted(caches.items()):
+                lines.append(f"{full}{_format_labels((('cache', name),))} {hits / (hits + misses) if hits + misses else 0:g}")
+
+        full = header("run_seconds", "gauge")
+        lines.append(f"{full}{_format_labels((('stage', self.stage),))} {time.time() - self.started:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        snap = self.snapshot()
+        parts = [f"{stage} {s['count']}건 평균 {s['mean']:.2f}초" for stage, s in snap["stages"].items()]
+        parts += [f"{name} 적중률 {c['hit_ratio'] * 100:.1f}%" for name, c in snap["caches"].items()]
+        return f"실행 {snap['run_seconds']:.1f}초 | " + " | ".join(parts)
+
+    def _collect_worker_spans(self):
+        """작업 프로세스(ProcessPoolExecutor)가 트레이스에 남긴 종목 구간을 이 프로세스의 집계에 합침"""
+        if not os.path.exists(self.trace_path):
+            return
+        with open(self.trace_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("type") == "span" and event.get("pid") != self._owner_pid:
+                    self.observe("stage_seconds", event["seconds"], stage=event["stage"])
+                    self.inc("tickers_total", stage=event["stage"], status=event["status"])
+
+    def export(self):
+        """트레이스에 요약 줄 추가 + Prometheus 파일 저장 + 프로파일 종료 (설정한 프로세스에서 한 번만)"""
+        if self.out_dir is None or self._exported or os.getpid() != self._owner_pid:
+            return
+        self._exported = True
+        self.stop_profiling()
+        self._collect_worker_spans()
+        self.event("summary", **self.snapshot())
+        prom_path = os.path.join(self.out_dir, f"{self.stage}.prom")
+        tmp_path = f"{prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, prom_path)
+        with self.lock:
+            if self._trace is not None and self._trace_pid == os.getpid():
+                self._trace.close()
+                self._trace = None
+        print(f"📊 {self.summary()}")
+        print(f"📊 지표 저장: {self.trace_path}, {prom_path}")
+
+    # ✅ 프로파일링
+    def start_profiling(self, mode, interval=SAMPLE_INTERVAL):
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            self._profiler = ("cprofile", profiler)
+        elif mode == "sample":
+            profiler = SamplingProfiler(interval)
+            profiler.start()
+            self._profiler = ("sample", profiler)
+
+    def stop_profiling(self):
+        if self._profiler is None:
+            return
+        mode, profiler = self._profiler
+        self._profiler = None
+        base = os.path.join(self.out_dir or ".", f"{self.stage}-{self.run_id}")
+        if mode == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            print(out.getvalue())
+            print(f"🔬 프로파일 저장: {base}.prof (snakeviz/pstats로 확인)")
+        else:
+            top = profiler.stop(f"{base}.folded")
+            print("🔬 자체 시간 상위 함수 (샘플 비율):")
+            print("\n".join(top))
+            print(f"🔬 프로파일 저장: {base}.folded (flamegraph.pl / speedscope로 확인)")
+
+
+# ✅ 같은 프로세스의 모든 모듈이 공유하는 지표 저장소
+metrics = Metrics()
+
+
+def add_arguments(parser):
+    """지표/프로파일 관련 명령행 옵션 추가"""
+    group = parser.add_argument_group("지표/프로파일")
+    group.add_argument("--metrics-dir", default=METRICS_DIR, help="트레이스/Prometheus 파일 폴더")
+    group.add_argument("--no-metrics", action="store_true", help="지표 파일을 쓰지 않음")
+    group.add_argument("--metrics-run-id", help="트레이스 파일 이름에 쓸 실행 ID (기본: 시작 시각)")
+    group.add_argument("--profile", choices=["cprofile", "sample"], help="프로파일러 (cprofile: 메인 스레드, sample: 전체 스레드)")
+    group.add_argument("--profile-interval", type=float, default=SAMPLE_INTERVAL, help="샘플링 간격(초)")
+    return parser
+
+
+def start(stage, args):
+    """add_arguments로 받은 옵션대로 지표/프로파일 시작, 종료 시 자동 내보내기"""
+    if args.no_metrics:
+        return metrics
+    metrics.configure(stage, args.metrics_dir, args.metrics_run_id)
+    if args.profile:
+        metrics.start_profiling(args.profile, args.profile_interval)
+    atexit.register(metrics.export)
+    return metrics
+
+
+def init_from_cli(stage, argv=None):
+    """스크립트 진입점용: 지표 옵션만 읽고 나머지 인자는 그대로 둠 (parse_known_args)"""
+    args, _ = add_arguments(argparse.ArgumentParser(add_help=False)).parse_known_args(argv)
+    return start(stage, args)
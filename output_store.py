@@ -0,0 +1,86 @@
+import glob
+import os
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # ✅ 엑셀 백엔드만 쓰면 pyarrow 없이도 동작
+    pa = None
+
+# ✅ 모든 단계 공통 스키마 (값은 모두 문자열로 저장)
+SCHEMA_COLUMNS = ["종목명", "대분류", "중분류", "소분류", "연관기업", "종목코드"]
+PART_FILE = "part-0.parquet"
+
+
+def write_excel_atomic(df, path):
+    """✅ 엑셀 파일을 임시 파일에 쓴 뒤 교체 (여러 작업자가 같은 종목을 써도 반쯤 쓴 파일이 남지 않음)"""
+    # ✅ 숨김 파일(.으로 시작)이라 *.xlsx glob에 잡히지 않음, 확장자는 엑셀 엔진 확인용
+    tmp_path = os.path.join(os.path.dirname(path) or ".", f".{uuid.uuid4().hex}.tmp.xlsx")
+    df.to_excel(tmp_path, index=False, engine="openpyxl")
+    os.replace(tmp_path, path)
+
+
+class OutputStore:
+    """✅ 단계·종목별로 나눈 Parquet 데이터셋
+
+    경로: root/stage=<단계>/ticker=<종목코드>/part-0.parquet
+    종목 단위로 통째로 교체(임시 파일 → os.replace)하므로 중간에 중단돼도 반쯤 쓴 파일이 남지 않음
+    """
+
+    def __init__(self, root):
+        if pa is None:
+            raise ImportError("Parquet 저장소를 쓰려면 pyarrow가 필요합니다 (pip install pyarrow)")
+        self.root = root
+        self.schema = pa.schema([(col, pa.string()) for col in SCHEMA_COLUMNS])
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, stage, ticker):
+        return os.path.join(self.root, f"stage={stage}", f"ticker={ticker}")
+
+    def _to_table(self, df, ticker):
+        df = df.copy()
+        df["종목코드"] = str(ticker)
+        columns = {}
+        for col in SCHEMA_COLUMNS:
+            values = df[col] if col in df.columns else pd.Series([None] * len(df))
+            columns[col] = [None if pd.isna(v) else str(v) for v in values]
+        return pa.table(columns, schema=self.schema)
+
+    def write(self, stage, ticker, df):
+        """한 종목의 결과를 통째로 저장 (기존 파티션 교체)"""
+        partition = self._partition_dir(stage, ticker)
+        os.makedirs(partition, exist_ok=True)
+        tmp_path = os.path.join(partition, f".{uuid.uuid4().hex}.tmp")
+        pq.write_table(self._to_table(df, ticker), tmp_path)
+        os.replace(tmp_path, os.path.join(partition, PART_FILE))
+
+    def exists(self, stage, ticker):
+        return os.path.exists(os.path.join(self._partition_dir(stage, ticker), PART_FILE))
+
+    def read(self, stage, ticker):
+        """한 종목 결과 (없으면 None)"""
+        if not self.exists(stage, ticker):
+            return None
+        return pq.read_table(os.path.join(self._partition_dir(stage, ticker), PART_FILE)).to_pandas()
+
+    def tickers(self, stage):
+        pattern = os.path.join(self.root, f"stage={stage}", "ticker=*", PART_FILE)
+        return sorted(os.path.basename(os.path.dirname(path))[len("ticker="):] for path in glob.glob(pattern))
+
+    def scan(self, stage, columns=None):
+        """✅ 한 단계 전체를 열 단위로 한 번에 읽기"""
+        paths = glob.glob(os.path.join(self.root, f"stage={stage}", "ticker=*", PART_FILE))
+        if not paths:
+            return pd.DataFrame(columns=columns or SCHEMA_COLUMNS)
+        dataset = ds.dataset(sorted(paths), schema=self.schema, format="parquet")
+        return dataset.to_table(columns=columns or SCHEMA_COLUMNS).to_pandas()
+
+    def export_excel(self, stage, path):
+        """✅ (선택) 한 단계 전체를 엑셀 파일 하나로 내보내기"""
+        df = self.scan(stage)
+        df.to_excel(path, index=False)
+        return df
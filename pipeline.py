@@ -0,0 +1,408 @@
+import argparse
+import json
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime as dt
+
+import openai
+import OpenDartReader
+import pandas as pd
+
+import dart_deal
+import dart_report
+import finalmerge
+import main_gpt
+import smartmerge
+from dart_list import group_by_stock_code, list_disclosures_bulk
+from metrics import add_arguments as add_metrics_arguments, start as start_metrics
+from doc_cache import DocCache, MappingCache
+from output_store import OutputStore
+from report_store import ReportStore
+from run_state import RunState
+
+# ▶️ 전체 흐름을 한 번에 실행하는 스트리밍 파이프라인
+#   report(사업보고서 JSON) → gpt(GPT 추출) ┐
+#   deal(공급계약 공시)  ────────────────────┴→ merge(종목별 병합) → (전체 완료 후) finalmerge
+# 종목 하나가 앞 단계를 끝내면 바로 다음 단계 큐로 넘어감 (전체 종목이 끝나길 기다리지 않음)
+# 사용: python pipeline.py --config pipeline_config.json [--run-id 2025-01-01] [--limit 100]
+
+QUEUE_SIZE = 64
+
+# ▶️ 기본 설정 (--config로 JSON 파일을 넘기면 같은 키를 덮어씀, 상대 경로는 base_dir 기준)
+DEFAULT_CONFIG = {
+    "base_dir": "폴더 경로 설정",
+    "universe": "data/02.mktcap_3000.xlsx",
+    "work_dir": "pipeline",
+    "dart_api_key": "DART API KEY",
+    "openai_api_key": "OPENAI API KEY",
+    "output_backend": "excel",  # "excel" / "parquet" (output_store.py)
+    "report_format": "json",  # "json" / "shard" (report_store.py)
+    "paths": {
+        "cache": "dart_cache",
+        "report": "mktcap_3000_사업보고서_json",
+        "report_store": "mktcap_3000_사업보고서_shard",
+        "deal": "deal",
+        "gpt": "gpt",
+        "merged": "merged",
+        "store": "output_store",
+    },
+    # ▶️ 단계별 동시 처리 수 (cpu = 파싱·병합용 프로세스 수)
+    "workers": {"report": 8, "deal": 8, "gpt": 4, "merge": 2, "cpu": os.cpu_count() or 1},
+    "queue_size": QUEUE_SIZE,  # 단계 사이 큐 크기 (가득 차면 앞 단계가 대기)
+    "bulk_listing": True,
+    "final_merge": True,
+}
+
+
+def load_config(path=None):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            user_config = json.load(f)
+        for key, value in user_config.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    base_dir = os.path.abspath(config["base_dir"])
+    config["paths"] = {name: os.path.join(base_dir, path) for name, path in config["paths"].items()}
+    config["universe"] = os.path.join(base_dir, config["universe"])
+    config["work_dir"] = os.path.join(base_dir, config["work_dir"])
+    return config
+
+
+def apply_config(config):
+    """▶️ 각 스크립트의 경로/저장 방식 설정을 덮어씀 (파싱·병합 프로세스에서도 같은 설정으로 호출)"""
+    paths = config["paths"]
+    parquet = config["output_backend"] == "parquet"
+    store = OutputStore(paths["store"]) if parquet else None
+    for path in (paths["report"], paths["deal"], paths["gpt"], paths["merged"]):
+        os.makedirs(path, exist_ok=True)
+
+    doc_cache = DocCache(paths["cache"])
+    report_store = ReportStore(paths["report_store"]) if config["report_format"] == "shard" else None
+
+    dart_report.new_data_dir = paths["report"]
+    dart_report.doc_cache = doc_cache
+    dart_report.REPORT_FORMAT = config["report_format"]
+    dart_report.report_store = report_store
+
+    dart_deal.new_data_dir = paths["deal"]
+    dart_deal.OUTPUT_BACKEND = config["output_backend"]
+    dart_deal.output_store = store
+    dart_deal.doc_cache = doc_cache
+    dart_deal.dcm_no_cache = MappingCache(os.path.join(paths["cache"], "dcm_no.json"))
+    dart_deal.state_path = os.path.join(paths["deal"], "run_state_deal.json")
+
+    main_gpt.json_folder = paths["report"]
+    main_gpt.output_folder = paths["gpt"]
+    main_gpt.OUTPUT_BACKEND = config["output_backend"]
+    main_gpt.output_store = store
+    main_gpt.INPUT_FORMAT = config["report_format"]
+    main_gpt.state_path = os.path.join(paths["gpt"], "run_state_gpt.json")
+    main_gpt.llm_cache_path = os.path.join(paths["gpt"], "llm_cache.sqlite")
+    main_gpt.stats_path = os.path.join(paths["gpt"], "gpt_run_stats.jsonl")
+
+    smartmerge.folder_a = paths["deal"]
+    smartmerge.folder_b = paths["gpt"]
+    smartmerge.output_folder = paths["merged"]
+    smartmerge.OUTPUT_BACKEND = config["output_backend"]
+    smartmerge.output_store = store
+
+    finalmerge.folder_path = paths["merged"]
+    finalmerge.OUTPUT_BACKEND = config["output_backend"]
+    finalmerge.store_root = paths["store"]
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, after=(), queue_size=QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.after = list(after)
+        self.downstream = []
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.arrived = Counter()  # 종목 → 도착한 앞 단계 수 (모두 도착하면 실행)
+        self.closed_upstream = 0
+        self.running = workers
+        self.counts = Counter()
+        self.seconds = 0.0
+
+
+class Pipeline:
+    """▶️ 종목 단위 스트리밍 DAG 실행기
+
+    - 단계마다 크기 제한 큐 + 작업 스레드 (큐가 가득 차면 앞 단계가 대기)
+    - 앞 단계가 여러 개면 모든 앞 단계가 끝난 종목만 실행 (예: deal + gpt → merge)
+    - 단계·종목별 완료 기록(체크포인트)을 남기고, 같은 run_id로 다시 실행하면 완료된 단계는 건너뜀
+    - 실패한 종목은 다음 단계로 넘기지 않음 (다시 실행하면 실패한 단계부터 재시도)
+    """
+
+    def __init__(self, checkpoint_path):
+        self.state = RunState(checkpoint_path)
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started = {}
+        self.latencies = []
+
+    def add(self, name, func, workers=1, after=(), queue_size=QUEUE_SIZE):
+        stage = Stage(name, func, workers, after, queue_size)
+        for upstream in stage.after:
+            self.stages[upstream].downstream.append(stage)
+        self.stages[name] = stage
+        return stage
+
+    def _emit(self, stage, ticker):
+        if not stage.downstream:
+            with self.lock:
+                self.latencies.append(time.time() - self.started.get(ticker, time.time()))
+            return
+        for down in stage.downstream:
+            with self.lock:
+                down.arrived[ticker] += 1
+                ready = down.arrived[ticker] == len(down.after)
+                if ready:
+                    del down.arrived[ticker]
+            if ready:
+                down.queue.put(ticker)  # ✅ 다음 단계 큐가 가득 차면 대기 (backpressure)
+
+    def _close(self, stage):
+        """단계의 작업 스레드가 모두 끝나면, 앞 단계가 모두 끝난 다음 단계에 종료 신호 전달"""
+        for down in stage.downstream:
+            with self.lock:
+                down.closed_upstream += 1
+                last = down.closed_upstream == len(down.after)
+            if last:
+                for _ in range(down.workers):
+                    down.queue.put(None)
+
+    def _worker(self, stage):
+        while True:
+            ticker = stage.queue.get()
+            if ticker is None:
+                break
+            with self.lock:
+                self.started.setdefault(ticker, time.time())
+
+            key = f"{stage.name}/{ticker}"
+            if self.state.get(key) is not None:
+                with self.lock:
+                    stage.counts["skipped"] += 1
+                self._emit(stage, ticker)
+                continue
+
+            start = time.perf_counter()
+            try:
+                ok = stage.func(ticker) is not False
+            except Exception as e:
+                print(f"❌ [{stage.name}] {ticker} 처리 중 오류 발생: {e}")
+                ok = False
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stage.seconds += elapsed
+                stage.counts["done" if ok else "failed"] += 1
+            if not ok:
+                continue
+            self.state.set(key, {"finished": dt.now().strftime("%Y-%m-%d %H:%M:%S"), "seconds": round(elapsed, 2)})
+            self._emit(stage, ticker)
+
+        with self.lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if last:
+            self._close(stage)
+
+    def _feed(self, stage, tickers):
+        for ticker in tickers:
+            stage.queue.put(ticker)
+        for _ in range(stage.workers):
+            stage.queue.put(None)
+
+    def run(self, tickers):
+        threads = []
+        for stage in self.stages.values():
+            for i in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(stage,), name=f"{stage.name}-{i}", daemon=True))
+            if not stage.after:
+                threads.append(threading.Thread(target=self._feed, args=(stage, tickers), daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.state.save()
+
+    def summary(self):
+        lines = []
+        for stage in self.stages.values():
+            done = stage.counts["done"]
+            average = stage.seconds / done if done else 0.0
+            lines.append(f"  {stage.name:<8} 완료 {done:>5}  건너뜀 {stage.counts['skipped']:>5}  "
+                         f"실패 {stage.counts['failed']:>4}  평균 {average:.1f}초 (동시 {stage.workers})")
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+            lines.append(f"  종목별 전체 소요: 중앙값 {statistics.median(ordered) / 60:.1f}분, 90% {p90 / 60:.1f}분")
+        return "\n".join(lines)
+
+
+class ValueChainStages:
+    """▶️ 각 스크립트의 종목 단위 함수를 파이프라인 단계로 연결"""
+
+    def __init__(self, config, cpu_pool):
+        self.config = config
+        self.cpu_pool = cpu_pool
+        self.enddate = dt.today().strftime('%Y-%m-%d')
+        self.report_lists = None
+        self.deal_lists = None
+        self.deal_state = RunState(dart_deal.state_path) if dart_deal.INCREMENTAL else None
+        self.gpt_state = RunState(main_gpt.state_path) if main_gpt.INCREMENTAL else None
+        self.report_store = ReportStore(config["paths"]["report_store"]) if config["report_format"] == "shard" else None
+        corp_index = main_gpt.load_corp_index()
+        self.stock_to_name = corp_index.stock_to_name()
+        self.matcher = None
+        if main_gpt.USE_DICT_PREEXTRACT:
+            self.matcher = main_gpt.CounterpartyMatcher(self.stock_to_name, corp_index.listed_eng_aliases())
+
+    def prefetch_listings(self, codes):
+        """▶️ (bulk_listing) 사업보고서/공급계약 공시 목록을 시장 전체로 한 번에 조회"""
+        startdate = dart_report.get_start_date(self.enddate)
+        listing = list_disclosures_bulk(dart_report.dart.api_key, startdate, self.enddate, kind='A')
+        self.report_lists = group_by_stock_code(listing, codes)
+
+        deal_start, deal_end = dart_deal.get_date_range()
+        if self.deal_state is not None and self.deal_state.last_sync:
+            deal_start = self.deal_state.last_sync
+        listing = list_disclosures_bulk(dart_deal.dart.api_key, deal_start, deal_end, kind='I')
+        self.deal_lists = group_by_stock_code(listing, codes, pattern="공급계약체결")
+        print(f"✅ 일괄 조회 완료: 사업보고서 대상 {len(self.report_lists)}개, 공급계약 대상 {len(self.deal_lists)}개")
+
+    def report(self, ticker):
+        """사업보고서 조회(스레드) + 파싱·저장(프로세스), 섹션이 없으면 대체 경로로 다시 조회"""
+        result_list = None
+        if self.report_lists is not None:
+            result_list = self.report_lists.get(ticker, pd.DataFrame(columns=["report_nm", "rcept_no"]))
+        for fallback in (False, True):
+            result_temp, kind, raw = dart_report.fetch_raw(ticker, self.enddate, result_list, fallback)
+            rcept_no = self.cpu_pool.submit(dart_report.parse_and_save, ticker, result_temp, kind, raw).result()
+            if rcept_no is not None:
+                return rcept_no
+        return False
+
+    def deal(self, ticker):
+        """공급계약 공시 추출 (process_company가 실패를 False로 알리면 체크포인트에 남기지 않고 재실행 시 재시도)"""
+        if self.deal_lists is None:
+            return dart_deal.process_company(ticker, state=self.deal_state)
+        group = self.deal_lists.get(ticker)
+        if group is None:
+            return True  # ✅ 조회 기간에 새 공시 없음
+        return dart_deal.process_company(ticker, group["corp_name"].iloc[0], group, self.deal_state)
+
+    def gpt(self, ticker):
+        if self.report_store is not None:
+            self.report_store.refresh()  # ✅ 파싱 프로세스가 방금 쓴 레코드까지 읽기
+            sources = [ticker] if self.report_store.exists(ticker) else []
+        else:
+            sources = [os.path.join(main_gpt.json_folder, f"{ticker}.json")]
+        fail_list = []
+        tasks = main_gpt.load_tasks(sources, self.stock_to_name, self.gpt_state, fail_list, self.report_store,
+                                    verbose=False)
+        if self.matcher is not None:
+            tasks = main_gpt.preextract_tasks(tasks, self.matcher, fail_list, self.gpt_state)
+        for task in tasks:
+            extracted_data, response_summary, failed_chunks = main_gpt.analyze_company_with_gpt(
+                task["company_name"], task["full_text"], task.get("hints", "")
+            )
+            main_gpt.save_company_result(task, extracted_data, response_summary, fail_list, self.gpt_state,
+                                         failed_chunks=failed_chunks)
+        for ticker_code, company_name, reason, _ in fail_list:
+            print(f"⚠️ [gpt] {ticker_code} ({company_name}) 실패: {reason}")
+        return not fail_list
+
+    def merge(self, ticker):
+        """deal/gpt 결과가 있는 쪽만 모아 병합 (dedup은 프로세스에서 실행)"""
+        if smartmerge.output_store is not None:
+            filename = ticker
+            path_a = ticker if smartmerge.output_store.exists(smartmerge.STAGE_A, ticker) else None
+            path_b = ticker if smartmerge.output_store.exists(smartmerge.STAGE_B, ticker) else None
+        else:
+            filename = f"{ticker}.xlsx"
+            path_a = os.path.join(smartmerge.folder_a, filename)
+            path_b = os.path.join(smartmerge.folder_b, filename)
+            path_a = path_a if os.path.exists(path_a) else None
+            path_b = path_b if os.path.exists(path_b) else None
+        if path_a is None and path_b is None:
+            return True  # ✅ 두 단계 모두 결과 없음 (공시·관계 없음)
+        for line in self.cpu_pool.submit(smartmerge.merge_file, filename, path_a, path_b).result():
+            print(line)
+        return True
+
+    def save(self, deal_failed=0):
+        """상태 저장, deal 단계가 모든 종목에서 성공했을 때만 마지막 동기화 날짜를 옮김"""
+        for state in (self.deal_state, self.gpt_state):
+            if state is not None:
+                state.save()
+        if self.deal_state is not None and self.deal_lists is not None:
+            if deal_failed:
+                print(f"⚠️ [deal] {deal_failed}개 종목 실패: 마지막 동기화 날짜 유지 ({self.deal_state.last_sync})")
+                return
+            self.deal_state.last_sync = self.enddate
+            self.deal_state.save()
+
+
+def run(config, run_id, limit=None):
+    apply_config(config)
+    dart = OpenDartReader(config["dart_api_key"])
+    dart_report.dart = dart
+    dart_deal.dart = dart
+    openai.api_key = config["openai_api_key"]
+    if main_gpt.USE_LLM_CACHE:
+        main_gpt.llm_cache = main_gpt.LLMCache(main_gpt.llm_cache_path,
+                                               ttl_seconds=main_gpt.LLM_CACHE_TTL_DAYS * 24 * 3600)
+
+    list_df = pd.read_excel(config["universe"], sheet_name='list', index_col=0)
+    codes = [i[1:] for i in list_df.index][:limit]
+
+    os.makedirs(config["work_dir"], exist_ok=True)
+    workers = config["workers"]
+    queue_size = config["queue_size"]
+    with ProcessPoolExecutor(max_workers=workers["cpu"], initializer=apply_config, initargs=(config,)) as cpu_pool:
+        stages = ValueChainStages(config, cpu_pool)
+        if config["bulk_listing"]:
+            stages.prefetch_listings(codes)
+
+        pipeline = Pipeline(os.path.join(config["work_dir"], f"checkpoint_{run_id}.json"))
+        pipeline.add("report", stages.report, workers["report"], queue_size=queue_size)
+        pipeline.add("deal", stages.deal, workers["deal"], queue_size=queue_size)
+        pipeline.add("gpt", stages.gpt, workers["gpt"], after=["report"], queue_size=queue_size)
+        pipeline.add("merge", stages.merge, workers["merge"], after=["deal", "gpt"], queue_size=queue_size)
+
+        start = time.time()
+        pipeline.run(codes)
+        stages.save(deal_failed=pipeline.stages["deal"].counts["failed"])
+
+    print(f"🏁 파이프라인 완료 ({(time.time() - start) / 60:.1f}분, 종목 {len(codes)}개)")
+    print(pipeline.summary())
+    if main_gpt.gpt_stats.requests or main_gpt.gpt_stats.cached:
+        print(f"📊 {main_gpt.gpt_stats.summary()}")
+        main_gpt.gpt_stats.save(main_gpt.stats_path)
+    if main_gpt.llm_cache is not None:
+        main_gpt.llm_cache.close()
+    if config["final_merge"]:
+        finalmerge.merge_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DART → GPT → 병합 스트리밍 파이프라인")
+    parser.add_argument("--config", help="설정 JSON 파일 (DEFAULT_CONFIG와 같은 키)")
+    parser.add_argument("--run-id", default=dt.today().strftime('%Y-%m-%d'),
+                        help="체크포인트 이름 (같은 값으로 다시 실행하면 완료된 단계는 건너뜀)")
+    parser.add_argument("--limit", type=int, help="앞에서부터 N개 종목만 실행")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    start_metrics("pipeline", args)
+    run(load_config(args.config), args.run_id, args.limit)
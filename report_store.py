@@ -0,0 +1,191 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+# 📌 샤드 파일 하나의 최대 크기 (넘으면 새 샤드로)
+SHARD_MAX_BYTES = 256 * 1024 ** 2
+COMPRESS_LEVEL = 6
+SHARD_SUFFIX = ".bin"
+INDEX_SUFFIX = ".idx"
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def pack_table(rows):
+    """📌 표(행 dict 목록) → {"columns": [...], "rows": [[...], ...]} (행마다 반복되는 열 이름 제거)
+
+    행마다 열 구성이 다르면 그대로 {"records": rows}
+    """
+    columns = list(rows[0].keys()) if rows else []
+    if all(list(row.keys()) == columns for row in rows):
+        return {"columns": columns, "rows": [list(row.values()) for row in rows]}
+    return {"records": rows}
+
+
+def unpack_table(table):
+    if "records" in table:
+        return table["records"]
+    return [dict(zip(table["columns"], row)) for row in table["rows"]]
+
+
+class ReportStore:
+    """📌 사업 보고서 추출 결과 샤드 저장소 (기업별 {code}.json 대체)
+
+    - shard-*.bin : 기업별 레코드를 zlib 프레임 2개(섹션 본문 / 표)로 이어 붙인 파일
+    - shard-*.idx : 한 줄에 레코드 하나 (종목코드, seq, 내용 해시, 보고서명, 섹션 제목, 프레임 위치)
+    - 같은 종목이 여러 번 저장되면 seq가 가장 큰 레코드가 최신 (compact()로 옛 레코드 정리)
+    - 프로세스마다 자기 샤드에만 이어 쓰므로 여러 파싱 프로세스가 동시에 저장해도 됨
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+        self._index = None
+        self._files = {}
+        os.makedirs(root, exist_ok=True)
+
+    # ✅ 쓰기
+    def _open_writer(self):
+        name = f"shard-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.root, name)
+        self._writer = (name, open(path + SHARD_SUFFIX, "ab"), open(path + INDEX_SUFFIX, "ab"))
+        self._writer_pid = os.getpid()
+
+    def _append(self, entry, texts_frame, tables_frame):
+        with self.lock:
+            # ✅ fork로 만든 작업 프로세스는 부모의 샤드를 이어 쓰지 않고 새 샤드를 엶
+            if self._writer is None or self._writer_pid != os.getpid() or self._writer[1].tell() >= SHARD_MAX_BYTES:
+                self._open_writer()
+            name, data_file, index_file = self._writer
+            offset = data_file.tell()
+            data_file.write(texts_frame)
+            data_file.write(tables_frame)
+            data_file.flush()
+            # ✅ 본문을 다 쓴 뒤 색인 줄을 씀 (중간에 중단되면 색인에 없는 레코드는 무시됨)
+            entry.update({
+                "shard": name,
+                "texts": [offset, len(texts_frame)],
+                "tables": [offset + len(texts_frame), len(tables_frame)],
+            })
+            index_file.write(_dumps(entry) + b"\n")
+            index_file.flush()
+            if self._index is not None:
+                self._index[entry["code"]] = entry
+
+    def write(self, code, result):
+        """dart_report 결과 dict (report_nm, rcept_no, sections) 저장"""
+        sections = result.get("sections", [])
+        texts = _dumps([sec["text"] for sec in sections])
+        tables = _dumps([[pack_table(rows) for rows in sec["tables"]] for sec in sections])
+        meta = {"report_nm": str(result.get("report_nm")), "rcept_no": str(result.get("rcept_no")),
+                "titles": [sec["title"] for sec in sections]}
+        content_hash = hashlib.sha256(_dumps(meta) + texts + tables).hexdigest()
+        entry = {"code": str(code), "seq": time.time_ns(), "hash": content_hash, **meta}
+        self._append(entry, zlib.compress(texts, COMPRESS_LEVEL), zlib.compress(tables, COMPRESS_LEVEL))
+
+    # ✅ 읽기
+    def _load_index(self):
+        index = {}
+        for path in glob.glob(os.path.join(self.root, f"shard-*{INDEX_SUFFIX}")):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # ✅ 쓰는 도중 중단된 마지막 줄
+                    current = index.get(entry["code"])
+                    if current is None or entry["seq"] > current["seq"]:
+                        index[entry["code"]] = entry
+        return index
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def refresh(self):
+        """다른 프로세스가 쓴 레코드까지 다시 읽기"""
+        self._index = None
+
+    def codes(self):
+        return sorted(self.index)
+
+    def exists(self, code):
+        return str(code) in self.index
+
+    def entry(self, code):
+        """색인 정보 (압축을 풀지 않음, 없으면 None)"""
+        return self.index.get(str(code))
+
+    def content_hash(self, code):
+        return self.index[str(code)]["hash"]
+
+    def _read_frame(self, entry, key):
+        offset, length = entry[key]
+        with self.lock:
+            f = self._files.get(entry["shard"])
+            if f is None:
+                f = self._files[entry["shard"]] = open(os.path.join(self.root, entry["shard"] + SHARD_SUFFIX), "rb")
+            f.seek(offset)
+            data = f.read(length)
+        return json.loads(zlib.decompress(data))
+
+    def texts(self, code):
+        """섹션 본문 목록만 읽기 (표 프레임은 풀지 않음)"""
+        return self._read_frame(self.index[str(code)], "texts")
+
+    def sections(self, code):
+        """dart_report의 sections 구조 그대로 복원 (title/text/tables)"""
+        entry = self.index[str(code)]
+        texts = self._read_frame(entry, "texts")
+        tables = self._read_frame(entry, "tables")
+        return [
+            {"title": title, "text": text, "tables": [unpack_table(t) for t in section_tables]}
+            for title, text, section_tables in zip(entry["titles"], texts, tables)
+        ]
+
+    def load(self, code):
+        """{code}.json과 같은 dict"""
+        entry = self.index[str(code)]
+        return {"report_nm": entry["report_nm"], "rcept_no": entry["rcept_no"], "sections": self.sections(code)}
+
+    def close(self):
+        with self.lock:
+            if self._writer is not None and self._writer_pid == os.getpid():
+                self._writer[1].close()
+                self._writer[2].close()
+            self._writer = None
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def compact(self):
+        """📌 종목별 최신 레코드만 새 샤드로 옮기고 옛 샤드 삭제 (쓰는 프로세스가 없을 때 실행)"""
+        old_paths = glob.glob(os.path.join(self.root, f"shard-*{SHARD_SUFFIX}"))
+        old_paths += glob.glob(os.path.join(self.root, f"shard-*{INDEX_SUFFIX}"))
+        latest = self._load_index()
+        self.close()
+        self._index = {}
+        for code in sorted(latest):
+            entry = latest[code]
+            frames = []
+            with open(os.path.join(self.root, entry["shard"] + SHARD_SUFFIX), "rb") as f:
+                for key in ("texts", "tables"):
+                    f.seek(entry[key][0])
+                    frames.append(f.read(entry[key][1]))
+            self._append({k: v for k, v in entry.items() if k not in ("shard", "texts", "tables")}, *frames)
+        self.close()
+        for path in old_paths:
+            os.remove(path)
+        self._index = None
+        return len(latest)
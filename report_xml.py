@@ -0,0 +1,158 @@
+import re
+from lxml import etree
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+# 📌 추출 대상 섹션 제목 (dart_report.proc_xml과 동일)
+VALID_TITLES = [
+    "3. 원재료 및 생산설비",
+    "3. (제조서비스업)원재료 및 생산설비",
+    "3. (금융업)원재료 및 생산설비",
+    "4. 매출 및 수주상황",
+    "4. (제조서비스업)매출 및 수주상황",
+    "4. (금융업)매출 및 수주상황"
+]
+
+# ✅ pd.read_html과 같은 셀 공백 처리
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+_parser = etree.HTMLParser(recover=True, huge_tree=True, encoding="utf-8")
+
+
+def _text(element):
+    """📌 하위 텍스트 전체 (주석 제외, 꼬리 텍스트 제외)"""
+    return etree.tostring(element, method="text", encoding="unicode", with_tail=False)
+
+
+def _cells(row):
+    return row.xpath("./td|./th")
+
+
+def _expand_rows(rows, remainder=None, overflow=True):
+    """📌 colspan/rowspan을 펼쳐 행별 텍스트 목록으로 변환 (pd.read_html과 같은 규칙)"""
+    all_texts = []
+    remainder = remainder if remainder is not None else []
+
+    for tr in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in _cells(tr):
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+                index += 1
+
+            text = _RE_WHITESPACE.sub(" ", _text(td).strip())
+            rowspan = int(td.get("rowspan") or 1)
+            colspan = int(td.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    if not overflow:
+        while remainder:
+            next_remainder = []
+            texts = []
+            for prev_i, prev_text, prev_rowspan in remainder:
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+            all_texts.append(texts)
+            remainder = next_remainder
+
+    return all_texts, remainder
+
+
+def parse_table(table):
+    """📌 <table> 요소를 바로 행 dict 목록으로 변환 (표를 문자열로 바꿔 다시 파싱하지 않음)
+
+    헤더 판별, 병합 셀 처리, 숫자 변환은 pd.read_html과 같고, 읽을 수 없는 표는 None
+    """
+    if not any(t.strip("\n") for t in table.itertext()):
+        return None  # ✅ read_html: 텍스트가 없는 표는 "No tables found"
+
+    for br in table.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+
+    header_rows = []
+    for thead in table.xpath(".//thead"):
+        header_rows.extend(thead.xpath("./tr"))
+        if _cells(thead):
+            header_rows.append(thead)
+    body_rows = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    footer_rows = table.xpath(".//tfoot//tr")
+
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in _cells(body_rows[0])):
+            header_rows.append(body_rows.pop(0))
+
+    head, rem = _expand_rows(header_rows)
+    body, rem = _expand_rows(body_rows, remainder=rem, overflow=len(footer_rows) > 0)
+    foot, _ = _expand_rows(footer_rows, remainder=rem, overflow=False)
+
+    header = None
+    if head:
+        body = head + body
+        header = 0 if len(head) == 1 else [i for i, row in enumerate(head) if any(text for text in row)]
+    body += foot
+    if not body:
+        return None
+
+    width = max(len(row) for row in body)
+    body = [row + [""] * (width - len(row)) for row in body]
+    try:
+        with TextParser(body, header=header, thousands=",") as parser:
+            df = parser.read()
+    except EmptyDataError:
+        return None
+    return [{str(k): v for k, v in row.items()} for row in df.to_dict(orient="records")]
+
+
+def proc_xml_fast(xml_doc):
+    """📌 proc_xml과 같은 결과를 lxml로 추출
+
+    section-2의 제목(title) 요소만 보고 대상 섹션을 고른 뒤, 대상 섹션만 본문 텍스트와 표를 추출
+    section-2가 하나도 없으면 ValueError (호출하는 쪽에서 기존 proc_xml로 대체)
+    """
+    data = xml_doc.encode("utf-8") if isinstance(xml_doc, str) else xml_doc
+    root = etree.fromstring(data, _parser)
+    sections = list(root.iter("section-2")) if root is not None else []
+    if not sections:
+        raise ValueError("section-2 없음")
+
+    extracted_sections = []
+    for section in sections:
+        title_element = section.find("title")
+        title_text = _text(title_element) if title_element is not None else ""
+        section_title = next((title for title in VALID_TITLES if title in title_text), None)
+        if section_title is None:
+            continue
+
+        # ✅ 본문 텍스트는 표의 <br> 처리 전에 추출 (proc_xml의 get_text()와 동일하게)
+        section_text = _text(section)
+        tables = []
+        for table in section.iter("table"):
+            rows = parse_table(table)
+            if rows is not None:
+                tables.append(rows)
+
+        extracted_sections.append({
+            "title": section_title,
+            "text": section_text.strip(),
+            "tables": tables
+        })
+
+    return extracted_sections
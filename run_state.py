@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+
+SAVE_EVERY = 20  # ✅ 변경 N건마다 자동 저장 (중간에 멈춰도 진행분 보존)
+
+
+class RunState:
+    """📌 증분 실행용 상태 파일 (마지막 동기화 날짜 + 종목별 마지막 처리 값)
+
+    {"last_sync": "YYYY-MM-DD", "tickers": {"005930": ...}}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.changed = set()  # ✅ 이 프로세스가 바꾼 종목 (저장 시 다른 프로세스가 저장한 종목과 합침)
+        self.data = {"last_sync": None, "tickers": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+
+    @property
+    def last_sync(self):
+        return self.data["last_sync"]
+
+    @last_sync.setter
+    def last_sync(self, value):
+        with self.lock:
+            self.data["last_sync"] = value
+            self.dirty += 1
+
+    def get(self, code, default=None):
+        with self.lock:
+            return self.data["tickers"].get(code, default)
+
+    def set(self, code, value):
+        with self.lock:
+            self.data["tickers"][code] = value
+            self.changed.add(code)
+            self.dirty += 1
+            if self.dirty >= SAVE_EVERY:
+                self._save_locked()
+
+    def _save_locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            # ✅ 같은 상태 파일을 쓰는 다른 작업자의 기록을 덮어쓰지 않도록 파일 내용에 내 변경분만 반영
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    on_disk = json.load(f).get("tickers", {})
+                mine = {code: self.data["tickers"][code] for code in self.changed}
+                self.data["tickers"] = {**self.data["tickers"], **on_disk, **mine}
+            except (OSError, ValueError):
+                pass
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = 0
+
+    def save(self):
+        with self.lock:
+            self._save_locked()
@@ -1,7 +1,10 @@
 import pandas as pd
 import os
 import glob
-from difflib import SequenceMatcher
+from concurrent.futures import ProcessPoolExecutor
+from dedup import dedup_rows
+from output_store import OutputStore, write_excel_atomic
+from metrics import metrics, init_from_cli
 
 # 📁 폴더 경로 설정
 folder_a = r"합칠 파일이 있는 경로 입력"
@@ -9,50 +12,51 @@ folder_b = r"합칠 파일이 있는 또 다른 폴더 경로 입력"
 output_folder = r"결과물 경로 입력"
 os.makedirs(output_folder, exist_ok=True)
 
-# 📐 유사도 판단 함수
-def is_similar(a, b, threshold=0.85):
-    return SequenceMatcher(None, str(a), str(b)).ratio() >= threshold
-
-# 📄 모든 파일 수집
-files_a = {os.path.basename(f): f for f in glob.glob(os.path.join(folder_a, "*.xlsx"))}
-files_b = {os.path.basename(f): f for f in glob.glob(os.path.join(folder_b, "*.xlsx"))}
-all_keys = set(files_a.keys()).union(set(files_b.keys()))
-
-print(f"📊 총 파일 수: A폴더({len(files_a)}개), B폴더({len(files_b)}개), 병합 대상({len(all_keys)}개)\n")
-
-# 🔁 병합 처리
-for filename in sorted(all_keys):
-    path_a = files_a.get(filename)
-    path_b = files_b.get(filename)
-
+# 🗂️ 저장 방식: "excel" = 폴더 A/B의 .xlsx / "parquet" = 데이터셋의 단계 A/B를 읽어 병합 단계로 저장
+OUTPUT_BACKEND = "excel"
+store_root = r"결과 데이터셋 경로 입력"
+STAGE_A = "deal"
+STAGE_B = "gpt"
+OUTPUT_STAGE = "merged"
+output_store = OutputStore(store_root) if OUTPUT_BACKEND == "parquet" else None
+
+# ⚙️ 병렬 처리: 파일(종목) 단위 병합을 여러 프로세스에 나눠 실행 (1이면 기존처럼 순차 처리)
+MAX_WORKERS = os.cpu_count() or 1
+CHUNKSIZE = 16  # 작업 묶음 크기 (프로세스 간 전달 횟수 감소)
+
+def load_frame(filename, path, stage, label, log):
+    """📄 한 폴더(단계)의 파일 로드, 비었거나 실패하면 None"""
+    try:
+        df = output_store.read(stage, path) if output_store is not None else pd.read_excel(path)
+        if "종목명" in df.columns and not df.empty:
+            return df
+        log.append(f"⚠️ {filename} - {label} 폴더 파일 비어있거나 '종목명' 없음")
+    except Exception as e:
+        log.append(f"❌ {filename} - {label} 폴더 파일 읽기 실패: {e}")
+    return None
+
+@metrics.timed("merge")
+def merge_file(filename, path_a, path_b):
+    """🔁 한 파일(종목) 병합 후 저장, 출력할 메시지 목록 반환 (작업 프로세스에서 실행)"""
+    log = []
     df_all = []
 
     # A 폴더에서 로드
     if path_a:
-        try:
-            df_a = pd.read_excel(path_a)
-            if "종목명" in df_a.columns and not df_a.empty:
-                df_all.append(df_a)
-            else:
-                print(f"⚠️ {filename} - A 폴더 파일 비어있거나 '종목명' 없음")
-        except Exception as e:
-            print(f"❌ {filename} - A 폴더 파일 읽기 실패: {e}")
+        df_a = load_frame(filename, path_a, STAGE_A, "A", log)
+        if df_a is not None:
+            df_all.append(df_a)
 
     # B 폴더에서 로드
     if path_b:
-        try:
-            df_b = pd.read_excel(path_b)
-            if "종목명" in df_b.columns and not df_b.empty:
-                df_all.append(df_b)
-            else:
-                print(f"⚠️ {filename} - B 폴더 파일 비어있거나 '종목명' 없음")
-        except Exception as e:
-            print(f"❌ {filename} - B 폴더 파일 읽기 실패: {e}")
+        df_b = load_frame(filename, path_b, STAGE_B, "B", log)
+        if df_b is not None:
+            df_all.append(df_b)
 
     # 둘 다 비었으면 패스
     if not df_all:
-        print(f"⏭️ {filename} - 병합할 데이터 없음 (둘 다 비었거나 읽기 실패)")
-        continue
+        log.append(f"⏭️ {filename} - 병합할 데이터 없음 (둘 다 비었거나 읽기 실패)")
+        return log
 
     merged_df = pd.concat(df_all, ignore_index=True)
 
@@ -63,32 +67,44 @@ for filename in sorted(all_keys):
         (merged_df["종목명"].astype(str).str.strip() != "")
     ]
 
-    # ✅ 중복 제거: 중분류 + 유사한 연관기업 기준
-    seen = []
-    cleaned_rows = []
-
-    for _, row in merged_df.iterrows():
-        mid = row.get("중분류")
-        company = row.get("연관기업")
-
-        if pd.isna(mid) or pd.isna(company):
-            continue
-
-        duplicate = False
-        for existing_mid, existing_company in seen:
-            if mid == existing_mid and is_similar(company, existing_company):
-                duplicate = True
-                break
-
-        if not duplicate:
-            seen.append((mid, company))
-            cleaned_rows.append(row)
-
-    result_df = pd.DataFrame(cleaned_rows)
+    # ✅ 중복 제거: 중분류 + 유사한 연관기업 기준 (기업명 정규화 후 n-gram 후보 안에서만 유사도 계산)
+    result_df = dedup_rows(merged_df, block_col="중분류", name_col="연관기업")
 
     # 저장
+    if output_store is not None:
+        output_store.write(OUTPUT_STAGE, filename, result_df)
+        log.append(f"✅ 병합 완료: {filename} → {OUTPUT_STAGE}/{filename}")
+        return log
     output_path = os.path.join(output_folder, filename)
-    result_df.to_excel(output_path, index=False)
-    print(f"✅ 병합 완료: {filename} → {output_path}")
-
-print("\n🎉 병합 전체 완료! 결과 경로:", output_folder)
+    write_excel_atomic(result_df, output_path)
+    log.append(f"✅ 병합 완료: {filename} → {output_path}")
+    return log
+
+if __name__ == "__main__":
+    # 📊 실행 지표 (--metrics-dir, --profile cprofile|sample), 작업 프로세스의 종목별 시간은 트레이스에 기록
+    init_from_cli("merge")
+
+    # 📄 모든 파일 수집 (parquet이면 파일명 대신 종목코드)
+    if output_store is not None:
+        files_a = {ticker: ticker for ticker in output_store.tickers(STAGE_A)}
+        files_b = {ticker: ticker for ticker in output_store.tickers(STAGE_B)}
+    else:
+        files_a = {os.path.basename(f): f for f in glob.glob(os.path.join(folder_a, "*.xlsx"))}
+        files_b = {os.path.basename(f): f for f in glob.glob(os.path.join(folder_b, "*.xlsx"))}
+    all_keys = set(files_a.keys()).union(set(files_b.keys()))
+
+    print(f"📊 총 파일 수: A폴더({len(files_a)}개), B폴더({len(files_b)}개), 병합 대상({len(all_keys)}개)\n")
+
+    # 🔁 병합 처리 (결과 메시지는 파일명 순서대로 출력)
+    filenames = sorted(all_keys)
+    paths_a = [files_a.get(filename) for filename in filenames]
+    paths_b = [files_b.get(filename) for filename in filenames]
+    if MAX_WORKERS <= 1:
+        for log in map(merge_file, filenames, paths_a, paths_b):
+            print("\n".join(log))
+    else:
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for log in executor.map(merge_file, filenames, paths_a, paths_b, chunksize=CHUNKSIZE):
+                print("\n".join(log))
+
+    print("\n🎉 병합 전체 완료! 결과 경로:", output_folder)
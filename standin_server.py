@@ -0,0 +1,337 @@
+import argparse
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ▶️ 로컬 대체 서버: 네트워크/비용 없이 수집·분석 단계를 시험하고 벤치마크(benchmarks/run_all.py)에 사용
+#   - OpenAI Batch API (files, batches), chat/completions
+#   - dart.fss.or.kr 웹 페이지 (dsaf001/main.do, report/viewer.do)
+#   - OpenDART API (list.json, document.xml, company.json, corpCode.xml)
+# 페이지 내용은 benchmarks/fixtures.py (기록된 실제 페이지 또는 합성 페이지)
+# 사용 예: python standin_server.py --port 8765 --batch-delay 3 --fail-rate 0.2 --latency 0.05 --rate-limit-rate 0.1
+#          main_gpt.py 에서 OPENAI_API_BASE = "http://127.0.0.1:8765/v1", USE_BATCH_API = True
+#          dart_deal.py 에서 DART_WEB_BASE = "http://127.0.0.1:8765"
+#          dart_list.py 에서 OPENDART_LIST_URL = "http://127.0.0.1:8765/api/list.json"
+
+# ▶️ 429 주입 대상 (재시도 로직이 있는 웹 페이지/GPT 요청만, OpenDART API와 하위 문서는 지연만 적용)
+THROTTLED_PREFIXES = ("/dsaf001/", "/report/viewer.do", "/v1/chat/")
+
+
+def canned_answer(body):
+    """▶️ 프롬프트 마지막의 기업명으로 고정된 추출 결과를 만들어 반환"""
+    prompt = body["messages"][-1]["content"]
+    match = re.search(r"offline business report for: (.+)", prompt)
+    company = match.group(1).strip() if match else "UNKNOWN"
+    return json.dumps({
+        "industry": "테스트",
+        "suppliers": [{"category": "원재료", "company": f"{company} 공급사"}],
+        "buyers": [{"category": "제품", "company": f"{company} 고객사"}],
+    }, ensure_ascii=False)
+
+
+def chat_completion(body, content):
+    """▶️ chat.completion 응답 (요청에 tools가 있으면 함수 호출 인자로 담아 반환)"""
+    message = {"role": "assistant", "content": content}
+    if body.get("tools"):
+        name = body["tools"][0]["function"]["name"]
+        message = {"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": name, "arguments": content}}
+        ]}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if body.get("tools") else "stop"}],
+        "usage": {"prompt_tokens": len(json.dumps(body)) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(json.dumps(body)) + len(content)) // 4},
+    }
+
+
+def default_pages():
+    """▶️ benchmarks/fixtures.py의 기본 페이지 공급자"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    from fixtures import FixturePages
+    return FixturePages()
+
+
+class StandinState:
+    """▶️ 서버 설정과 상태
+
+    - latency/jitter: 모든 응답 전 지연 (초, latency + 0~jitter 무작위)
+    - rate_limit_rate: THROTTLED_PREFIXES 요청 중 429(Retry-After: retry_after초)로 거절할 비율
+    - fail_rate: chat/completions·배치 응답 중 오류/잘린 JSON 비율
+    """
+
+    def __init__(self, batch_delay=2.0, fail_rate=0.0, seed=0, latency=0.0, jitter=0.0, rate_limit_rate=0.0,
+                 retry_after=1.0, pages=None):
+        self.batch_delay = batch_delay
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.pages = pages or default_pages()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.batches = {}
+        self.counts = {"requests": 0, "throttled": 0}
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def delay_and_throttle(self, path):
+        """응답 전 지연, 429로 거절할 요청이면 True"""
+        with self.lock:
+            self.counts["requests"] += 1
+            delay = self.latency + self.random.random() * self.jitter
+            throttled = path.startswith(THROTTLED_PREFIXES) and self.random.random() < self.rate_limit_rate
+            if throttled:
+                self.counts["throttled"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return throttled
+
+    def chat_response(self, body):
+        """chat/completions 1건 → (HTTP 상태, 응답 JSON)"""
+        roll = self.roll()
+        if roll < self.fail_rate / 2:
+            return 500, {"error": {"message": "stand-in server error"}}
+        content = canned_answer(body)
+        if roll < self.fail_rate:
+            content = content[: len(content) // 2]  # ✅ 잘린 JSON 응답 흉내
+        return 200, chat_completion(body, content)
+
+    def list_page(self, params):
+        """OpenDART list.json (접수일자 구간 필터 + 페이지 나눔)"""
+        bgn_de, end_de = params.get("bgn_de", "00000000"), params.get("end_de", "99999999")
+        rows = [row for row in self.pages.disclosures(params.get("pblntf_ty", "A"))
+                if bgn_de <= row["rcept_dt"] <= end_de]
+        if not rows:
+            return {"status": "013", "message": "조회된 데이타가 없습니다."}
+        page_no, page_count = int(params.get("page_no", 1)), int(params.get("page_count", 10))
+        total_page = (len(rows) + page_count - 1) // page_count
+        return {"status": "000", "message": "정상", "page_no": page_no, "page_count": page_count,
+                "total_count": len(rows), "total_page": total_page,
+                "list": rows[(page_no - 1) * page_count: page_no * page_count]}
+
+    def add_file(self, content, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:16]}"
+        with self.lock:
+            info = self.files[file_id] = {"id": file_id, "object": "file", "bytes": len(content),
+                                          "purpose": purpose, "content": content}
+        return info
+
+    def run_batch(self, batch_id):
+        """▶️ 입력 파일의 각 줄에 응답을 만들어 output/error 파일로 저장 (fail_rate만큼 오류/깨진 JSON 섞음)"""
+        time.sleep(self.batch_delay)
+        with self.lock:
+            batch = self.batches[batch_id]
+            lines = self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+
+        outputs, errors = [], []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            with self.lock:
+                roll = self.random.random()
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"]}
+            if roll < self.fail_rate / 2:
+                record.update(response={"status_code": 500, "body": {"error": {"message": "stand-in server error"}}},
+                              error=None)
+                errors.append(record)
+                continue
+            content = canned_answer(request["body"])
+            if roll < self.fail_rate:
+                content = content[: len(content) // 2]  # ✅ 잘린 JSON 응답 흉내
+            record.update(response={"status_code": 200, "body": chat_completion(request["body"], content)}, error=None)
+            outputs.append(record)
+
+        def to_file(records):
+            if not records:
+                return None
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+            return self.add_file(payload, "batch_output")["id"]
+
+        output_file_id, error_file_id = to_file(outputs), to_file(errors)
+        with self.lock:
+            batch.update(
+                status="completed",
+                completed_at=int(time.time()),
+                output_file_id=output_file_id,
+                error_file_id=error_file_id,
+                request_counts={"total": len(lines), "completed": len(outputs), "failed": len(errors)},
+            )
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    state = None  # ✅ serve()에서 주입
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        self._send_bytes(json.dumps(obj, ensure_ascii=False).encode("utf-8"), "application/json", status)
+
+    def _send_bytes(self, payload, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttled(self, path):
+        """지연 후 429 주입 대상이면 429 응답을 보내고 True"""
+        if not self.state.delay_and_throttle(path):
+            return False
+        retry_after = self.state.retry_after
+        self._send_bytes(json.dumps({"error": {"message": "Rate limit reached (stand-in)"}}).encode("utf-8"),
+                         "application/json", 429,
+                         {"Retry-After": f"{retry_after:g}", "x-ratelimit-remaining-requests": "0",
+                          "x-ratelimit-reset-requests": f"{retry_after:g}s"})
+        return True
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        state = self.state
+        if self._throttled(self.path):
+            return
+
+        if self.path == "/v1/chat/completions":
+            status, payload = state.chat_response(json.loads(self._read_body()))
+            return self._send_json(payload, status)
+
+        if self.path == "/v1/files":
+            message = BytesParser(policy=policy.HTTP).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._read_body()
+            )
+            fields = {}
+            for part in message.iter_parts():
+                fields[part.get_param("name", header="content-disposition")] = part.get_payload(decode=True)
+            info = state.add_file(fields["file"], fields.get("purpose", b"batch").decode())
+            return self._send_json({k: v for k, v in info.items() if k != "content"})
+
+        if self.path == "/v1/batches":
+            body = json.loads(self._read_body())
+            batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+            with state.lock:
+                state.batches[batch_id] = {
+                    "id": batch_id, "object": "batch", "endpoint": body["endpoint"],
+                    "input_file_id": body["input_file_id"], "status": "in_progress",
+                    "created_at": int(time.time()), "metadata": body.get("metadata"),
+                    "output_file_id": None, "error_file_id": None,
+                    "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                }
+                batch = dict(state.batches[batch_id])
+            threading.Thread(target=state.run_batch, args=(batch_id,), daemon=True).start()
+            return self._send_json(batch)
+
+        self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def do_GET(self):
+        state = self.state
+        if self._throttled(self.path):
+            return
+
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        pages = state.pages
+
+        # ✅ dart.fss.or.kr 웹 페이지
+        if url.path == "/dsaf001/main.do":
+            return self._send_bytes(pages.main_page(params.get("rcpNo", "")).encode("utf-8"), "text/html; charset=utf-8")
+        if url.path == "/report/viewer.do":
+            return self._send_bytes(pages.contract_page(params.get("rcpNo", "")).encode("utf-8"),
+                                    "text/html; charset=utf-8")
+        if url.path == "/report/subdoc.do":
+            return self._send_bytes(pages.subdoc_page(params.get("rcpNo", "")).encode("utf-8"),
+                                    "text/html; charset=utf-8")
+
+        # ✅ OpenDART API
+        if url.path == "/api/list.json":
+            return self._send_json(state.list_page(params))
+        if url.path == "/api/document.xml":
+            return self._send_bytes(pages.report_zip(params.get("rcept_no", "")), "application/zip")
+        if url.path == "/api/company.json":
+            company = next((c for c in pages.companies() if c["corp_code"] == params.get("corp_code")), None)
+            if company is None:
+                return self._send_json({"status": "013", "message": "조회된 데이타가 없습니다."})
+            return self._send_json({"status": "000", "message": "정상", **company, "corp_cls": "Y"})
+        if url.path == "/api/corpCode.xml":
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("CORPCODE.xml", pages.corpcode_xml())
+            return self._send_bytes(buffer.getvalue(), "application/zip")
+
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match:
+            with state.lock:
+                batch = state.batches.get(match.group(1))
+                batch = dict(batch) if batch else None
+            if batch is None:
+                return self._send_json({"error": {"message": "batch not found"}}, 404)
+            return self._send_json(batch)
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match:
+            info = state.files.get(match.group(1))
+            if info is None:
+                return self._send_json({"error": {"message": "file not found"}}, 404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(info["content"])))
+            self.end_headers()
+            self.wfile.write(info["content"])
+            return
+
+        self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+
+def serve(host="127.0.0.1", port=8765, **state_kwargs):
+    """▶️ 대체 서버 시작 (백그라운드 스레드), 서버 객체 반환 → 종료 시 server.shutdown()"""
+    handler = type("Handler", (StandinHandler,), {"state": StandinState(**state_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI / DART 로컬 대체 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="배치 완료까지 걸리는 시간(초)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="오류/잘린 응답 비율 (0~1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="응답 지연에 더할 무작위 시간 최대값(초)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429로 거절할 요청 비율 (0~1)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 응답의 Retry-After(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, batch_delay=args.batch_delay, fail_rate=args.fail_rate, seed=args.seed,
+                   latency=args.latency, jitter=args.jitter, rate_limit_rate=args.rate_limit_rate,
+                   retry_after=args.retry_after)
+    print(f"▶️ stand-in server: http://{args.host}:{server.server_port} (OpenAI: /v1, DART: /dsaf001, /report, /api)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
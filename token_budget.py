@@ -0,0 +1,71 @@
+import re
+from bisect import bisect_left
+from itertools import accumulate
+
+# ▶️ 문장 끝 패턴: 개행 없이 붙어 있는 본문("...한다.당사는...")도 잘라낼 수 있도록 "다."는 공백 없이도 인정
+SENTENCE_END_RE = re.compile(r"다\.|[.!?。](?=\s)")
+MIN_KEEP_RATIO = 0.5  # ▶️ 경계가 토큰 한도의 절반보다 앞에 있으면 경계를 무시하고 토큰 단위로 자름
+
+# ▶️ 긴 문서는 앞부분만 인코딩: 한도 x 6자부터 시작해 토큰이 한도를 넘을 때까지 두 배씩 늘림
+PREFIX_CHARS_PER_TOKEN = 6
+PREFIX_MARGIN_TOKENS = 64  # ▶️ 앞부분 끝에서 토큰이 달라질 수 있는 구간 여유분
+
+
+def find_cut_boundary(text):
+    """▶️ text 안에서 가장 뒤에 있는 문단/줄/문장 경계의 끝 위치 (없으면 0)"""
+    best = text.rfind("\n")
+    best = best if best > 0 else 0
+    last_end = 0
+    for match in SENTENCE_END_RE.finditer(text, best):
+        last_end = match.end()
+    return max(best, last_end)
+
+
+def segment_token_counts(segments, tokenizer, sep="\n"):
+    """▶️ 구간(문단/표 행)들을 sep로 이어 붙여 한 번만 인코딩 → (이어 붙인 텍스트, 구간별 토큰 수)
+
+    토큰 바이트 시작 위치로 구간을 나누므로 구간마다 따로 인코딩하지 않음
+    구분자 토큰은 앞 구간에 포함되고, 구간별 토큰 수의 합은 이어 붙인 텍스트의 토큰 수와 같음
+    """
+    text = sep.join(segments)
+    tokens = tokenizer.encode(text)
+    token_starts = list(accumulate((len(b) for b in tokenizer.decode_tokens_bytes(tokens)), initial=0))[:-1]
+    sep_bytes = len(sep.encode("utf-8"))
+    counts, segment_start, first = [], 0, 0
+    for segment in segments:
+        segment_start += len(segment.encode("utf-8")) + sep_bytes
+        last = bisect_left(token_starts, segment_start)
+        counts.append(last - first)
+        first = last
+    return text, counts
+
+
+def truncate_to_tokens(raw_text, max_tokens, tokenizer):
+    """▶️ 토큰 한도 안으로 텍스트 자르기 → (잘린 텍스트, 토큰 수)
+
+    한도를 넘는 데 필요한 앞부분만 한 번 인코딩한 뒤, 토큰 바이트 오프셋으로 한도 지점의
+    문자 위치를 구하고 그 앞의 가장 가까운 문단/문장 경계에서 자름
+    """
+    window = max_tokens * PREFIX_CHARS_PER_TOKEN
+    while True:
+        head = raw_text[:window]
+        tokens = tokenizer.encode(head)
+        if window >= len(raw_text):
+            if len(tokens) <= max_tokens:
+                return raw_text, len(tokens)
+            break
+        if len(tokens) > max_tokens + PREFIX_MARGIN_TOKENS:
+            break
+        window *= 2
+
+    # ▶️ 토큰별 바이트 시작 위치 (한글은 한 글자가 여러 토큰에 걸칠 수 있어 바이트 기준으로 계산)
+    token_starts = [0, *accumulate(len(b) for b in tokenizer.decode_tokens_bytes(tokens[:max_tokens]))]
+    head_bytes = head.encode("utf-8")
+    cut = len(head_bytes[:token_starts[max_tokens]].decode("utf-8", errors="ignore"))  # ▶️ 한도 지점의 문자 위치
+
+    boundary = find_cut_boundary(head[:cut])
+    if boundary >= cut * MIN_KEEP_RATIO:
+        cut = boundary
+
+    trimmed_text = head[:cut].rstrip()
+    return trimmed_text, bisect_left(token_starts, len(trimmed_text.encode("utf-8")))
@@ -0,0 +1,448 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from dedup import normalize_name
+
+# 📌 밸류체인 그래프 인덱스 (finalmerge.py의 병합 결과 → 정수 노드 ID + CSR 인접 배열)
+# - 간선 방향은 공급 흐름: 공급사 → 구매사 ("공급처" 행은 연관기업 → 종목, "판매처" 행은 종목 → 연관기업)
+# - 상류(upstream) = 공급사 방향, 하류(downstream) = 구매사 방향
+# - 저장은 폴더 하나에 .npy 배열 + nodes.json/meta.json, 불러올 때 배열은 메모리 매핑 (전체를 읽지 않음)
+# 사용:
+#   python value_chain_graph.py build --merged merged_result.xlsx --out value_chain_graph
+#   python value_chain_graph.py update --merged merged_result.xlsx --graph value_chain_graph   (바뀐/사라진 종목만 반영)
+#   python value_chain_graph.py upstream --graph value_chain_graph --node 삼성전자 --hops 2 --listed-only
+#   python value_chain_graph.py path --graph value_chain_graph --source 동진쎄미켐 --target 현대자동차
+#   python value_chain_graph.py exposure --graph value_chain_graph --node 005930 --direction upstream --hops 3
+
+SUPPLIER = 1  # 구매사가 "공급처"로 보고한 관계
+BUYER = 2  # 공급사가 "판매처"로 보고한 관계
+ROLE_FLAGS = {"공급처": SUPPLIER, "판매처": BUYER}
+
+EDGE_ARRAYS = ("edge_src", "edge_dst", "edge_ticker", "edge_flag")
+CSR_ARRAYS = ("out_indptr", "out_indices", "out_weight", "out_flag", "in_indptr", "in_indices", "in_weight", "in_flag")
+
+
+def normalize_code(value):
+    """종목코드 정리 (엑셀에서 숫자로 읽힌 코드의 앞자리 0 복원, 없으면 "")"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    text = str(value).strip()
+    if text.endswith(".0"):
+        text = text[:-2]
+    return text.zfill(6) if text.isdigit() else text
+
+
+def node_key(code, name):
+    """노드 키: 상장사는 종목코드, 코드가 없는 기업은 정규화한 이름"""
+    code = normalize_code(code)
+    return code if code else f"name:{normalize_name(name)}"
+
+
+def ticker_hashes(df):
+    """종목별 병합 결과 내용 해시 {종목코드: hex} (증분 갱신 시 바뀐 종목 판별)
+
+    행 해시는 pandas로 한 번에 계산하고, 종목별로 행 해시 바이트만 묶어 sha1
+    """
+    row_hash = pd.util.hash_pandas_object(df[["종목명", "중분류", "연관기업", "연관종목코드"]].astype(str),
+                                          index=False).to_numpy()
+    return {ticker: hashlib.sha1(row_hash[positions].tobytes()).hexdigest()
+            for ticker, positions in df.groupby("종목코드", sort=False).indices.items()}
+
+
+def load_merged(path):
+    """finalmerge 결과 파일 (.xlsx / .parquet) → DataFrame"""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_excel(path, dtype={"종목코드": str, "연관종목코드": str})
+
+
+def _csr(src, dst, weight, flag, n):
+    """(src, dst) 간선 목록 → src 기준 CSR (같은 src 안에서는 dst 순 정렬)"""
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32), weight[order], flag[order]
+
+
+class ValueChainGraph:
+    """📌 밸류체인 그래프 (노드 = 기업, 간선 = 공급 관계)
+
+    - 간선 원본표(edge_*)는 병합 결과 한 행 = 한 줄이며 어느 종목 파일에서 나온 행인지(edge_ticker)를 기록
+      → update()는 바뀐 종목의 행만 지우고 다시 넣은 뒤 CSR만 다시 만듦 (이름 정규화/코드 매칭은 바뀐 행만)
+    - CSR은 같은 (공급사, 구매사) 쌍을 하나로 합친 것 (weight = 근거 행 수, flag = 보고 방향 비트합)
+    - 노드 ID는 한 번 부여하면 바뀌지 않음 (관계가 모두 사라진 노드도 남아 있음)
+    """
+
+    def __init__(self, keys, names, listed, tickers, hashes, arrays):
+        self.keys = keys
+        self.names = names
+        self.listed = listed
+        self.tickers = tickers
+        self.hashes = hashes
+        self.key_to_id = {key: i for i, key in enumerate(keys)}
+        self.ticker_to_id = {ticker: i for i, ticker in enumerate(tickers)}
+        self._name_to_ids = None
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    # ✅ 생성 / 갱신
+    @classmethod
+    def empty(cls):
+        arrays = {name: np.zeros(0, dtype=np.int32) for name in EDGE_ARRAYS}
+        arrays["edge_flag"] = np.zeros(0, dtype=np.uint8)
+        graph = cls([], [], [], [], {}, arrays)
+        graph._build_csr()
+        return graph
+
+    @classmethod
+    def build(cls, merged_df):
+        graph = cls.empty()
+        graph.update(merged_df)
+        return graph
+
+    def _intern(self, key, name, listed):
+        node = self.key_to_id.get(key)
+        if node is None:
+            node = self.key_to_id[key] = len(self.keys)
+            self.keys.append(key)
+            self.names.append(str(name))
+            self.listed.append(bool(listed))
+            self._name_to_ids = None
+        elif listed and not self.listed[node]:
+            self.listed[node] = True
+        return node
+
+    def _ticker_id(self, ticker):
+        index = self.ticker_to_id.get(ticker)
+        if index is None:
+            index = self.ticker_to_id[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return index
+
+    def update(self, merged_df, tickers=None, remove_missing=None):
+        """📌 병합 결과로 그래프 갱신 → 다시 반영한 종목 수
+
+        tickers를 넘기면 그 종목만, 아니면 내용 해시가 바뀐 종목만 반영
+        remove_missing이면 merged_df에 없는 종목(관계가 모두 사라진 종목 포함)의 관계는 삭제
+        기본값: tickers 없이 전체 병합 결과를 넘기면 삭제, tickers로 일부만 넘기면 유지
+        """
+        if remove_missing is None:
+            remove_missing = tickers is None
+        df = merged_df.copy()
+        df["종목코드"] = df["종목코드"].map(normalize_code)
+        df["연관종목코드"] = df["연관종목코드"].map(normalize_code) if "연관종목코드" in df.columns else ""
+        df = df[df["중분류"].isin(ROLE_FLAGS.keys()) & df["연관기업"].notna() & (df["종목코드"] != "")]
+        df = df.reset_index(drop=True)
+
+        hashes = ticker_hashes(df)
+        if tickers is not None:
+            wanted = {normalize_code(t) for t in tickers}
+            changed = [t for t in hashes if t in wanted]
+        else:
+            changed = [t for t, content_hash in hashes.items() if self.hashes.get(t) != content_hash]
+        removed = set()
+        if remove_missing:
+            removed = {t for t in self.hashes if t not in hashes}
+        if not changed and not removed:
+            return 0
+
+        # ✅ 바뀐 종목에서 나온 기존 간선 제거
+        drop = [self.ticker_to_id[t] for t in changed + list(removed) if t in self.ticker_to_id]
+        keep = ~np.isin(self.edge_ticker, np.asarray(drop, dtype=np.int32))
+        src, dst = [np.asarray(self.edge_src)[keep]], [np.asarray(self.edge_dst)[keep]]
+        owner, flag = [np.asarray(self.edge_ticker)[keep]], [np.asarray(self.edge_flag)[keep]]
+
+        # ✅ 바뀐 종목의 행만 노드 ID로 변환해 추가
+        positions = df.groupby("종목코드", sort=False).indices
+        for ticker in changed:
+            rows = df.iloc[positions[ticker]]
+            company = self._intern(ticker, rows["종목명"].iloc[0], True)
+            ticker_id = self._ticker_id(ticker)
+            new_src, new_dst, new_flag = [], [], []
+            for role, partner, partner_code in zip(rows["중분류"], rows["연관기업"], rows["연관종목코드"]):
+                other = self._intern(node_key(partner_code, partner), partner, bool(partner_code))
+                if other == company:
+                    continue
+                pair = (other, company) if role == "공급처" else (company, other)
+                new_src.append(pair[0])
+                new_dst.append(pair[1])
+                new_flag.append(ROLE_FLAGS[role])
+            src.append(np.asarray(new_src, dtype=np.int32))
+            dst.append(np.asarray(new_dst, dtype=np.int32))
+            owner.append(np.full(len(new_src), ticker_id, dtype=np.int32))
+            flag.append(np.asarray(new_flag, dtype=np.uint8))
+            self.hashes[ticker] = hashes[ticker]
+        for ticker in removed:
+            self.hashes.pop(ticker, None)
+
+        self.edge_src = np.concatenate(src).astype(np.int32)
+        self.edge_dst = np.concatenate(dst).astype(np.int32)
+        self.edge_ticker = np.concatenate(owner).astype(np.int32)
+        self.edge_flag = np.concatenate(flag).astype(np.uint8)
+        self._build_csr()
+        return len(changed) + len(removed)
+
+    def _build_csr(self):
+        n = len(self.keys)
+        # ✅ 같은 (공급사, 구매사) 쌍 합치기: 근거 행 수 + 보고 방향 비트합
+        pair = self.edge_src.astype(np.int64) * max(n, 1) + self.edge_dst
+        unique, inverse = np.unique(pair, return_inverse=True)
+        src = (unique // max(n, 1)).astype(np.int32)
+        dst = (unique % max(n, 1)).astype(np.int32)
+        weight = np.bincount(inverse, minlength=len(unique)).astype(np.float32)
+        flag = np.zeros(len(unique), dtype=np.uint8)
+        np.bitwise_or.at(flag, inverse, self.edge_flag)
+        self.out_indptr, self.out_indices, self.out_weight, self.out_flag = _csr(src, dst, weight, flag, n)
+        self.in_indptr, self.in_indices, self.in_weight, self.in_flag = _csr(dst, src, weight, flag, n)
+
+    # ✅ 저장 / 불러오기
+    def save(self, path):
+        """폴더에 저장 (임시 폴더에 다 쓴 뒤 교체하므로 읽는 쪽은 항상 완성된 그래프를 봄)"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in EDGE_ARRAYS + CSR_ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(tmp_path, "nodes.json"), "w", encoding="utf-8") as f:
+            json.dump({"keys": self.keys, "names": self.names, "listed": self.listed}, f, ensure_ascii=False)
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"saved": time.strftime("%Y-%m-%d %H:%M:%S"), "tickers": self.tickers, "hashes": self.hashes},
+                      f, ensure_ascii=False)
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """mmap이면 배열은 필요한 부분만 디스크에서 읽음 (update() 시에는 새 배열로 복사)"""
+        with open(os.path.join(path, "nodes.json"), "r", encoding="utf-8") as f:
+            nodes = json.load(f)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in EDGE_ARRAYS + CSR_ARRAYS}
+        return cls(nodes["keys"], nodes["names"], nodes["listed"], meta["tickers"], meta["hashes"], arrays)
+
+    # ✅ 노드 조회
+    @property
+    def n_nodes(self):
+        return len(self.keys)
+
+    @property
+    def n_edges(self):
+        return len(self.out_indices)
+
+    def node_id(self, node):
+        """종목코드 / 노드 키 / 기업명(정규화 후 비교) → 노드 ID (없으면 KeyError)"""
+        if isinstance(node, (int, np.integer)):
+            return int(node)
+        key = normalize_code(node)
+        if key in self.key_to_id:
+            return self.key_to_id[key]
+        if f"name:{normalize_name(node)}" in self.key_to_id:
+            return self.key_to_id[f"name:{normalize_name(node)}"]
+        if self._name_to_ids is None:
+            self._name_to_ids = {}
+            for i, name in enumerate(self.names):
+                self._name_to_ids.setdefault(normalize_name(name), []).append(i)
+        ids = self._name_to_ids.get(normalize_name(node))
+        if not ids:
+            raise KeyError(f"노드 없음: {node}")
+        return min(ids, key=lambda i: (not self.listed[i], i))  # ✅ 같은 이름이면 상장사 우선
+
+    def _adjacency(self, direction):
+        if direction == "downstream":
+            return self.out_indptr, self.out_indices
+        if direction == "upstream":
+            return self.in_indptr, self.in_indices
+        raise ValueError(f"direction은 upstream/downstream: {direction}")
+
+    def _expand(self, frontier, indptr, indices):
+        """frontier 노드들의 이웃 전체 (중복 포함) + 각 이웃을 낸 frontier 노드, 반복문 없이 CSR 구간을 이어 붙임"""
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return indices[offsets], np.repeat(frontier, lengths)
+
+    def _frame(self, ids, **columns):
+        ids = np.asarray(ids, dtype=np.int64)
+        return pd.DataFrame({
+            "노드": [self.keys[i] for i in ids],
+            "기업명": [self.names[i] for i in ids],
+            "상장": [self.listed[i] for i in ids],
+            **columns,
+        })
+
+    # ✅ 질의
+    def neighbors(self, node, direction="upstream", hops=1, listed_only=False):
+        """📌 N단계 공급사(upstream) / 구매사(downstream) → DataFrame [노드, 기업명, 상장, 단계]
+
+        listed_only여도 비상장사를 거쳐 가는 경로는 탐색하고, 결과에서만 뺌
+        """
+        indptr, indices = self._adjacency(direction)
+        start = self.node_id(node)
+        visited = np.zeros(self.n_nodes, dtype=bool)
+        visited[start] = True
+        frontier = np.asarray([start], dtype=np.int64)
+        found, depth = [], []
+        for hop in range(1, hops + 1):
+            nxt = np.unique(self._expand(frontier, indptr, indices)[0])
+            nxt = nxt[~visited[nxt]]
+            if len(nxt) == 0:
+                break
+            visited[nxt] = True
+            found.append(nxt)
+            depth.append(np.full(len(nxt), hop))
+            frontier = nxt.astype(np.int64)
+        ids = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        hop_col = np.concatenate(depth) if depth else np.zeros(0, dtype=np.int64)
+        result = self._frame(ids, 단계=hop_col)
+        if listed_only:
+            result = result[result["상장"]].reset_index(drop=True)
+        return result
+
+    def upstream(self, node, hops=1, listed_only=False):
+        return self.neighbors(node, "upstream", hops, listed_only)
+
+    def downstream(self, node, hops=1, listed_only=False):
+        return self.neighbors(node, "downstream", hops, listed_only)
+
+    def shortest_path(self, source, target, direction="downstream", max_hops=None):
+        """📌 최단 경로 (간선 수 기준 BFS) → 기업명 목록, 없으면 None
+
+        direction: "downstream" (source가 target에 직간접 공급), "upstream", "any" (방향 무시)
+        """
+        start, goal = self.node_id(source), self.node_id(target)
+        if direction == "any":
+            adjacency = [self._adjacency("downstream"), self._adjacency("upstream")]
+        else:
+            adjacency = [self._adjacency(direction)]
+        parent = np.full(self.n_nodes, -1, dtype=np.int64)
+        parent[start] = start
+        frontier = np.asarray([start], dtype=np.int64)
+        hops = 0
+        while parent[goal] == -1 and len(frontier) and (max_hops is None or hops < max_hops):
+            expanded = [self._expand(frontier, indptr, indices) for indptr, indices in adjacency]
+            nxt = np.concatenate([nodes for nodes, _ in expanded])
+            owner = np.concatenate([owners for _, owners in expanded])
+            fresh = parent[nxt] == -1
+            nxt, first = np.unique(nxt[fresh], return_index=True)
+            parent[nxt] = owner[fresh][first]
+            frontier = nxt.astype(np.int64)
+            hops += 1
+        if parent[goal] == -1:
+            return None
+        path = [goal]
+        while path[-1] != start:
+            path.append(int(parent[path[-1]]))
+        return [self.names[i] for i in reversed(path)]
+
+    def exposure(self, nodes, direction="upstream", hops=3, decay=1.0, listed_only=True, top=50):
+        """📌 노출도 집계: 시작 기업(들)의 관계 비중을 N단계까지 전파한 합 → DataFrame [노드, 기업명, 상장, 노출도]
+
+        nodes: 기업 하나 또는 {기업: 비중} (예: 포트폴리오 보유 비중)
+        각 단계에서 노드의 값을 이웃 간선 weight 비율로 나눠 전달 (decay를 곱함), 단계별 도달값을 모두 더함
+        """
+        if not isinstance(nodes, dict):
+            nodes = {nodes: 1.0}
+        indptr, indices = self._adjacency(direction)
+        weight = np.asarray(self.in_weight if direction == "upstream" else self.out_weight, dtype=np.float64)
+        rows = np.repeat(np.arange(self.n_nodes), np.diff(indptr))
+        totals = np.bincount(rows, weights=weight, minlength=self.n_nodes)
+        share = weight / totals[rows] if len(rows) else weight
+
+        value = np.zeros(self.n_nodes)
+        starts = [self.node_id(node) for node in nodes]
+        for node_id, amount in zip(starts, nodes.values()):
+            value[node_id] += amount
+        total = np.zeros(self.n_nodes)
+        for _ in range(hops):
+            value = np.bincount(indices, weights=value[rows] * share * decay, minlength=self.n_nodes)
+            total += value
+        total[starts] = 0.0  # ✅ 순환으로 되돌아온 자기 자신은 제외
+
+        mask = total > 0
+        if listed_only:
+            mask &= np.asarray(self.listed, dtype=bool)
+        ids = np.flatnonzero(mask)
+        ids = ids[np.argsort(-total[ids], kind="stable")][:top]
+        return self._frame(ids, 노출도=total[ids])
+
+    def summary(self):
+        listed = sum(self.listed)
+        return (f"노드 {self.n_nodes:,}개 (상장 {listed:,}), 관계 {self.n_edges:,}개 "
+                f"(근거 행 {len(self.edge_src):,}), 종목 파일 {len(self.hashes):,}개")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="밸류체인 그래프 인덱스")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="병합 결과로 그래프 새로 만들기")
+    p_build.add_argument("--merged", required=True, help="finalmerge 결과 (.xlsx / .parquet)")
+    p_build.add_argument("--out", required=True)
+
+    p_update = sub.add_parser("update", help="바뀐 종목만 반영")
+    p_update.add_argument("--merged", required=True)
+    p_update.add_argument("--graph", required=True)
+    p_update.add_argument("--keep-missing", action="store_true",
+                          help="병합 결과에 없는 종목의 관계 유지 (일부 종목만 담긴 파일로 갱신할 때)")
+
+    for name in ("upstream", "downstream"):
+        p_query = sub.add_parser(name, help=f"N단계 {'공급사' if name == 'upstream' else '구매사'}")
+        p_query.add_argument("--graph", required=True)
+        p_query.add_argument("--node", required=True, help="종목코드 또는 기업명")
+        p_query.add_argument("--hops", type=int, default=2)
+        p_query.add_argument("--listed-only", action="store_true")
+
+    p_path = sub.add_parser("path", help="최단 경로")
+    p_path.add_argument("--graph", required=True)
+    p_path.add_argument("--source", required=True)
+    p_path.add_argument("--target", required=True)
+    p_path.add_argument("--direction", default="downstream", choices=["downstream", "upstream", "any"])
+
+    p_exposure = sub.add_parser("exposure", help="노출도 집계")
+    p_exposure.add_argument("--graph", required=True)
+    p_exposure.add_argument("--node", nargs="+", required=True, help="기업 (기업=비중 형식 가능)")
+    p_exposure.add_argument("--direction", default="upstream", choices=["downstream", "upstream"])
+    p_exposure.add_argument("--hops", type=int, default=3)
+    p_exposure.add_argument("--top", type=int, default=30)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    if args.command == "build":
+        graph = ValueChainGraph.build(load_merged(args.merged))
+        graph.save(args.out)
+        print(f"✅ {graph.summary()} → {args.out}")
+    elif args.command == "update":
+        graph = ValueChainGraph.load(args.graph)
+        changed = graph.update(load_merged(args.merged), remove_missing=not args.keep_missing)
+        if changed:
+            graph.save(args.graph)
+        print(f"✅ 종목 {changed}개 반영: {graph.summary()}")
+    else:
+        graph = ValueChainGraph.load(args.graph)
+        if args.command in ("upstream", "downstream"):
+            print(graph.neighbors(args.node, args.command, args.hops, args.listed_only).to_string(index=False))
+        elif args.command == "path":
+            path = graph.shortest_path(args.source, args.target, args.direction)
+            print(" → ".join(path) if path else "경로 없음")
+        else:
+            nodes = {}
+            for item in args.node:
+                name, _, amount = item.partition("=")
+                nodes[name] = float(amount or 1.0)
+            print(graph.exposure(nodes, args.direction, args.hops, top=args.top).to_string(index=False))
+    print(f"⏱️ {(time.perf_counter() - start) * 1000:.1f}ms")
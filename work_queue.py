@@ -0,0 +1,370 @@
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from metrics import add_arguments as add_metrics_arguments, start as start_metrics
+
+# ▶️ 여러 작업자(프로세스/서버)가 나눠 처리하는 작업 큐 (SQLite 파일 1개)
+# - 한 서버의 여러 프로세스: 로컬 디스크에 두고 사용
+# - 여러 서버: 공유 폴더에 두되 파일 잠금(fcntl/SMB byte-range lock)을 지원하는 저장소여야 함
+#   (롤백 저널 DELETE 모드 사용, WAL은 공유 메모리가 필요해 네트워크 파일시스템에서 깨질 수 있음)
+# 사용:
+#   python work_queue.py init --queue queue.sqlite --config pipeline_config.json
+#   python work_queue.py worker --queue queue.sqlite --config pipeline_config.json --stages report,gpt \
+#       --dart-key KEY1 --openai-key KEY2 --dart-rpm 600 --gpt-rpm 500 --gpt-tpm 40000
+#   python work_queue.py status --queue queue.sqlite
+# 새 실행(전체 재수집)은 새 큐 파일로 시작
+
+# ▶️ 단계 의존 관계 (pipeline.py와 같은 구성): 앞 단계가 모두 끝난 종목만 다음 단계 작업으로 추가됨
+DEPENDENCIES = {
+    "report": [],
+    "deal": [],
+    "gpt": ["report"],
+    "merge": ["deal", "gpt"],
+}
+LEASE_SECONDS = 600  # 임대 시간 (작업자가 하트비트로 연장, 끊기면 만료 후 다른 작업자가 회수)
+BATCH_SIZE = 8  # 한 번에 가져오는 종목 수
+MAX_ATTEMPTS = 3  # 실패가 이 횟수에 이르면 failed로 표시
+POLL_SECONDS = 10  # 가져올 작업이 없을 때 대기 (앞 단계가 진행 중인 경우)
+JOURNAL_MODE = "DELETE"  # WAL 금지: 같은 호스트 공유 메모리(-shm)에 의존
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "glusterfs", "ceph"}
+
+
+def network_filesystem(path):
+    """큐 파일이 네트워크 파일시스템에 있으면 종류 반환 (UNC 경로 / /proc/mounts 기준, 모르면 None)"""
+    folder = os.path.dirname(os.path.abspath(path))
+    if folder.startswith("\\\\"):
+        return "unc"
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+    best, fstype = "", None
+    for mount_point, kind in mounts:
+        if (folder == mount_point or folder.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, fstype = mount_point, kind
+    return fstype if fstype in NETWORK_FILESYSTEMS else None
+
+
+class WorkQueue:
+    """▶️ SQLite 기반 임대(lease) 작업 큐
+
+    - 작업 = (단계, 종목코드), 상태 pending → leased → done / failed
+    - claim: 만료된 임대를 먼저 회수한 뒤 pending 작업을 작업자 이름으로 임대 (BEGIN IMMEDIATE로 중복 임대 방지)
+    - heartbeat: 작업자가 가진 임대 연장, complete/fail: 임대한 작업자만 상태 변경 (회수된 작업은 무시)
+    - complete 시 의존 단계가 모두 끝났으면 다음 단계 작업을 같은 트랜잭션에서 추가
+    """
+
+    def __init__(self, path, dependencies=None, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.dependencies = dependencies or DEPENDENCIES
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        fstype = network_filesystem(path)
+        if fstype:
+            print(f"⚠️ 작업 큐 {path}가 네트워크 저장소({fstype})에 있음: 파일 잠금을 지원하지 않으면 중복 임대가 생길 수 있음")
+        self.conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        self.conn.execute("PRAGMA busy_timeout=60000")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                stage TEXT,
+                ticker TEXT,
+                status TEXT,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER DEFAULT 0,
+                updated REAL,
+                error TEXT,
+                PRIMARY KEY (stage, ticker)
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(stage, status)")
+
+    def _transaction(self, func, *args):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, stage, tickers):
+        """작업 추가 (이미 있는 작업은 그대로 둠), 새로 추가된 수 반환"""
+        def run():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (stage, ticker, status, updated) VALUES (?, ?, 'pending', ?)",
+                [(stage, ticker, time.time()) for ticker in tickers],
+            )
+            return self.conn.total_changes - before
+        return self._transaction(run)
+
+    def _reclaim(self, now):
+        cursor = self.conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL, updated = ? "
+            "WHERE status = 'leased' AND lease_until < ?",
+            (now, now),
+        )
+        return cursor.rowcount
+
+    def reclaim(self):
+        """만료된 임대를 pending으로 되돌림 (claim 때도 자동 실행)"""
+        return self._transaction(self._reclaim, time.time())
+
+    def claim(self, stage, worker, batch_size=BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+        """pending 작업을 최대 batch_size개 임대, 종목코드 목록 반환"""
+        def run():
+            now = time.time()
+            self._reclaim(now)
+            rows = self.conn.execute(
+                "SELECT ticker FROM tasks WHERE stage = ? AND status = 'pending' ORDER BY attempts, ticker LIMIT ?",
+                (stage, batch_size),
+            ).fetchall()
+            tickers = [row[0] for row in rows]
+            self.conn.executemany(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, updated = ? "
+                "WHERE stage = ? AND ticker = ?",
+                [(worker, now + lease_seconds, now, stage, ticker) for ticker in tickers],
+            )
+            return tickers
+        return self._transaction(run)
+
+    def heartbeat(self, worker, lease_seconds=LEASE_SECONDS):
+        """작업자가 가진 모든 임대 연장, 연장된 작업 수 반환"""
+        def run():
+            now = time.time()
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated = ? WHERE worker = ? AND status = 'leased'",
+                (now + lease_seconds, now, worker),
+            )
+            return cursor.rowcount
+        return self._transaction(run)
+
+    def complete(self, stage, ticker, worker):
+        """완료 기록 (임대가 회수돼 다른 작업자에게 넘어갔으면 False)"""
+        def run():
+            now = time.time()
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'done', lease_until = NULL, error = NULL, updated = ? "
+                "WHERE stage = ? AND ticker = ? AND status = 'leased' AND worker = ?",
+                (now, stage, ticker, worker),
+            )
+            if cursor.rowcount == 0:
+                return False
+            for next_stage, required in self.dependencies.items():
+                if stage not in required:
+                    continue
+                done = self.conn.execute(
+                    f"SELECT COUNT(*) FROM tasks WHERE ticker = ? AND status = 'done' "
+                    f"AND stage IN ({','.join('?' * len(required))})",
+                    (ticker, *required),
+                ).fetchone()[0]
+                if done == len(required):
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO tasks (stage, ticker, status, updated) VALUES (?, ?, 'pending', ?)",
+                        (next_stage, ticker, now),
+                    )
+            return True
+        return self._transaction(run)
+
+    def fail(self, stage, ticker, worker, error=""):
+        """실패 기록: 시도 횟수가 남았으면 pending으로 되돌리고, 아니면 failed"""
+        def run():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET attempts = attempts + 1, worker = NULL, lease_until = NULL, error = ?, updated = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE stage = ? AND ticker = ? AND status = 'leased' AND worker = ?",
+                (str(error)[:500], time.time(), self.max_attempts, stage, ticker, worker),
+            )
+            return cursor.rowcount > 0
+        return self._transaction(run)
+
+    def release(self, worker):
+        """작업자 정상 종료 시 남은 임대 반납"""
+        def run():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL, updated = ? "
+                "WHERE worker = ? AND status = 'leased'",
+                (time.time(), worker),
+            )
+            return cursor.rowcount
+        return self._transaction(run)
+
+    def counts(self):
+        """{단계: {상태: 개수}}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT stage, status, COUNT(*) FROM tasks GROUP BY stage, status").fetchall()
+        result = {}
+        for stage, status, count in rows:
+            result.setdefault(stage, {})[status] = count
+        return result
+
+    def unfinished(self, stages):
+        """단계(와 그 앞 단계)에 아직 pending/leased 작업이 있는지"""
+        pending = set()
+        todo = list(stages)
+        while todo:
+            stage = todo.pop()
+            if stage not in pending:
+                pending.add(stage)
+                todo.extend(self.dependencies.get(stage, []))
+        counts = self.counts()
+        return any(counts.get(stage, {}).get(status, 0) for stage in pending for status in ("pending", "leased"))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def run_worker(args):
+    """▶️ 작업자: 자기 API 키와 속도 한도로 지정 단계의 작업을 임대해 처리"""
+    import dart_deal
+    import dart_http
+    import dart_report
+    import main_gpt
+    import openai
+    import OpenDartReader
+    from pipeline import ValueChainStages, apply_config, load_config
+
+    config = load_config(args.config)
+    if args.dart_key:
+        config["dart_api_key"] = args.dart_key
+    if args.openai_key:
+        config["openai_api_key"] = args.openai_key
+    apply_config(config)
+
+    # ▶️ 작업자 프로세스마다 자기 키 + 자기 속도 한도 (같은 키를 여러 작업자가 쓰면 한도를 나눠 지정)
+    dart = OpenDartReader(config["dart_api_key"])
+    dart_report.dart = dart
+    dart_deal.dart = dart
+    dart_http.opendart_limiter = dart_http.TokenBucket(args.dart_rpm / 60.0, dart_http.OPENDART_BURST)
+    openai.api_key = config["openai_api_key"]
+    main_gpt.sync_limiters = (
+        dart_http.TokenBucket(args.gpt_rpm / 60.0, 1),
+        dart_http.TokenBucket(args.gpt_tpm / 60.0, args.gpt_tpm),
+    )
+    if main_gpt.USE_LLM_CACHE:
+        main_gpt.llm_cache = main_gpt.LLMCache(main_gpt.llm_cache_path,
+                                               ttl_seconds=main_gpt.LLM_CACHE_TTL_DAYS * 24 * 3600)
+
+    work_queue = WorkQueue(args.queue)
+    worker = args.worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    stopping = threading.Event()
+
+    def heartbeat():
+        while not stopping.wait(args.lease / 3):
+            try:
+                work_queue.heartbeat(worker, args.lease)
+            except sqlite3.Error as e:
+                print(f"⚠️ 하트비트 실패: {e}")
+
+    print(f"▶️ 작업자 {worker} 시작: 단계 {stages}, 배치 {args.batch}, 스레드 {args.threads}")
+    threading.Thread(target=heartbeat, daemon=True).start()
+    processed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=config["workers"]["cpu"], initializer=apply_config,
+                                 initargs=(config,)) as cpu_pool, \
+                ThreadPoolExecutor(max_workers=args.threads) as executor:
+            handlers = ValueChainStages(config, cpu_pool)
+
+            def process(stage, ticker):
+                try:
+                    ok = getattr(handlers, stage)(ticker) is not False
+                    error = "" if ok else "처리 실패"
+                except Exception as e:
+                    ok, error = False, e
+                if not ok:
+                    work_queue.fail(stage, ticker, worker, error)
+                    print(f"❌ [{stage}] {ticker} 실패: {error}")
+                elif not work_queue.complete(stage, ticker, worker):
+                    # ✅ 임대가 만료돼 다른 작업자가 가져감 (결과 파일은 원자적으로 교체되므로 중복 행은 생기지 않음)
+                    print(f"⚠️ [{stage}] {ticker} 임대 만료로 완료 기록 생략")
+                return ok
+
+            while True:
+                claimed = [(stage, ticker) for stage in stages
+                           for ticker in work_queue.claim(stage, worker, args.batch, args.lease)]
+                if not claimed:
+                    if not work_queue.unfinished(stages):
+                        break
+                    time.sleep(POLL_SECONDS)  # ✅ 앞 단계(다른 작업자)가 끝나길 기다림
+                    continue
+                processed += sum(executor.map(lambda job: process(*job), claimed))
+            handlers.save()
+    finally:
+        stopping.set()
+        released = work_queue.release(worker)
+        if released:
+            print(f"↩️ 처리하지 못한 임대 {released}건 반납")
+        if main_gpt.llm_cache is not None:
+            main_gpt.llm_cache.close()
+        work_queue.close()
+    print(f"🏁 작업자 {worker} 종료: {processed}건 완료")
+
+
+def init_queue(args):
+    import pandas as pd
+    from pipeline import load_config
+
+    config = load_config(args.config)
+    list_df = pd.read_excel(config["universe"], sheet_name='list', index_col=0)
+    tickers = [i[1:] for i in list_df.index][:args.limit]
+    work_queue = WorkQueue(args.queue)
+    for stage, required in DEPENDENCIES.items():
+        if not required:
+            print(f"✅ {stage}: {work_queue.enqueue(stage, tickers)}건 추가")
+    work_queue.close()
+
+
+def print_status(args):
+    work_queue = WorkQueue(args.queue)
+    if args.reclaim:
+        print(f"↩️ 만료된 임대 {work_queue.reclaim()}건 회수")
+    for stage, counts in sorted(work_queue.counts().items()):
+        print(f"{stage:<8} " + "  ".join(f"{status} {count}" for status, count in sorted(counts.items())))
+    work_queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite 임대 작업 큐 (여러 작업자/서버 분산 처리)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_init = sub.add_parser("init", help="종목 목록으로 시작 단계 작업 추가")
+    p_init.add_argument("--queue", required=True)
+    p_init.add_argument("--config")
+    p_init.add_argument("--limit", type=int)
+
+    p_worker = sub.add_parser("worker", help="작업 임대 후 처리")
+    p_worker.add_argument("--queue", required=True)
+    p_worker.add_argument("--config")
+    p_worker.add_argument("--stages", default="report,deal,gpt,merge", help="처리할 단계 (쉼표 구분, 앞쪽 우선)")
+    p_worker.add_argument("--worker-id")
+    p_worker.add_argument("--dart-key")
+    p_worker.add_argument("--openai-key")
+    p_worker.add_argument("--dart-rpm", type=float, default=600)
+    p_worker.add_argument("--gpt-rpm", type=float, default=500)
+    p_worker.add_argument("--gpt-tpm", type=float, default=40000)
+    p_worker.add_argument("--batch", type=int, default=BATCH_SIZE)
+    p_worker.add_argument("--threads", type=int, default=BATCH_SIZE)
+    p_worker.add_argument("--lease", type=float, default=LEASE_SECONDS)
+    add_metrics_arguments(p_worker)
+
+    p_status = sub.add_parser("status", help="단계별 작업 상태")
+    p_status.add_argument("--queue", required=True)
+    p_status.add_argument("--reclaim", action="store_true", help="만료된 임대 회수")
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        start_metrics(f"worker-{socket.gethostname()}-{os.getpid()}", args)  # ▶️ 작업자마다 별도 트레이스/Prometheus 파일
+    {"init": init_queue, "worker": run_worker, "status": print_status}[args.command](args)